@@ -5,22 +5,18 @@ Accès: streamlit run analytics_dashboard.py
 
 import streamlit as st
 import json
-import os
-from datetime import datetime
-from collections import Counter
+from datetime import datetime, timedelta
 import pandas as pd
+from analytics_store import AnalyticsStore
+from question_clusters import cluster_questions, load_question_clusters
 
-ANALYTICS_FILE = "analytics.json"
+TYPE_LABELS = {'text': '⌨️ Texte', 'voice': '🎤 Vocal', 'suggested': '💡 Suggérée'}
+PAGE_SIZE = 10
 
-def load_analytics():
-    """Charge les données analytics"""
-    if os.path.exists(ANALYTICS_FILE):
-        try:
-            with open(ANALYTICS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {"visitors": 0, "interactions": []}
-    return {"visitors": 0, "interactions": []}
+@st.cache_resource
+def get_store():
+    """Connexion partagée à la base analytics"""
+    return AnalyticsStore()
 
 st.set_page_config(
     page_title="Analytics EMINES Chatbot",
@@ -31,8 +27,24 @@ st.set_page_config(
 st.title("📊 Dashboard Analytics - EMINES Chatbot")
 st.markdown("**Journées Portes Ouvertes - Statistiques en temps réel**")
 
-# Charger les données
-analytics = load_analytics()
+store = get_store()
+
+# === PÉRIODE ===
+period = st.radio(
+    "Période",
+    ["Aujourd'hui", "7 derniers jours", "30 derniers jours", "Tout"],
+    index=3,
+    horizontal=True
+)
+today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+start = {
+    "Aujourd'hui": today,
+    "7 derniers jours": today - timedelta(days=6),
+    "30 derniers jours": today - timedelta(days=29),
+    "Tout": None,
+}[period]
+
+summary = store.summary(start=start)
 
 # === MÉTRIQUES PRINCIPALES ===
 st.markdown("## 📈 Vue d'ensemble")
@@ -42,12 +54,12 @@ col1, col2, col3, col4 = st.columns(4)
 with col1:
     st.metric(
         label="👥 Visiteurs Total",
-        value=analytics["visitors"],
+        value=summary["total_visitors"],
         delta=None
     )
 
 with col2:
-    total_questions = len(analytics["interactions"])
+    total_questions = summary["total_questions"]
     st.metric(
         label="💬 Questions Posées",
         value=total_questions,
@@ -55,7 +67,7 @@ with col2:
     )
 
 with col3:
-    avg_per_visitor = round(total_questions / analytics["visitors"], 1) if analytics["visitors"] > 0 else 0
+    avg_per_visitor = round(total_questions / summary["total_visitors"], 1) if summary["total_visitors"] > 0 else 0
     st.metric(
         label="📊 Questions / Visiteur",
         value=avg_per_visitor,
@@ -64,8 +76,8 @@ with col3:
 
 with col4:
     # Dernière activité
-    if analytics["interactions"]:
-        last_time = datetime.fromisoformat(analytics["interactions"][-1]["timestamp"])
+    if summary["last_timestamp"]:
+        last_time = datetime.fromisoformat(summary["last_timestamp"])
         time_diff = datetime.now() - last_time
         minutes_ago = int(time_diff.total_seconds() / 60)
         st.metric(
@@ -83,23 +95,19 @@ col_left, col_right = st.columns([2, 1])
 
 with col_left:
     st.markdown("## 📊 Répartition par Type d'Entrée")
-    
-    if analytics["interactions"]:
-        input_types = [i["input_type"] for i in analytics["interactions"]]
-        input_counts = Counter(input_types)
-        
+
+    if total_questions:
+        input_counts = summary["input_counts"]
+
         # Créer un DataFrame
         df_types = pd.DataFrame({
-            'Type': [
-                {'text': '⌨️ Texte', 'voice': '🎤 Vocal', 'suggested': '💡 Suggérée'}.get(k, k)
-                for k in input_counts.keys()
-            ],
+            'Type': [TYPE_LABELS.get(k, k) for k in input_counts.keys()],
             'Nombre': list(input_counts.values())
         })
-        
+
         # Afficher comme tableau
         st.dataframe(df_types, use_container_width=True, hide_index=True)
-        
+
         # Graphique en barres
         st.bar_chart(df_types.set_index('Type'))
     else:
@@ -107,48 +115,85 @@ with col_left:
 
 with col_right:
     st.markdown("## 🎯 Statistiques")
-    
-    if analytics["interactions"]:
-        text_count = sum(1 for i in analytics["interactions"] if i["input_type"] == "text")
-        voice_count = sum(1 for i in analytics["interactions"] if i["input_type"] == "voice")
-        suggested_count = sum(1 for i in analytics["interactions"] if i["input_type"] == "suggested")
-        
-        total = len(analytics["interactions"])
-        
-        st.metric("⌨️ Texte", f"{text_count} ({round(text_count/total*100)}%)")
-        st.metric("🎤 Vocal", f"{voice_count} ({round(voice_count/total*100)}%)")
-        st.metric("💡 Suggérée", f"{suggested_count} ({round(suggested_count/total*100)}%)")
+
+    if total_questions:
+        for input_type, label in TYPE_LABELS.items():
+            count = summary["input_counts"].get(input_type, 0)
+            st.metric(label, f"{count} ({round(count/total_questions*100)}%)")
+
+st.markdown("---")
+
+# === ACTIVITÉ DANS LE TEMPS ===
+col_hours, col_days = st.columns(2)
+
+with col_hours:
+    st.markdown("## 🕐 Questions par Heure")
+    hourly = store.hour_of_day_histogram(start=start)
+    if total_questions:
+        df_hours = pd.DataFrame(hourly, columns=['Heure', 'Questions']).set_index('Heure')
+        st.bar_chart(df_hours)
+    else:
+        st.info("Aucune donnée disponible")
+
+with col_days:
+    st.markdown("## 📅 Tendance par Jour")
+    daily = store.daily_trend(start=start)
+    if daily:
+        df_days = pd.DataFrame(daily, columns=['Jour', 'Questions']).set_index('Jour')
+        st.line_chart(df_days)
+    else:
+        st.info("Aucune donnée disponible")
 
 st.markdown("---")
 
 # === TOP QUESTIONS ===
 st.markdown("## 🔥 Top 10 Questions les Plus Posées")
 
-if analytics["interactions"]:
-    questions = [i["question"] for i in analytics["interactions"]]
-    question_counts = Counter(questions)
-    top_questions = question_counts.most_common(10)
-    
+if total_questions:
+    # Questions quasi-identiques regroupées (question_clusters.py) ; le fichier
+    # pré-calculé n'est utilisé que pour "Tout" et s'il est à jour
+    groups = None
+    if start is None:
+        groups = load_question_clusters(newer_than=summary["last_timestamp"])
+    if groups is None:
+        groups = cluster_questions(store.questions(start=start))
+    top_groups = groups[:10]
+
     # Créer un DataFrame
     df_questions = pd.DataFrame({
-        'Rang': range(1, len(top_questions) + 1),
-        'Question': [q for q, _ in top_questions],
-        'Fréquence': [c for _, c in top_questions]
+        'Rang': range(1, len(top_groups) + 1),
+        'Question': [g["canonical"] for g in top_groups],
+        'Fréquence': [g["count"] for g in top_groups],
+        'Variantes': [len(g["members"]) for g in top_groups]
     })
-    
+
     st.dataframe(df_questions, use_container_width=True, hide_index=True)
 else:
     st.info("Aucune question posée pour le moment")
 
 st.markdown("---")
 
-# === HISTORIQUE RÉCENT ===
-st.markdown("## 📜 Dernières Interactions (10 plus récentes)")
+# === HISTORIQUE ===
+st.markdown("## 📜 Historique des Interactions")
+
+col_filter, col_page = st.columns([2, 1])
+with col_filter:
+    type_filter = st.selectbox(
+        "Type d'entrée",
+        ["Tous"] + list(TYPE_LABELS.keys()),
+        format_func=lambda k: TYPE_LABELS.get(k, k)
+    )
+input_type = None if type_filter == "Tous" else type_filter
+with col_page:
+    page = st.number_input("Page", min_value=1, value=1, step=1)
+
+history = store.interactions_page(page=int(page), page_size=PAGE_SIZE, start=start, input_type=input_type)
+
+if history["items"]:
+    st.caption(f"Page {history['page']}/{history['pages']} - {history['total']} interactions")
+    first_rank = (history["page"] - 1) * PAGE_SIZE
 
-if analytics["interactions"]:
-    recent = analytics["interactions"][-10:][::-1]  # 10 dernières, inversées
-    
-    for i, interaction in enumerate(recent, 1):
+    for i, interaction in enumerate(history["items"], first_rank + 1):
         with st.expander(f"#{i} - {interaction['timestamp'][:19]} - {interaction['input_type'].upper()}"):
             st.markdown(f"**❓ Question:**")
             st.text(interaction['question'])
@@ -172,7 +217,7 @@ with col_act2:
     if st.button("📥 Exporter JSON", use_container_width=True):
         st.download_button(
             label="Télécharger analytics.json",
-            data=json.dumps(analytics, indent=2, ensure_ascii=False),
+            data=json.dumps(store.export(start=start), indent=2, ensure_ascii=False),
             file_name=f"analytics_emines_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
             mime="application/json"
         )
@@ -180,8 +225,7 @@ with col_act2:
 with col_act3:
     if st.button("⚠️ Réinitialiser Tout", use_container_width=True):
         if st.checkbox("Confirmer la réinitialisation"):
-            with open(ANALYTICS_FILE, 'w', encoding='utf-8') as f:
-                json.dump({"visitors": 0, "interactions": []}, f)
+            store.reset()
             st.success("✅ Statistiques réinitialisées!")
             st.rerun()
 
@@ -0,0 +1,229 @@
+"""
+Stockage indexé des analytics (SQLite) et requêtes par fenêtre de temps
+
+Remplace la lecture/réécriture complète de analytics.json : chaque interaction
+est une ligne indexée par timestamp et par type d'entrée, et le dashboard ne
+récupère que ce qu'il affiche (histogrammes, tendances, historique paginé).
+Le fichier analytics.json existant est importé à la création de la base.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+ANALYTICS_DB = "analytics.db"
+LEGACY_ANALYTICS_FILE = "analytics.json"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS interactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    question TEXT NOT NULL,
+    response TEXT NOT NULL DEFAULT '',
+    input_type TEXT NOT NULL DEFAULT 'text'
+);
+CREATE INDEX IF NOT EXISTS idx_interactions_timestamp ON interactions(timestamp);
+CREATE INDEX IF NOT EXISTS idx_interactions_type_timestamp ON interactions(input_type, timestamp);
+
+CREATE TABLE IF NOT EXISTS visits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_visits_timestamp ON visits(timestamp);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _iso(value):
+    """Convertit une date (datetime, date ou chaîne ISO) en chaîne ISO comparable"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+class AnalyticsStore:
+    """Analytics du chatbot stockées dans SQLite"""
+
+    def __init__(self, path: str = ANALYTICS_DB, legacy_path: str = LEGACY_ANALYTICS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        is_new = not os.path.exists(path)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        if is_new and legacy_path and os.path.exists(legacy_path):
+            self.import_json(legacy_path)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _window(self, start=None, end=None, input_type=None):
+        """Construit la clause WHERE d'une fenêtre de temps [start, end["""
+        clauses, params = [], []
+        if input_type:
+            clauses.append("input_type = ?")
+            params.append(input_type)
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(_iso(start))
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(_iso(end))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    # === Écriture ===
+
+    def log_interaction(self, question: str, response: str, input_type: str, timestamp: str = None):
+        """Enregistre une interaction utilisateur"""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO interactions (timestamp, question, response, input_type) VALUES (?, ?, ?, ?)",
+                (timestamp or datetime.now().isoformat(), question, response[:200], input_type)
+            )
+
+    def record_visit(self):
+        """Enregistre un nouveau visiteur"""
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT INTO visits (timestamp) VALUES (?)", (datetime.now().isoformat(),))
+
+    def import_json(self, path: str = LEGACY_ANALYTICS_FILE) -> int:
+        """Importe un fichier analytics.json (format historique)"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+
+        rows = [
+            (i["timestamp"], i["question"], i.get("response", ""), i.get("input_type", "text"))
+            for i in data.get("interactions", [])
+        ]
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO interactions (timestamp, question, response, input_type) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            # Les visiteurs historiques n'ont pas d'horodatage : compteur à part
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_visitors', ?)",
+                (str(data.get("visitors", 0)),)
+            )
+        print(f"Analytics importées depuis {path}: {len(rows)} interactions")
+        return len(rows)
+
+    def reset(self):
+        """Supprime toutes les statistiques"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM interactions")
+            conn.execute("DELETE FROM visits")
+            conn.execute("DELETE FROM meta WHERE key = 'legacy_visitors'")
+
+    # === Lecture ===
+
+    def visitor_count(self, start=None, end=None) -> int:
+        """Nombre de visiteurs sur la période (compteur historique inclus sans filtre)"""
+        where, params = self._window(start, end)
+        with self._connect() as conn:
+            count = conn.execute(f"SELECT COUNT(*) FROM visits {where}", params).fetchone()[0]
+            if start is None and end is None:
+                row = conn.execute("SELECT value FROM meta WHERE key = 'legacy_visitors'").fetchone()
+                if row:
+                    count += int(row[0])
+        return count
+
+    def summary(self, start=None, end=None) -> dict:
+        """Totaux sur la période : visiteurs, questions, répartition par type, dernière activité"""
+        where, params = self._window(start, end)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT input_type, COUNT(*) AS n, MAX(timestamp) AS last FROM interactions {where} GROUP BY input_type",
+                params
+            ).fetchall()
+        input_counts = {row["input_type"]: row["n"] for row in rows}
+        last_timestamps = [row["last"] for row in rows if row["last"]]
+        return {
+            "total_visitors": self.visitor_count(start, end),
+            "total_questions": sum(input_counts.values()),
+            "input_counts": input_counts,
+            "last_timestamp": max(last_timestamps) if last_timestamps else None,
+        }
+
+    def hourly_histogram(self, start=None, end=None, input_type: str = None) -> list:
+        """Nombre de questions par heure : [("YYYY-MM-DDTHH", n), ...]"""
+        where, params = self._window(start, end, input_type)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT substr(timestamp, 1, 13) AS hour, COUNT(*) FROM interactions {where} GROUP BY hour ORDER BY hour",
+                params
+            ).fetchall()
+        return [(row[0], row[1]) for row in rows]
+
+    def hour_of_day_histogram(self, start=None, end=None, input_type: str = None) -> list:
+        """Nombre de questions par heure de la journée (0-23), toutes dates confondues"""
+        where, params = self._window(start, end, input_type)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT CAST(substr(timestamp, 12, 2) AS INTEGER) AS h, COUNT(*) FROM interactions {where} GROUP BY h",
+                params
+            ).fetchall()
+        counts = dict((row[0], row[1]) for row in rows)
+        return [(hour, counts.get(hour, 0)) for hour in range(24)]
+
+    def daily_trend(self, start=None, end=None, input_type: str = None) -> list:
+        """Nombre de questions par jour : [("YYYY-MM-DD", n), ...]"""
+        where, params = self._window(start, end, input_type)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT substr(timestamp, 1, 10) AS day, COUNT(*) FROM interactions {where} GROUP BY day ORDER BY day",
+                params
+            ).fetchall()
+        return [(row[0], row[1]) for row in rows]
+
+    def interactions_page(self, page: int = 1, page_size: int = 10, start=None, end=None,
+                          input_type: str = None) -> dict:
+        """Historique paginé des interactions, de la plus récente à la plus ancienne"""
+        page = max(1, page)
+        where, params = self._window(start, end, input_type)
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM interactions {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT timestamp, question, response, input_type FROM interactions {where} "
+                f"ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+                params + [page_size, (page - 1) * page_size]
+            ).fetchall()
+        return {
+            "items": [dict(row) for row in rows],
+            "total": total,
+            "page": page,
+            "pages": max(1, -(-total // page_size)),
+        }
+
+    def questions(self, start=None, end=None, input_type: str = None) -> list:
+        """Questions posées sur la période (pour le regroupement des questions similaires)"""
+        where, params = self._window(start, end, input_type)
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute(f"SELECT question FROM interactions {where}", params)]
+
+    def export(self, start=None, end=None) -> dict:
+        """Exporte la période au format historique de analytics.json"""
+        where, params = self._window(start, end)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT timestamp, question, response, input_type FROM interactions {where} ORDER BY timestamp",
+                params
+            ).fetchall()
+        return {
+            "visitors": self.visitor_count(start, end),
+            "interactions": [dict(row) for row in rows],
+        }
@@ -0,0 +1,242 @@
+"""
+Cache de réponses pré-calculées pour les questions suggérées et les plus fréquentes
+Usage: python answer_cache.py [--top 10]
+
+Les réponses sont générées une fois (au démarrage ou à la construction de
+l'index) puis rejouées avec un streaming simulé. Seules les réponses du LLM
+sont gardées : refus du filtre hors sujet et réponses de la table de faits
+sont recalculés à chaque question. Le cache est invalidé dès que les PDFs de
+docs/, le prompt système, facts.py ou topic_guard.py changent (une question
+peut alors relever du filtre ou des faits plutôt que du LLM).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Generator
+
+from question_clusters import (
+    build_canonical_index,
+    canonicalize,
+    load_question_clusters,
+    normalize_question,
+)
+
+ANSWER_CACHE_FILE = "answer_cache.json"
+DOCS_DIR = "docs"
+# Réponses directes évaluées avant le LLM : leur code fait partie de l'empreinte du cache
+DIRECT_ANSWER_MODULES = ("facts.py", "topic_guard.py")
+
+# Questions des boutons "Questions fréquentes" (model1.py et templates/index.html),
+# dans chaque langue supportée
+SUGGESTED_QUESTIONS = {
+    "french": [
+        "Quels sont les programmes offerts par EMINES ?",
+        "Quelles sont les dates limites de candidature ?",
+        "Quelles sont les dates limites ?",
+        "Comment postuler à EMINES ?",
+        "Quels sont les frais de scolarité ?",
+        "Où se trouve EMINES ?",
+        "Comment contacter EMINES ?",
+    ],
+    "english": [
+        "What programs does EMINES offer?",
+        "What are the application deadlines?",
+        "How do I apply to EMINES?",
+        "What are the tuition fees?",
+        "Where is EMINES located?",
+        "How can I contact EMINES?",
+    ],
+    "darija": [
+        "chno homa les programmes li kayna f EMINES?",
+        "imta akhir ajal bach npostuler?",
+        "kifach npostuler l EMINES?",
+        "ch7al kayt5alas f EMINES?",
+        "fin kayna EMINES?",
+        "kifach nt3awd m3a EMINES?",
+    ],
+}
+
+# Réponses à ne jamais mettre en cache (erreurs, index absent)
+_UNCACHEABLE_PREFIXES = ("Erreur", "⚠️")
+
+
+def docs_fingerprint(docs_dir: str = DOCS_DIR) -> str:
+    """Empreinte SHA-256 des PDFs du dossier docs/ (noms et contenus)"""
+    digest = hashlib.sha256()
+    if os.path.isdir(docs_dir):
+        for name in sorted(f for f in os.listdir(docs_dir) if f.endswith(".pdf")):
+            digest.update(name.encode("utf-8"))
+            with open(os.path.join(docs_dir, name), "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+def code_fingerprint(modules: tuple = DIRECT_ANSWER_MODULES) -> str:
+    """Empreinte SHA-256 du code des réponses directes (table de faits, filtre hors sujet)"""
+    digest = hashlib.sha256()
+    base = os.path.dirname(os.path.abspath(__file__))
+    for name in modules:
+        digest.update(name.encode("utf-8"))
+        with open(os.path.join(base, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def prompt_fingerprint(system_prompt: str) -> str:
+    """Empreinte SHA-256 du prompt système (hors contexte documentaire)"""
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def replay_answer(answer: str, words_per_chunk: int = 3, delay: float = 0.02) -> Generator[str, None, None]:
+    """Rejoue une réponse stockée avec un streaming simulé"""
+    tokens = re.findall(r"\S+\s*|\s+", answer)
+    for i in range(0, len(tokens), words_per_chunk):
+        yield "".join(tokens[i:i + words_per_chunk])
+        if delay:
+            time.sleep(delay)
+
+
+class AnswerCache:
+    """Réponses pré-calculées, indexées par prompt système et question canonique"""
+
+    def __init__(self, path: str = ANSWER_CACHE_FILE, docs_dir: str = DOCS_DIR):
+        self.path = path
+        self.docs_fingerprint = docs_fingerprint(docs_dir)
+        self.code_fingerprint = code_fingerprint()
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._canonical_index = {}
+        self.reload_clusters()
+        self._load()
+
+    def _load(self):
+        """Charge le fichier de cache s'il correspond aux documents actuels"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("docs_fingerprint") != self.docs_fingerprint:
+            print("Cache de réponses invalidé : les documents ont changé")
+        elif data.get("code_fingerprint") != self.code_fingerprint:
+            print("Cache de réponses invalidé : facts.py ou topic_guard.py a changé")
+        else:
+            self.entries = data.get("entries", {})
+
+    def reload_clusters(self):
+        """Recharge la table des variantes de questions (question_clusters.json)"""
+        groups = load_question_clusters() or []
+        self._canonical_index = build_canonical_index(groups)
+
+    def _key(self, question: str, system_prompt: str) -> str:
+        canonical = canonicalize(question, self._canonical_index)
+        return f"{prompt_fingerprint(system_prompt)}|{normalize_question(canonical)}"
+
+    def get(self, question: str, system_prompt: str):
+        """Retourne l'entrée en cache pour cette question, ou None"""
+        with self._lock:
+            return self.entries.get(self._key(question, system_prompt))
+
+    def put(self, question: str, language: str, answer: str, system_prompt: str) -> bool:
+        """Enregistre une réponse, sauf si c'est un message d'erreur"""
+        if not answer or answer.startswith(_UNCACHEABLE_PREFIXES):
+            return False
+        with self._lock:
+            self.entries[self._key(question, system_prompt)] = {
+                "question": question,
+                "language": language,
+                "answer": answer,
+                "created_at": datetime.now().isoformat(),
+            }
+        return True
+
+    def contains(self, question: str, system_prompt: str) -> bool:
+        return self.get(question, system_prompt) is not None
+
+    def save(self):
+        """Sauvegarde le cache sur disque"""
+        with self._lock:
+            data = {
+                "docs_fingerprint": self.docs_fingerprint,
+                "code_fingerprint": self.code_fingerprint,
+                "entries": self.entries,
+            }
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def warmup_questions(top_n: int = 10) -> list:
+    """Questions à pré-calculer : suggérées (3 langues) + groupes les plus fréquents"""
+    questions = [q for qs in SUGGESTED_QUESTIONS.values() for q in qs]
+    groups = load_question_clusters() or []
+    questions.extend(g["canonical"] for g in groups[:top_n])
+
+    seen = set()
+    unique = []
+    for question in questions:
+        key = normalize_question(question)
+        if key not in seen:
+            seen.add(key)
+            unique.append(question)
+    return unique
+
+
+def warm_up(worker, cache: AnswerCache, questions: list) -> int:
+    """Pré-calcule les réponses manquantes avec un chatbot dédié
+
+    Args:
+        worker: Instance PDFChatbot réservée au warm-up (historique isolé)
+        cache: Cache de réponses à remplir
+        questions: Questions à pré-calculer
+
+    Returns:
+        Nombre de réponses ajoutées
+    """
+    system_prompt = worker.system_prompt()
+    added = 0
+    for question in questions:
+        if cache.contains(question, system_prompt):
+            continue
+        worker.chat_history = []
+        answer = "".join(worker.generate_response(question, use_cache=False))
+        if worker.last_turn.source != "llm":
+            # Refus ou réponse factuelle : recalculés à chaque fois, toujours à jour
+            continue
+        language = worker.last_detected_language
+        if cache.put(question, language, answer, system_prompt):
+            added += 1
+            print(f"Warm-up [{language}] : {question}")
+    worker.chat_history = []
+    if added:
+        cache.save()
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-calcule les réponses des questions fréquentes")
+    parser.add_argument("--top", type=int, default=10, help="Nombre de groupes fréquents à inclure")
+    args = parser.parse_args()
+
+    from app import PDFChatbot, get_chatbot
+
+    chatbot = get_chatbot()
+    worker = PDFChatbot(vector_store=chatbot.vector_store)
+    questions = warmup_questions(args.top)
+    start = time.time()
+    added = warm_up(worker, chatbot.answer_cache, questions)
+    print(f"{added} réponse(s) ajoutée(s) sur {len(questions)} question(s) en {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ import os
 # Ajouter le dossier parent au path
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+# Import léger : le chatbot et l'index ne sont chargés qu'à la première requête API
 from app import app
 
 # Export pour Vercel
@@ -0,0 +1,125 @@
+"""
+Prétraitement optionnel de l'audio avant Whisper (AUDIO_PREPROCESS=1)
+
+Les enregistrements du navigateur (webm/ogg/wav, jusqu'à 16 Mo) sont réduits
+avant l'envoi à Whisper : suppression des silences de début et de fin,
+passage en mono, rééchantillonnage à 16 kHz et réencodage Opus compact.
+Le traitement passe par ffmpeg en mémoire (stdin/stdout, aucun fichier) et
+l'audio d'origine est conservé si ffmpeg est absent, échoue ou ne gagne rien.
+"""
+
+import os
+import shutil
+import subprocess
+import time
+
+from metrics import metrics
+
+FFMPEG_TIMEOUT = 15  # secondes
+
+# Silences de plus de 0.3 s sous -45 dB retirés au début puis (via areverse) à la fin
+_SILENCE_FILTER = (
+    "silenceremove=start_periods=1:start_duration=0:start_threshold=-45dB:start_silence=0.3,"
+    "areverse,"
+    "silenceremove=start_periods=1:start_duration=0:start_threshold=-45dB:start_silence=0.3,"
+    "areverse"
+)
+
+
+def preprocessing_enabled() -> bool:
+    return os.getenv("AUDIO_PREPROCESS", "0") == "1"
+
+
+def _ffmpeg_path():
+    return os.getenv("FFMPEG_BINARY") or shutil.which("ffmpeg")
+
+
+def preprocess_audio(audio_bytes: bytes, filename: str) -> tuple:
+    """Réduit l'audio pour Whisper : silences retirés, mono 16 kHz, Opus 24 kbit/s
+
+    Returns:
+        tuple: (octets, nom de fichier) prétraités, ou l'audio d'origine en cas d'échec
+    """
+    ffmpeg = _ffmpeg_path()
+    if not ffmpeg:
+        print("Prétraitement audio ignoré : ffmpeg introuvable")
+        return audio_bytes, filename
+
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(
+            [
+                ffmpeg, "-hide_banner", "-loglevel", "error",
+                "-i", "pipe:0",
+                "-af", _SILENCE_FILTER,
+                "-ac", "1", "-ar", "16000",
+                "-c:a", "libopus", "-b:a", "24k", "-application", "voip",
+                "-f", "ogg", "pipe:1",
+            ],
+            input=audio_bytes,
+            capture_output=True,
+            timeout=FFMPEG_TIMEOUT,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"Erreur prétraitement audio: {e}")
+        metrics.incr("audio.preprocess.failures")
+        return audio_bytes, filename
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    output = result.stdout
+
+    if result.returncode != 0 or not output:
+        print(f"Erreur prétraitement audio: {result.stderr.decode(errors='ignore')[:200]}")
+        metrics.incr("audio.preprocess.failures")
+        return audio_bytes, filename
+
+    if len(output) >= len(audio_bytes):
+        metrics.incr("audio.preprocess.skipped")
+        return audio_bytes, filename
+
+    metrics.observe("audio.preprocess_ms", elapsed_ms)
+    metrics.observe("audio.bytes_in", len(audio_bytes))
+    metrics.observe("audio.bytes_out", len(output))
+    metrics.incr("audio.bytes_saved", len(audio_bytes) - len(output))
+    print(f"Audio prétraité: {len(audio_bytes)} -> {len(output)} bytes en {elapsed_ms:.0f} ms")
+
+    base = os.path.splitext(filename)[0] or "recording"
+    return output, f"{base}.ogg"
+
+
+def prepare_for_whisper(audio_bytes: bytes, filename: str) -> tuple:
+    """Applique le prétraitement s'il est activé
+
+    Returns:
+        tuple: (octets, nom de fichier, étiquette "preprocessed" ou "raw" pour les métriques)
+    """
+    if preprocessing_enabled():
+        processed, processed_name = preprocess_audio(audio_bytes, filename)
+        if processed is not audio_bytes:
+            return processed, processed_name, "preprocessed"
+    return audio_bytes, filename, "raw"
+
+
+def record_transcription_latency(label: str, started_at: float):
+    """Enregistre la latence Whisper, séparée selon que l'audio a été prétraité ou non"""
+    metrics.observe(f"stt.latency_ms.{label}", (time.perf_counter() - started_at) * 1000)
+
+
+def audio_duration(audio_bytes: bytes) -> float:
+    """Durée de l'audio en secondes (décodage ffmpeg en PCM 16 kHz mono), ou None"""
+    ffmpeg = _ffmpeg_path()
+    if not ffmpeg:
+        return None
+    try:
+        result = subprocess.run(
+            [ffmpeg, "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+             "-ac", "1", "-ar", "16000", "-f", "s16le", "pipe:1"],
+            input=audio_bytes,
+            capture_output=True,
+            timeout=FFMPEG_TIMEOUT,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    return len(result.stdout) / (16000 * 2)
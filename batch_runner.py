@@ -0,0 +1,241 @@
+"""
+Traitement par lot de questions : évaluation hors ligne, génération de FAQ
+Usage: python batch_runner.py questions.jsonl [--output batch_answers.jsonl] [--concurrency 4] [--limit 100]
+       python batch_runner.py --analytics [--output batch_answers.jsonl]
+
+Chaque question passe par le pipeline complet de PDFChatbot (filtre hors
+sujet, faits, détection de langue, clarification, recherche, génération),
+sans Flask ni Streamlit :
+- concurrence bornée (--concurrency), un chatbot par worker (historique isolé) ;
+- questions identiques (normalisées) traitées une seule fois ;
+- embeddings et recherches partagés entre les workers : une question
+  clarifiée de la même façon n'est embeddée et recherchée qu'une fois ;
+- pour chaque réponse : origine (cache, filtre, faits, LLM), durée de chaque
+  étape (ms, turn.timings du pipeline) et tokens de génération par modèle
+  (estimés avec tiktoken).
+Les identifiants de l'entrée doivent être uniques.
+
+Entrée : une question par ligne JSON (champ --field, sinon question / message /
+query / text / title) ou les questions de la base analytics (--analytics).
+Sortie : une réponse par ligne JSON, dans l'ordre de l'entrée.
+"""
+
+import argparse
+import hashlib
+import json
+import statistics
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+from context_builder import count_tokens
+from question_clusters import normalize_question
+
+QUESTION_FIELDS = ["question", "message", "query", "text", "title"]
+ID_FIELDS = ["id", "request_id"]
+
+
+def _ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+class SharedRetrieval:
+    """Vector store partagé par les workers : embeddings et recherches identiques calculés une fois"""
+
+    def __init__(self, vector_store):
+        self.vector_store = vector_store
+        self.hits = Counter()
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.vector_store, name)
+
+    def _once(self, key, compute):
+        """Résultat de compute() pour cette clé ; les appels simultanés attendent le premier"""
+        with self._lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = self._results[key] = Future()
+        if not owner:
+            self.hits[key[0]] += 1
+            return future.result()
+        try:
+            future.set_result(compute())
+        except Exception as e:
+            with self._lock:
+                del self._results[key]  # erreur passagère : pas mise en cache
+            future.set_exception(e)
+        return future.result()
+
+    def _embed_query(self, text: str):
+        return self._once(("embed", text), lambda: self.vector_store._embed_query(text))
+
+    def similarity_search_with_score_by_vector(self, vector, k: int = 4, **scope):
+        digest = hashlib.sha1(array("f", vector).tobytes()).hexdigest()
+        key = ("search", digest, k, json.dumps(scope, sort_keys=True))
+        return self._once(key, lambda: self.vector_store.similarity_search_with_score_by_vector(vector, k, **scope))
+
+
+class Worker:
+    """Chatbot d'un thread du lot ; durées et messages lus dans le tour (chatbot.last_turn)"""
+
+    def __init__(self, retrieval: SharedRetrieval):
+        from pipeline import PDFChatbot
+
+        self.chatbot = PDFChatbot(vector_store=retrieval)
+
+    def answer(self, question: str, use_cache: bool = False) -> dict:
+        self.chatbot.chat_history = []
+        self.chatbot.last_turn = None
+        start = time.perf_counter()
+        try:
+            answer = "".join(self.chatbot.generate_response(question, use_cache=use_cache))
+            error = None
+        except Exception as e:
+            answer, error = "", str(e)
+        total = _ms(start)
+
+        turn = self.chatbot.last_turn
+        llm = turn is not None and turn.source == "llm" and turn.messages is not None
+        usage = {}
+        if llm:
+            # Génération seulement, estimée avec tiktoken (prompt envoyé, texte reçu)
+            prompt = "\n".join(str(message.get("content", "")) for message in turn.messages)
+            usage[self.chatbot.router.last_model] = {
+                "prompt_tokens": count_tokens(prompt),
+                "completion_tokens": count_tokens(answer),
+            }
+        return {
+            "answer": answer,
+            "error": error,
+            "source": turn.source if turn else None,
+            "language": turn.language if turn else self.chatbot.last_detected_language,
+            "clarified": turn.clarified if turn else None,
+            "llm": llm,
+            "model": self.chatbot.router.last_model if llm else None,
+            "stages_ms": {**(turn.timings if turn else {}), "total": total},
+            "usage": usage,
+            "usage_estimated": True,
+        }
+
+
+def load_questions(path: str, question_field: str = None) -> list:
+    """[(identifiant, question)] d'un fichier JSONL"""
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            fields = [question_field] if question_field else QUESTION_FIELDS
+            question = next((entry[name] for name in fields if entry.get(name)), None)
+            if question is None:
+                print(f"Ligne {number} ignorée : aucun champ {'/'.join(fields)}")
+                continue
+            identifier = next((entry[name] for name in ID_FIELDS if entry.get(name)), number)
+            questions.append((identifier, question))
+    return questions
+
+
+def percentile(values: list, ratio: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))]
+
+
+def print_summary(results: list, unique: int, elapsed: float, retrieval: SharedRetrieval):
+    print(f"\n{len(results)} questions ({unique} distinctes) en {elapsed:.1f}s "
+          f"({len(results) / elapsed:.1f} questions/s)")
+    stages = defaultdict(list)
+    for result in results:
+        for stage, ms in result["stages_ms"].items():
+            stages[stage].append(ms)
+    for stage, values in stages.items():
+        print(f"  {stage:<12} p50 {statistics.median(values):>8.0f} ms   p95 {percentile(values, 0.95):>8.0f} ms")
+    tokens = defaultdict(Counter)
+    for result in results:
+        if not result.get("duplicate_of"):
+            for model, usage in result["usage"].items():
+                tokens[model].update(usage)
+    for model, usage in tokens.items():
+        print(f"  {model}: {usage['prompt_tokens']} tokens en entrée, {usage['completion_tokens']} en sortie")
+    print(f"  Partagés : {retrieval.hits['embed']} embeddings, {retrieval.hits['search']} recherches ; "
+          f"{sum(1 for r in results if not r['llm'])} réponses sans LLM, "
+          f"{sum(1 for r in results if r['error'])} erreurs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Passe un lot de questions dans le pipeline du chatbot")
+    parser.add_argument("input", nargs="?", help="Fichier JSONL de questions")
+    parser.add_argument("--analytics", action="store_true", help="Questions de la base analytics")
+    parser.add_argument("--field", default=None, help="Champ contenant la question")
+    parser.add_argument("--output", default="batch_answers.jsonl", help="Fichier JSONL des réponses")
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions traitées en parallèle")
+    parser.add_argument("--limit", type=int, default=0, help="Nombre maximal de questions (0 = toutes)")
+    parser.add_argument("--use-cache", action="store_true", help="Réutiliser les réponses pré-calculées")
+    args = parser.parse_args()
+
+    if args.analytics:
+        from question_clusters import load_logged_questions
+        questions = list(enumerate(load_logged_questions(), start=1))
+    elif args.input:
+        questions = load_questions(args.input, args.field)
+    else:
+        parser.error("indiquez un fichier JSONL ou --analytics")
+    if args.limit:
+        questions = questions[:args.limit]
+    # Réponses indexées par identifiant : deux lignes de même identifiant se mélangeraient
+    repeated = [str(identifier) for identifier, count in Counter(i for i, _ in questions).items() if count > 1]
+    if repeated:
+        parser.error(f"identifiants en double dans l'entrée : {', '.join(repeated[:10])}")
+
+    # Questions identiques : une seule exécution, réponse recopiée
+    first_of = {}
+    for identifier, question in questions:
+        first_of.setdefault(normalize_question(question), (identifier, question))
+    unique = list(first_of.values())
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    from index_store import shared_vector_store
+
+    vector_store = shared_vector_store()
+    if vector_store is None:
+        print("Aucun document indexé : lancez python build_index.py")
+        return
+    retrieval = SharedRetrieval(vector_store)
+    local = threading.local()
+
+    def run(question: str) -> dict:
+        if not hasattr(local, "worker"):
+            local.worker = Worker(retrieval)
+        return local.worker.answer(question, args.use_cache)
+
+    start = time.time()
+    answers = {}
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = {pool.submit(run, question): identifier for identifier, question in unique}
+        for done, future in enumerate(as_completed(futures), start=1):
+            identifier = futures[future]
+            answers[identifier] = future.result()
+            print(f"[{done}/{len(unique)}] {answers[identifier]['stages_ms']['total']:>7.0f} ms  {identifier}")
+    elapsed = time.time() - start
+
+    results = []
+    with open(args.output, "w", encoding="utf-8") as f:
+        for identifier, question in questions:
+            source_id, _ = first_of[normalize_question(question)]
+            result = {"id": identifier, "question": question, **answers[source_id]}
+            if source_id != identifier:
+                result["duplicate_of"] = source_id
+            results.append(result)
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    print_summary(results, len(unique), elapsed, retrieval)
+    print(f"Réponses écrites dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
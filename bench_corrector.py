@@ -0,0 +1,99 @@
+"""
+Benchmark du correcteur de transcriptions : local (trie + distance d'édition) vs GPT-4o-mini
+Usage: python bench_corrector.py [--llm]
+
+- Précision du correcteur local sur des exemples annotés
+- Latence locale (µs) et taux de renvoi au LLM sur les questions vocales enregistrées
+- Avec --llm : accord local/LLM et latence du LLM sur les mêmes questions
+"""
+
+import argparse
+import statistics
+import time
+
+from analytics_store import AnalyticsStore
+from local_corrector import local_corrector
+
+# (transcription Whisper, correction attendue)
+LABELED_SAMPLES = [
+    ("Combien coûte hémine ?", "Combien coûte EMINES ?"),
+    ("Où se trouve émine exactement ?", "Où se trouve EMINES exactement ?"),
+    ("Quel est le programme de première année à l'émine ?", "Quel est le programme de première année à l'EMINES ?"),
+    ("Comment postuler à um 6p ?", "Comment postuler à UM6P ?"),
+    ("C'est loin de ben guérir ?", "C'est loin de Ben Guerir ?"),
+    ("Le diplôme de management industrielle", "Le diplôme de Management Industriel"),
+    ("kifach npostuler l emines", "kifach npostuler l EMINES"),
+    ("wach kayna bourse f émines ?", "wach kayna bourse f EMINES ?"),
+    ("Quelles écoles des mines au Maroc ?", "Quelles écoles des mines au Maroc ?"),
+    ("Comment contacter EMINES ?", "Comment contacter EMINES ?"),
+    ("La semaine d'intégration à UM6P", "La semaine d'intégration à UM6P"),
+    ("Eminnes est à benguerir ?", "EMINES est à Ben Guerir ?"),
+    ("Je m'appelle Amine, comment postuler ?", "Je m'appelle Amine, comment postuler ?"),
+    ("Les notes sont émises quand ?", "Les notes sont émises quand ?"),
+    ("Emile veut étudier à émine", "Emile veut étudier à EMINES"),
+]
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def time_local(text: str, repeat: int = 200) -> float:
+    """Latence moyenne d'une correction locale, en microsecondes"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        local_corrector.correct(text)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du correcteur de transcriptions")
+    parser.add_argument("--llm", action="store_true", help="Comparer avec GPT-4o-mini (appels API)")
+    args = parser.parse_args()
+
+    # === Exemples annotés ===
+    print("=== Exemples annotés ===")
+    correct = 0
+    for raw, expected in LABELED_SAMPLES:
+        result = local_corrector.correct(raw)
+        ok = result.text == expected
+        correct += ok
+        status = "OK " if ok else ("LLM" if not result.confident else "KO ")
+        print(f"  [{status}] {raw!r} -> {result.text!r}")
+    print(f"Précision locale : {correct}/{len(LABELED_SAMPLES)} ({correct / len(LABELED_SAMPLES):.0%})")
+
+    # === Questions vocales enregistrées ===
+    questions = AnalyticsStore().questions(input_type="voice") or [raw for raw, _ in LABELED_SAMPLES]
+    print(f"\n=== {len(questions)} questions vocales ===")
+
+    latencies = [time_local(q) for q in questions]
+    results = [local_corrector.correct(q) for q in questions]
+    fallbacks = sum(1 for r in results if not r.confident)
+    print(f"Latence locale : moyenne {statistics.mean(latencies):.1f} µs, p95 {_percentile(latencies, 0.95):.1f} µs")
+    print(f"Renvois au LLM : {fallbacks}/{len(questions)} ({fallbacks / len(questions):.0%})")
+
+    if not args.llm:
+        return
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    from pipeline import TranscriptionCorrector
+
+    corrector = TranscriptionCorrector()
+    agreements = 0
+    llm_latencies = []
+    for question, result in zip(questions, results):
+        start = time.perf_counter()
+        llm_text = corrector.correct_with_llm(question)
+        llm_latencies.append((time.perf_counter() - start) * 1000)
+        if llm_text.strip() == result.text.strip():
+            agreements += 1
+        else:
+            print(f"  ≠ local={result.text!r} llm={llm_text!r}")
+    print(f"Latence LLM : moyenne {statistics.mean(llm_latencies):.0f} ms, p95 {_percentile(llm_latencies, 0.95):.0f} ms")
+    print(f"Accord local/LLM : {agreements}/{len(questions)} ({agreements / len(questions):.0%})")
+
+
+if __name__ == "__main__":
+    main()
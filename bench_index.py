@@ -0,0 +1,137 @@
+"""
+Benchmark des types d'index FAISS : mémoire, construction, latence et rappel@k
+Usage: python bench_index.py [--synthetic 20000] [--queries 200] [-k 3] [--types flat sq8 hnsw] [--dimensions 3072 1024 256]
+
+Vecteurs : ceux de l'index actif (index/CURRENT), ou --synthetic N vecteurs
+groupés autour de thèmes pour simuler le catalogue complet de l'UM6P (aucun
+appel API). Les questions sont des vecteurs tirés des mêmes thèmes, hors index.
+
+- Mémoire : taille sérialisée de l'index (≈ mémoire occupée)
+- Rappel@k : part des k voisins exacts (Flat, dimension complète) retrouvés
+- Dimensions réduites : les k premières composantes renormalisées, ce que
+  renvoie l'API text-embedding-3 avec `dimensions` (embeddings Matryoshka)
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+import index_store
+
+FULL_DIMENSIONS = 3072
+
+
+def load_active_vectors():
+    """Vecteurs de l'index actif, toutes écoles confondues (lecture en mémoire)"""
+    import faiss
+
+    version_dir = index_store.current_version()
+    if version_dir is None:
+        return None
+    parts = []
+    for partition in index_store.read_manifest(version_dir).get("partitions", {}).values():
+        index = faiss.read_index(f"{version_dir}/{partition['name']}.faiss")
+        parts.append(index.reconstruct_n(0, index.ntotal))
+    return np.concatenate(parts) if parts else None
+
+
+def synthetic_vectors(count: int, dimensions: int = FULL_DIMENSIONS, topics: int = 50, seed: int = 0):
+    """Vecteurs normalisés groupés autour de `topics` thèmes
+
+    La variance décroît avec l'indice de la composante, comme pour les
+    embeddings Matryoshka où les premières dimensions portent l'essentiel
+    du sens ; le rappel en dimension réduite reste indicatif sur ces données.
+    """
+    rng = np.random.default_rng(seed)
+    spectrum = (1 + np.arange(dimensions) / 64) ** -1
+    centers = rng.standard_normal((topics, dimensions)) * spectrum
+    noise = 0.8 * rng.standard_normal((count, dimensions)) * spectrum
+    return normalize((centers[rng.integers(0, topics, count)] + noise).astype("float32"))
+
+
+def normalize(vectors):
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype("float32")
+
+
+def reduce(vectors, dimensions: int):
+    return normalize(vectors[:, :dimensions]) if dimensions < vectors.shape[1] else vectors
+
+
+def exact_neighbours(vectors, queries, k: int):
+    import faiss
+
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    return index.search(queries, k)[1]
+
+
+def run(index_type: str, dimensions: int, vectors, queries, truth, k: int) -> dict:
+    import faiss
+
+    data = reduce(vectors, dimensions)
+    query_data = reduce(queries, dimensions)
+
+    start = time.perf_counter()
+    index = index_store.make_faiss_index(index_type, data)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    found = []
+    for i in range(len(query_data)):
+        start = time.perf_counter()
+        _, neighbours = index.search(query_data[i:i + 1], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(neighbours[0])
+
+    recall = statistics.mean(
+        len(set(result) & set(expected)) / k for result, expected in zip(found, truth)
+    )
+    ordered = sorted(latencies)
+    return {
+        "memory_mb": len(faiss.serialize_index(index)) / (1024 * 1024),
+        "build_ms": build_ms,
+        "p50_ms": ordered[len(ordered) // 2],
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "recall": recall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des types d'index FAISS")
+    parser.add_argument("--synthetic", type=int, default=0, help="Nombre de vecteurs synthétiques (0 = index actif)")
+    parser.add_argument("--queries", type=int, default=200, help="Nombre de questions simulées")
+    parser.add_argument("-k", type=int, default=3, help="Nombre de voisins (comme la recherche du chatbot)")
+    parser.add_argument("--types", nargs="+", default=list(index_store.INDEX_TYPES), choices=list(index_store.INDEX_TYPES))
+    parser.add_argument("--dimensions", nargs="+", type=int, default=[FULL_DIMENSIONS, 1024, 256])
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic + args.queries)
+        vectors, queries = vectors[:args.synthetic], vectors[args.synthetic:]
+    else:
+        vectors = load_active_vectors()
+        if vectors is None:
+            print("Aucun index actif : lancez python build_index.py ou utilisez --synthetic N")
+            return
+        # Questions simulées : morceaux de l'index légèrement bruités
+        rng = np.random.default_rng(0)
+        picked = vectors[rng.integers(0, len(vectors), args.queries)]
+        queries = normalize(picked + 0.02 * rng.standard_normal(picked.shape).astype("float32"))
+
+    k = min(args.k, len(vectors))
+    truth = exact_neighbours(vectors, queries, k)
+    print(f"{len(vectors)} vecteurs de dimension {vectors.shape[1]}, {len(queries)} questions, k={k}\n")
+    print(f"{'Type':<9} {'Dim':>5} {'Mémoire':>9} {'Constr.':>9} {'p50':>8} {'p95':>8} {'Rappel@' + str(k):>9}")
+    for dimensions in args.dimensions:
+        for index_type in args.types:
+            if index_type.startswith("ivf") and len(vectors) < 39:
+                continue  # pas assez de vecteurs pour entraîner les listes IVF
+            r = run(index_type, min(dimensions, vectors.shape[1]), vectors, queries, truth, k)
+            print(f"{index_type:<9} {dimensions:>5} {r['memory_mb']:>7.1f}Mo {r['build_ms']:>7.0f}ms "
+                  f"{r['p50_ms']:>6.2f}ms {r['p95_ms']:>6.2f}ms {r['recall']:>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
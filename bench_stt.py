@@ -0,0 +1,119 @@
+"""
+Benchmark des backends STT : taux d'erreur de mots (WER) et facteur temps réel (RTF)
+Usage: python bench_stt.py [--manifest stt_samples/manifest.jsonl] [--backends openai local]
+
+Le manifeste liste des enregistrements annotés, un JSON par ligne :
+    {"audio": "fr_01.webm", "language": "french", "reference": "Combien coûte EMINES ?"}
+(chemin relatif au manifeste ; language parmi french / english / darija)
+
+- WER : distance d'édition en mots entre transcription et référence normalisées
+- RTF : temps de transcription / durée de l'audio (< 1 = plus rapide que le temps réel)
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+import wave
+from collections import defaultdict
+
+from audio_preprocessing import audio_duration
+from question_clusters import normalize_question
+from stt_backends import LocalWhisperBackend, create_stt_backend
+
+DEFAULT_MANIFEST = os.path.join("stt_samples", "manifest.jsonl")
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """WER = (substitutions + suppressions + insertions) / mots de la référence"""
+    ref = normalize_question(reference).split()
+    hyp = normalize_question(hypothesis).split()
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i]
+        for j, h in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h)))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def _duration(path: str, audio_bytes: bytes) -> float:
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as f:
+            return f.getnframes() / f.getframerate()
+    return audio_duration(audio_bytes)
+
+
+def load_samples(manifest: str) -> list:
+    base = os.path.dirname(manifest)
+    samples = []
+    with open(manifest, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            sample = json.loads(line)
+            path = os.path.join(base, sample["audio"])
+            with open(path, "rb") as audio:
+                sample["bytes"] = audio.read()
+            sample["path"] = path
+            sample["duration"] = _duration(path, sample["bytes"])
+            samples.append(sample)
+    return samples
+
+
+def run_backend(backend, samples: list) -> dict:
+    """WER et RTF par langue pour un backend"""
+    per_language = defaultdict(lambda: {"wer": [], "rtf": []})
+    for sample in samples:
+        start = time.perf_counter()
+        transcription = backend.transcribe(sample["bytes"], os.path.basename(sample["path"]))
+        elapsed = time.perf_counter() - start
+        wer = word_error_rate(sample["reference"], transcription.text)
+        stats = per_language[sample.get("language", "?")]
+        stats["wer"].append(wer)
+        if sample["duration"]:
+            stats["rtf"].append(elapsed / sample["duration"])
+        print(f"  [{backend.name}] {sample['audio']}: WER {wer:.0%}, {elapsed:.2f}s -> {transcription.text!r}")
+    return per_language
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark WER / RTF des backends STT")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="Manifeste JSONL des échantillons annotés")
+    parser.add_argument("--backends", nargs="+", default=["openai", "local"], choices=["openai", "local"])
+    args = parser.parse_args()
+
+    if not os.path.exists(args.manifest):
+        print(f"Manifeste introuvable : {args.manifest}")
+        print('Créez-le avec une ligne par enregistrement : {"audio": "fr_01.webm", "language": "french", "reference": "..."}')
+        return
+
+    samples = load_samples(args.manifest)
+    print(f"{len(samples)} échantillons chargés")
+
+    from dotenv import load_dotenv
+    from openai import OpenAI
+    load_dotenv()
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    results = {}
+    for name in args.backends:
+        if name == "local" and not LocalWhisperBackend.available():
+            print("Backend local ignoré : faster-whisper n'est pas installé (pip install faster-whisper)")
+            continue
+        print(f"\n=== Backend {name} ===")
+        results[name] = run_backend(create_stt_backend(client, name), samples)
+
+    print("\n=== Résumé ===")
+    print(f"{'Backend':<8} {'Langue':<8} {'N':>3} {'WER':>6} {'RTF':>6}")
+    for name, per_language in results.items():
+        for language, stats in sorted(per_language.items()):
+            rtf = f"{statistics.mean(stats['rtf']):.2f}" if stats["rtf"] else "?"
+            print(f"{name:<8} {language:<8} {len(stats['wer']):>3} {statistics.mean(stats['wer']):>6.1%} {rtf:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark du filtre hors sujet : précision et rappel sur des questions annotées
+Usage: python bench_topic_guard.py [--embeddings] [--threshold 0.18]
+
+- Sans option : règles de mots-clés seules (aucun appel API)
+- Avec --embeddings : charge l'index docs/ et ajoute la similarité aux thèmes
+  (un embedding par question), avec la similarité de chaque question affichée
+  pour régler TOPIC_GUARD_MIN_SIMILARITY
+"""
+
+import argparse
+import time
+
+from topic_guard import TopicGuard, guess_language
+
+# (question, verdict attendu : "other_school", "off_topic" ou None si la question doit passer)
+LABELED_SAMPLES = [
+    ("Quels sont les programmes de l'Africa Business School ?", "other_school"),
+    ("Comment s'inscrire au College of Computing ?", "other_school"),
+    ("What does the Green Tech Institute offer?", "other_school"),
+    ("Quelles formations propose SAP+D ?", "other_school"),
+    ("Les frais de scolarité à ABS ?", "other_school"),
+    ("chno kayqraw f GTI ?", "other_school"),
+    ("Quel temps fait-il à Ben Guerir demain ?", None),
+    ("Quelle est la météo aujourd'hui ?", "off_topic"),
+    ("Qui a gagné le match de football hier ?", "off_topic"),
+    ("Donne-moi une recette de tajine", "off_topic"),
+    ("Tell me a joke", "off_topic"),
+    ("Qui est le meilleur chanteur marocain ?", "off_topic"),
+    ("What is the price of bitcoin?", "off_topic"),
+    ("Où se trouve EMINES ?", None),
+    ("Combien coûte la formation ?", None),
+    ("Quelle différence entre EMINES et ABS ?", None),
+    ("Comment postuler au cycle ingénieur ?", None),
+    ("What scholarships are available?", None),
+    ("wach kayna bourse ?", None),
+    ("Quels débouchés après le diplôme ?", None),
+    ("Et les dates du concours ?", None),
+    ("Comment contacter l'administration ?", None),
+    # Mots hors sujet ailleurs, mais courants dans la vie étudiante
+    ("Quelle série de bac faut-il pour postuler ?", None),
+    ("Qui est le président de l'université ?", None),
+    ("Y a-t-il un club de musique ?", None),
+    ("Quelles activités sportives comme le football ?", None),
+    ("Comment est la cuisine dans les résidences ?", None),
+    ("Combien d'abs sont tolérées par semestre ?", None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Précision / rappel du filtre hors sujet")
+    parser.add_argument("--embeddings", action="store_true", help="Ajouter la similarité aux thèmes de l'index (appels API)")
+    parser.add_argument("--threshold", type=float, default=None, help="Similarité minimale (défaut : TOPIC_GUARD_MIN_SIMILARITY)")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        from dotenv import load_dotenv
+        load_dotenv()
+        from index_store import load_vector_store
+        guard = TopicGuard(load_vector_store(), use_embeddings=True)
+    else:
+        guard = TopicGuard(use_embeddings=False)
+    if args.threshold is not None:
+        guard.min_similarity = args.threshold
+
+    true_positives = false_positives = false_negatives = 0
+    latencies = []
+    print("=== Questions annotées ===")
+    for question, expected in LABELED_SAMPLES:
+        start = time.perf_counter()
+        verdict = guard._check(question, first_turn=True)
+        latencies.append((time.perf_counter() - start) * 1000)
+        predicted = verdict.kind if verdict else None
+
+        if predicted and predicted == expected:
+            true_positives += 1
+        elif predicted:
+            false_positives += 1
+        if expected and predicted != expected:
+            false_negatives += 1
+
+        status = "OK" if predicted == expected else "KO"
+        detail = f" ({verdict.reason})" if verdict else ""
+        if args.embeddings and guard.use_embeddings:
+            detail += f" sim={guard.topic_similarity(question):.3f}"
+        print(f"  [{status}] {question!r} [{guess_language(question)}] -> {predicted}{detail}")
+
+    blocked = true_positives + false_positives
+    expected_blocked = true_positives + false_negatives
+    precision = true_positives / blocked if blocked else 1.0
+    recall = true_positives / expected_blocked if expected_blocked else 1.0
+    print("\n=== Résumé ===")
+    print(f"Précision : {precision:.0%} ({true_positives}/{blocked} refus justifiés)")
+    print(f"Rappel    : {recall:.0%} ({true_positives}/{expected_blocked} questions hors périmètre interceptées)")
+    print(f"Latence   : {sum(latencies) / len(latencies):.2f} ms en moyenne")
+
+
+if __name__ == "__main__":
+    main()
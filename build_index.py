@@ -0,0 +1,193 @@
+"""
+Construction hors ligne de l'index documentaire (artefact versionné à déployer)
+Usage: python build_index.py [--dry-run] [--force] [--chunk-size 2000] [--chunk-overlap 200] [--keep 3]
+                             [--index-type flat|fp16|sq8|hnsw|hnsw-sq8|ivf|ivf-sq8] [--dimensions 1024]
+
+Étapes : extraction des PDFs de docs/, découpage, embeddings, écriture de
+l'index FAISS, de l'index lexical (BM25) et de la table de faits (facts.py)
+dans index/<version>/ avec un manifeste (modèle, paramètres de découpage,
+empreintes des fichiers, date).
+index/CURRENT pointe vers la dernière version ; les serveurs ne font que la
+charger (index_store.load_vector_store).
+
+- --dry-run : statistiques (pages, caractères, morceaux, tokens estimés) et
+  différences avec la version active, sans appel d'embeddings ni écriture
+- sans changement de documents ni de paramètres, rien n'est reconstruit
+  (--force pour reconstruire quand même)
+- --index-type : index exact (flat), compressé (fp16, sq8) ou approché (hnsw,
+  ivf...) ; --dimensions : embeddings réduits (text-embedding-3), voir bench_index.py
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+import facts
+import index_store
+from index_store import (CURRENT_FILE, LEXICAL_FILE, MANIFEST_FILE, build_partitions,
+                         chunk_documents, current_version, extract_documents, file_sha256, read_manifest)
+
+# Estimation grossière : ~4 caractères par token
+CHARS_PER_TOKEN = 4
+
+
+def diff_manifests(previous: dict, current: dict) -> list:
+    """Différences lisibles entre deux manifestes (documents, paramètres, volume)"""
+    if previous is None:
+        return ["Aucune version précédente"]
+    changes = []
+    old_docs = {d["file"]: d for d in previous.get("documents", [])}
+    new_docs = {d["file"]: d for d in current["documents"]}
+    for name in sorted(new_docs.keys() - old_docs.keys()):
+        changes.append(f"+ {name} ({new_docs[name]['pages']} pages)")
+    for name in sorted(old_docs.keys() - new_docs.keys()):
+        changes.append(f"- {name}")
+    for name in sorted(new_docs.keys() & old_docs.keys()):
+        if new_docs[name]["sha256"] != old_docs[name]["sha256"]:
+            changes.append(f"~ {name} (modifié : {old_docs[name]['characters']} -> "
+                           f"{new_docs[name]['characters']} caractères)")
+    for key in ("embedding_model", "chunking", "index", "facts_extractor"):
+        if previous.get(key) != current.get(key):
+            changes.append(f"~ {key} : {previous.get(key)} -> {current.get(key)}")
+    if previous.get("chunks") != current.get("chunks"):
+        changes.append(f"~ morceaux : {previous.get('chunks')} -> {current.get('chunks')}")
+    return changes or ["Aucun changement"]
+
+
+def content_key(manifest: dict) -> str:
+    """Ce qui détermine le contenu de l'index (hors date de construction)"""
+    return json.dumps({
+        "documents": [d["sha256"] for d in manifest["documents"]],
+        "embedding_model": manifest["embedding_model"],
+        "chunking": manifest["chunking"],
+        "index": manifest.get("index"),
+        "facts_extractor": manifest.get("facts_extractor"),
+    }, sort_keys=True)
+
+
+def prune_versions(output: str, keep: int, current: str):
+    """Supprime les versions les plus anciennes au-delà de `keep`"""
+    versions = sorted(
+        name for name in os.listdir(output)
+        if os.path.isdir(os.path.join(output, name)) and os.path.exists(os.path.join(output, name, MANIFEST_FILE))
+    )
+    for name in versions[:-keep] if keep > 0 else []:
+        if name != current:
+            shutil.rmtree(os.path.join(output, name))
+            print(f"Ancienne version supprimée : {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construit l'index documentaire versionné")
+    parser.add_argument("--docs", default=index_store.DOCS_DIR, help="Dossier des PDFs")
+    parser.add_argument("--output", default=index_store.INDEX_DIR, help="Dossier des versions de l'index")
+    parser.add_argument("--chunk-size", type=int, default=index_store.CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=index_store.CHUNK_OVERLAP)
+    parser.add_argument("--dry-run", action="store_true", help="Statistiques et différences, sans embeddings ni écriture")
+    parser.add_argument("--force", action="store_true", help="Reconstruire même sans changement")
+    parser.add_argument("--keep", type=int, default=3, help="Nombre de versions conservées")
+    parser.add_argument("--index-type", default=index_store.DEFAULT_INDEX_TYPE, choices=sorted(index_store.INDEX_TYPES),
+                        help="Type d'index FAISS")
+    parser.add_argument("--dimensions", type=int, default=None,
+                        help="Dimension réduite des embeddings (défaut : 3072, dimension complète)")
+    args = parser.parse_args()
+
+    start = time.time()
+    documents = extract_documents(args.docs)
+    if not documents:
+        print(f"Aucun PDF dans {args.docs}/")
+        return
+    texts, metadatas, ids = chunk_documents(documents, args.chunk_size, args.chunk_overlap)
+
+    manifest = {
+        "embedding_model": index_store.EMBEDDING_MODEL,
+        "chunking": {
+            "splitter": "RecursiveCharacterTextSplitter",
+            "chunk_size": args.chunk_size,
+            "chunk_overlap": args.chunk_overlap,
+        },
+        "documents": [
+            {key: d[key] for key in ("file", "school", "sha256", "pages", "chunks")} | {"characters": len(d["text"])}
+            for d in documents
+        ],
+        "chunks": len(texts),
+        "index": {
+            "type": args.index_type,
+            "dimensions": args.dimensions,
+            "ef_search": index_store.HNSW_EF_SEARCH,
+            "nprobe": index_store.IVF_NPROBE,
+        },
+        # Extraction des faits modifiée : facts.json doit être régénéré
+        "facts_extractor": file_sha256(facts.__file__),
+    }
+
+    characters = sum(len(text) for text in texts)
+    print("=== Documents ===")
+    for d in manifest["documents"]:
+        print(f"  [{d['school']}] {d['file']}: {d['pages']} pages, {d['characters']} caractères, {d['chunks']} morceaux")
+    print(f"Total : {len(texts)} morceaux, {characters} caractères, ~{characters // CHARS_PER_TOKEN} tokens à embedder")
+    # Faits structurés (dates, durées, contacts, lieu) pour les réponses sans LLM
+    extracted = facts.extract_facts(documents)
+    print(f"Faits extraits : {dict(Counter(fact['kind'] for fact in extracted))}")
+
+    previous_dir = current_version(args.output)
+    previous = read_manifest(previous_dir) if previous_dir else None
+    print(f"\n=== Différences avec {os.path.basename(previous_dir) if previous_dir else 'aucune version'} ===")
+    for change in diff_manifests(previous, manifest):
+        print(f"  {change}")
+
+    if args.dry_run:
+        return
+    if previous and content_key(previous) == content_key(manifest) and not args.force:
+        print("\nIndex à jour, rien à reconstruire (--force pour reconstruire)")
+        return
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    print("\nCalcul des embeddings...")
+    embedding = index_store.embeddings(args.dimensions)
+    vectors = np.array(embedding.embed_documents(texts), dtype="float32")
+    vector_store = build_partitions(texts, metadatas, ids, vectors, embedding, args.index_type)
+
+    built_at = datetime.now()
+    version = f"{built_at:%Y%m%d-%H%M%S}"
+    version_dir = os.path.join(args.output, version)
+    # Écriture dans un dossier temporaire : CURRENT ne pointe jamais vers une version incomplète
+    tmp_dir = f"{version_dir}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    partitions = vector_store.save(tmp_dir)
+    with open(os.path.join(tmp_dir, LEXICAL_FILE), "w", encoding="utf-8") as f:
+        json.dump(vector_store.lexical.data, f, ensure_ascii=False)
+    with open(os.path.join(tmp_dir, facts.FACTS_FILE), "w", encoding="utf-8") as f:
+        json.dump({"facts": extracted}, f, ensure_ascii=False, indent=2)
+
+    manifest.update({
+        "version": version,
+        "built_at": built_at.isoformat(timespec="seconds"),
+        "embedding_dimensions": vectors.shape[1],
+        "partitions": partitions,
+        "facts": dict(Counter(fact["kind"] for fact in extracted)),
+        "files": {name: file_sha256(os.path.join(tmp_dir, name)) for name in sorted(os.listdir(tmp_dir))},
+    })
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_dir, version_dir)
+
+    pointer_tmp = os.path.join(args.output, f"{CURRENT_FILE}.tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(pointer_tmp, os.path.join(args.output, CURRENT_FILE))
+
+    prune_versions(args.output, args.keep, version)
+    print(f"\nVersion {version} écrite dans {version_dir}/ en {time.time() - start:.1f}s ({len(texts)} vecteurs)")
+
+
+if __name__ == "__main__":
+    main()
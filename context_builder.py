@@ -0,0 +1,142 @@
+"""
+Assemblage du contexte documentaire envoyé au LLM : dédoublonnage et budget de tokens
+
+Les morceaux voisins se chevauchent (CHUNK_OVERLAP) et les brochures répètent
+les mêmes paragraphes (adresse, présentation de l'UM6P...) : joints tels
+quels, ils gonflaient le prompt. Le contexte est construit à partir des
+passages trouvés par la recherche :
+- passages quasi identiques à un passage déjà retenu écartés (similarité de
+  Jaccard sur des séquences de mots) ;
+- lignes déjà présentes dans un passage retenu supprimées (chevauchement,
+  paragraphes répétés) ;
+- passages retenus par score, jusqu'au budget de tokens (CONTEXT_MAX_TOKENS),
+  le dernier étant tronqué s'il reste assez de place ;
+- passages présentés dans l'ordre des documents (source, position du morceau).
+Les tokens sont comptés avec tiktoken (cl100k_base) ; sans l'encodage
+(installation hors ligne), avec une estimation de 4 caractères par token.
+Tokens et passages du contexte sont suivis dans /api/metrics.
+"""
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+from metrics import metrics
+from question_clusters import normalize_question
+
+MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "1500"))
+# Passages demandés à la recherche : le dédoublonnage libère de la place pour les suivants
+FETCH_K = int(os.getenv("CONTEXT_FETCH_K", "5"))
+NEAR_DUPLICATE = 0.8   # similarité de Jaccard au-delà de laquelle un passage est un doublon
+SHINGLE_WORDS = 5
+MIN_LINE_CHARS = 30    # lignes plus courtes (titres, puces) jamais supprimées
+MIN_TRUNCATED_TOKENS = 100
+CHARS_PER_TOKEN = 4
+ENCODING = "cl100k_base"
+
+
+@dataclass
+class Context:
+    text: str
+    tokens: int
+    passages: int
+    duplicates: int = 0
+    truncated: bool = False
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(ENCODING)
+    except Exception as e:
+        print(f"Tokenizer indisponible ({e}), estimation à {CHARS_PER_TOKEN} caractères par token")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Début du texte tenant dans max_tokens, coupé à la dernière ligne complète si possible"""
+    encoding = _encoding()
+    if encoding is None:
+        cut = text[:max_tokens * CHARS_PER_TOKEN]
+    else:
+        cut = encoding.decode(encoding.encode(text)[:max_tokens])
+    if len(cut) < len(text) and "\n" in cut:
+        cut = cut[:cut.rindex("\n")]
+    return cut.rstrip()
+
+
+def _shingles(text: str) -> set:
+    words = normalize_question(text).split()
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def _new_lines(text: str, seen: set) -> str:
+    """Lignes du passage absentes des passages déjà retenus"""
+    kept = []
+    for line in text.splitlines():
+        key = normalize_question(line)
+        if len(key) >= MIN_LINE_CHARS and not line.startswith("[FORMATION:"):
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(line)
+    return "\n".join(kept).strip()
+
+
+def build_context(scored_docs: list, max_tokens: int = MAX_TOKENS) -> Context:
+    """Contexte à partir de (document, distance) triés ou non, dans la limite de max_tokens"""
+    selected = []      # (document, texte retenu)
+    kept_shingles = []
+    seen_lines = set()
+    duplicates = 0
+    truncated = False
+    used = 0
+    for doc, _ in sorted(scored_docs, key=lambda result: result[1]):
+        shingles = _shingles(doc.page_content)
+        if any(_jaccard(shingles, other) >= NEAR_DUPLICATE for other in kept_shingles):
+            duplicates += 1
+            continue
+        text = _new_lines(doc.page_content, seen_lines)
+        if not text or (text.startswith("[FORMATION:") and "\n" not in text):
+            duplicates += 1  # entièrement contenu dans les passages retenus
+            continue
+        tokens = count_tokens(text)
+        if used + tokens > max_tokens:
+            remaining = max_tokens - used
+            if remaining >= MIN_TRUNCATED_TOKENS:
+                text = truncate_tokens(text, remaining)
+                tokens = count_tokens(text)
+                selected.append((doc, text))
+                used += tokens
+            truncated = True
+            break
+        kept_shingles.append(shingles)
+        selected.append((doc, text))
+        used += tokens
+
+    # Ordre des documents : les passages d'une même brochure se lisent à la suite
+    selected.sort(key=lambda item: (item[0].metadata.get("source", ""), item[0].metadata.get("chunk", 0)))
+    text = "\n\n".join(passage for _, passage in selected)
+    context = Context(text, count_tokens(text) if text else 0, len(selected), duplicates, truncated)
+
+    metrics.observe("context.tokens", context.tokens)
+    metrics.observe("context.passages", context.passages)
+    if duplicates:
+        metrics.incr("context.duplicates", duplicates)
+    if truncated:
+        metrics.incr("context.truncated")
+    return context
@@ -0,0 +1,486 @@
+"""
+Table de faits structurés pour les questions fréquentes (dates limites, durées, contacts, lieu)
+
+"Quelles sont les dates limites de candidature ?" passait par tout le
+pipeline (langue, clarification, recherche, génération) alors que la réponse
+tient en quelques lignes des brochures. Les faits sont extraits des PDFs à la
+construction de l'index (build_index.py -> facts.json, avec l'index) :
+- dates de l'agenda d'admission de chaque cycle ;
+- durée de chaque cycle ;
+- emails, sites web et téléphones ;
+- adresse et temps d'accès (voiture, train, avion).
+Chaque fait garde sa provenance (fichier, page). Une question qui porte
+nettement sur l'un de ces sujets reçoit une réponse construite à partir d'un
+modèle, en français, anglais ou darija, rejouée aussitôt sans appel LLM ; sans
+fait correspondant, la question suit le pipeline normal.
+
+La table est relue quand index/CURRENT change (nouvelle version de l'index),
+vérifié au plus toutes les FACTS_REFRESH_SECONDS ; sans artefact, les faits
+sont extraits directement des PDFs de docs/.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+import index_store
+from metrics import metrics
+from question_clusters import normalize_question
+
+FACTS_FILE = "facts.json"
+ENABLED = os.getenv("FACTS_ANSWERS", "1") == "1"
+REFRESH_SECONDS = float(os.getenv("FACTS_REFRESH_SECONDS", "30"))
+# École dont les faits sont donnés quand aucun périmètre n'est demandé
+DEFAULT_SCHOOL = os.getenv("FACTS_SCHOOL", "EMINES")
+
+MONTHS = r"janvier|f[ée]vrier|mars|avril|mai|juin|juillet|ao[uû]t|septembre|octobre|novembre|d[ée]cembre"
+DATE_RE = re.compile(rf"(?:\b\d{{1,2}}(?:er)?\s+|\bmi-)(?:{MONTHS})\s+\d{{4}}", re.IGNORECASE)
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[a-z]{2,}", re.IGNORECASE)
+WEBSITE_RE = re.compile(r"(?:https?://)?(?:www\.)([\w-]+(?:\.[\w-]+)*\.(?:org|ma|com|fr|net))|"
+                        r"https?://([\w-]+(?:\.[\w-]+)*\.(?:org|ma|com|fr|net))", re.IGNORECASE)
+PHONE_RE = re.compile(r"\+\d{3}\s*(?:\(0\)\s*)?\d[\d ]{7,}\d")
+TRAVEL_RE = re.compile(r"(\d+\s*(?:minutes|mn|min)\b|\d+h\d*)\s+(?:au (?:nord|sud|est|ouest) )?de ([A-Z]\w+)")
+TRAVEL_FROM_RE = re.compile(r"de ([A-Z]\w+) est à (\d+\s*(?:minutes|mn|min)\b|\d+h\d*)")
+YEARS_RE = re.compile(r"\b(\d+|deux|trois|quatre|cinq|six)\s+(ans|ann[ée]es|semestres)\b", re.IGNORECASE)
+NUMBERS = {"deux": 2, "trois": 3, "quatre": 4, "cinq": 5, "six": 6}
+
+# Cycles repérés dans le texte (normalisé)
+PROGRAMS = {
+    "prepa": re.compile(r"cycle preparatoire"),
+    "ingenieur": re.compile(r"cycle ingenieur"),
+}
+# Sujets de question (mots-clés normalisés, plus stricts que intent_budget :
+# "Comment postuler ?" appelle une explication, pas une liste de dates)
+QUESTION_KEYWORDS = {
+    "deadlines": [
+        "date limite", "dates limites", "deadline", "deadlines", "calendrier", "agenda",
+        "akhir ajal", "akhir date",
+    ],
+    "duration": [
+        "duree", "combien d annees", "combien d ans", "combien de temps dure", "how long", "duration",
+        "how many years", "ch7al mn 3am", "ch7al dyal snin",
+    ],
+    "contact": [
+        "contact", "contacter", "email", "mail", "telephone", "numero", "joindre", "phone",
+        "reach", "ntwasel", "nt3awd",
+    ],
+    "location": [
+        "ou se trouve", "ou est situe", "ou est situee", "adresse", "localisation", "address",
+        "where is", "located", "fin kayna", "fin kayn", "fin jat",
+    ],
+}
+# Lieu et contact : seulement si la question désigne l'école ("Où se trouve la bibliothèque ?" -> LLM)
+SUBJECT_KINDS = {"contact", "location"}
+SUBJECT_WORDS = ["ecole", "school", "universite", "university", "campus", "um6p", "madrasa"]
+# Dates et durée : seulement si la question porte sur l'admission ou les cycles
+# ("durée du stage", "calendrier des cours", "date limite pour payer les frais" -> LLM)
+CONTEXT_WORDS = {
+    "deadlines": [
+        "admission", "admissions", "candidature", "candidatures", "candidater", "postuler", "inscription",
+        "inscriptions", "concours", "apply", "application", "applications", "tasjil", "tsjil",
+        "npostuler", "nsjel", "nsejel", "ntsejel", "nqdem",
+    ],
+    "duration": [
+        "formation", "formations", "cycle", "cycles", "cursus", "programme", "programmes", "diplome",
+        "ingenieur", "prepa", "preparatoire", "program", "programs", "degree", "engineering",
+        "preparatory", "l9raya",
+    ],
+}
+# Sans autre précision ("Quelles sont les dates limites ?", question suggérée), les
+# dates limites sont celles de l'admission : question faite de ces seuls mots en plus du sujet
+UNQUALIFIED_KINDS = {"deadlines"}
+FILLER_WORDS = {
+    "quel", "quels", "quelle", "quelles", "sont", "est", "les", "la", "le", "l", "des", "de", "d", "du",
+    "a", "au", "aux", "vos", "votre", "pour", "ce", "c", "quoi", "what", "which", "when", "are", "is",
+    "the", "your", "imta", "chno", "chnou", "achno", "homa", "hiya", "wach", "dyal", "dial",
+}
+# Autres sujets dans la même question : la table ne couvre que l'agenda d'admission et la durée des cycles
+OTHER_SUBJECT_WORDS = [
+    "stage", "stages", "internship", "cours", "classes", "frais", "payer", "paiement", "fees", "tuition",
+    "vacances", "semestre", "examens", "exams",
+]
+# Événements de l'agenda d'admission
+EVENT_KEYWORDS = [
+    ("transcript", ["releve"]),
+    ("application", ["depot", "candidature"]),
+    ("exams", ["epreuve"]),
+    ("results", ["resultat"]),
+]
+TRAVEL_MODES = [
+    ("car", ["voiture", "autoroute"]),
+    ("train", ["train", "gare"]),
+    ("plane", ["aeroport", "avion"]),
+]
+
+TEMPLATES = {
+    "french": {
+        "deadlines": "Calendrier des admissions à {school} :",
+        "duration": "Durée des formations à {school} :",
+        "contact": "Pour contacter {school} :",
+        "location": "{school} se trouve à l'adresse suivante :",
+        "access": "Accès :",
+        "source": "📄 Source : {sources}",
+        "sep": " : ",
+        "years": "{years} ans",
+        "programs": {"prepa": "Cycle Préparatoire Intégré", "ingenieur": "Cycle Ingénieur"},
+        "events": {
+            "transcript": "dépôt en ligne du relevé du Bac",
+            "application": "dépôt en ligne des candidatures",
+            "exams": "épreuves d'admissibilité et d'admission",
+            "results": "résultats de l'admission",
+        },
+        "modes": {"car": "En voiture", "train": "En train", "plane": "En avion"},
+        "travel": "{duration} de {city}",
+    },
+    "english": {
+        "deadlines": "Admission calendar at {school}:",
+        "duration": "Program length at {school}:",
+        "contact": "To contact {school}:",
+        "location": "{school} is located at:",
+        "access": "Getting there:",
+        "source": "📄 Source: {sources}",
+        "sep": ": ",
+        "years": "{years} years",
+        "programs": {"prepa": "Integrated Preparatory Cycle", "ingenieur": "Engineering Cycle"},
+        "events": {
+            "transcript": "online submission of the Baccalaureate transcript",
+            "application": "online application",
+            "exams": "entrance exams",
+            "results": "admission results",
+        },
+        "modes": {"car": "By car", "train": "By train", "plane": "By plane"},
+        "travel": "{duration} from {city}",
+    },
+    "darija": {
+        "deadlines": "Les dates dyal l'admission f {school} :",
+        "duration": "Ch7al katdoum l formation f {school} :",
+        "contact": "Bach ttwasel m3a {school} :",
+        "location": "{school} kayna f had l'adresse :",
+        "access": "Kifach twsel :",
+        "source": "📄 Masdar : {sources}",
+        "sep": " : ",
+        "years": "{years} snin",
+        "programs": {"prepa": "Cycle Préparatoire Intégré", "ingenieur": "Cycle Ingénieur"},
+        "events": {
+            "transcript": "t7et le relevé dyal l Bac online",
+            "application": "t7et la candidature online",
+            "exams": "les épreuves dyal l'admission",
+            "results": "les résultats dyal l'admission",
+        },
+        "modes": {"car": "B tomobil", "train": "B train", "plane": "B tayyara"},
+        "travel": "{duration} mn {city}",
+    },
+}
+# Dates de l'agenda (texte français) traduites mot à mot pour l'anglais
+ENGLISH_DATE_WORDS = {
+    "de": "from", "du": "from", "jusqu'au": "until", "au": "to", "mi": "mid",
+    "janvier": "January", "février": "February", "fevrier": "February", "mars": "March", "avril": "April",
+    "mai": "May", "juin": "June", "juillet": "July", "août": "August", "aout": "August",
+    "septembre": "September", "octobre": "October", "novembre": "November", "décembre": "December",
+    "decembre": "December", "lundi": "Monday", "mardi": "Tuesday", "mercredi": "Wednesday",
+    "jeudi": "Thursday", "vendredi": "Friday", "samedi": "Saturday", "dimanche": "Sunday", "1er": "1",
+}
+
+
+def _clean(text: str) -> str:
+    """Espaces normalisés et césures de l'extraction PDF recollées ("emines -ingenieur" -> "emines-ingenieur")"""
+    text = re.sub(r"\s+", " ", text).strip()
+    return re.sub(r"(\w) -(\w)", r"\1-\2", text)
+
+
+def _blocks(document: dict) -> list:
+    """Sections du document (titre "# ..." ou "AGENDA ...") : {heading, page, lines}"""
+    blocks = [{"heading": "", "page": 1, "lines": []}]
+    for page, text in enumerate(document["page_texts"], start=1):
+        for line in text.splitlines():
+            stripped = line.strip()
+            if stripped.startswith("#") or re.match(r"AGENDA\b", stripped, re.IGNORECASE):
+                blocks.append({"heading": stripped.lstrip("# "), "page": page, "lines": []})
+            else:
+                blocks[-1]["lines"].append((page, stripped))
+    return blocks
+
+
+def _fact(kind: str, document: dict, page: int, **fields) -> dict:
+    return {"kind": kind, "school": document["school"], "source": document["file"], "page": page, **fields}
+
+
+def _program_of(text: str):
+    normalized = normalize_question(text)
+    return next((program for program, pattern in PROGRAMS.items() if pattern.search(normalized)), None)
+
+
+def _items(lines: list) -> list:
+    """Puces "•" d'une section, recollées sur plusieurs lignes : [(page, texte)]"""
+    items = []
+    for page, line in lines:
+        # Une puce peut commencer en fin de ligne ("... à Ben Guerir • ")
+        first, *bullets = line.split("•")
+        if items and first:
+            items[-1][1] += f" {first}"
+        items += [[page, bullet] for bullet in bullets]
+    return [(page, _clean(text)) for page, text in items if text.strip()]
+
+
+def extract_deadlines(document: dict, blocks: list) -> list:
+    facts = []
+    for block in blocks:
+        if "agenda" not in normalize_question(block["heading"]):
+            continue
+        program = _program_of(block["heading"])
+        for page, item in _items(block["lines"]):
+            when, _, what = item.partition(" : ")
+            normalized = normalize_question(what)
+            event = next((name for name, words in EVENT_KEYWORDS if any(w in normalized for w in words)), None)
+            if not DATE_RE.search(when) or event is None:
+                continue
+            facts.append(_fact("deadline", document, page, program=program, when=when, event=event,
+                               text=item.split(" via ")[0]))
+    return facts
+
+
+def extract_durations(document: dict, blocks: list) -> list:
+    facts = []
+    seen = set()
+    for block in blocks:
+        for page, line in [(block["page"], block["heading"])] + block["lines"]:
+            program = _program_of(line)
+            found = YEARS_RE.search(line)
+            if program is None or found is None or program in seen:
+                continue
+            if "+" in line or "soit" in line.split():
+                continue  # total de plusieurs cycles ("2 ans de prépa + 3 ans", "soit 5 ans")
+            count = NUMBERS.get(found.group(1).lower()) or int(found.group(1))
+            years = count / 2 if found.group(2).lower() == "semestres" else count
+            seen.add(program)
+            facts.append(_fact("duration", document, page, program=program, years=int(years), text=_clean(line)))
+    return facts
+
+
+def extract_contacts(document: dict) -> list:
+    emails, websites, phones = Counter(), Counter(), Counter()
+    pages = {}
+    for page, text in enumerate(document["page_texts"], start=1):
+        text = _clean(text)
+        for value in EMAIL_RE.findall(text):
+            emails[value.lower()] += 1
+            pages.setdefault(("email", value.lower()), page)
+        for match in WEBSITE_RE.finditer(text):
+            value = (match.group(1) or match.group(2)).lower()
+            websites[value] += 1
+            pages.setdefault(("website", value), page)
+        for value in PHONE_RE.findall(text):
+            phones[value.strip()] += 1
+            pages.setdefault(("phone", value.strip()), page)
+
+    facts = []
+    for kind, counter in (("website", websites), ("email", emails), ("phone", phones)):
+        for value, count in counter.most_common():
+            shown = value
+            if kind == "email":
+                # Tiret perdu à l'extraction ("eminesingenieur.org") : domaine du site web correspondant
+                user, _, domain = value.partition("@")
+                shown = next((f"{user}@{site}" for site in websites
+                              if site.replace("-", "") == domain.replace("-", "")), value)
+            facts.append(_fact(kind, document, pages[(kind, value)], value=shown, count=count))
+    return facts
+
+
+def extract_locations(document: dict, blocks: list) -> list:
+    facts = []
+    for block in blocks:
+        heading = normalize_question(block["heading"])
+        if "acces" not in heading and "campus" not in heading:
+            continue
+        # Adresse : premières lignes courtes de la section, avant une ligne vide ou une puce
+        address = []
+        for page, line in block["lines"]:
+            if not line or line.startswith("•"):
+                break
+            address.append(line)
+        if 2 <= len(address) <= 5 and any(char.isdigit() for char in "".join(address)):
+            value = ", ".join(line.rstrip(", ") for line in address)
+            facts.append(_fact("address", document, block["page"], value=_clean(value),
+                               place=block["heading"]))
+        for page, item in _items(block["lines"]):
+            normalized = normalize_question(item)
+            mode = next((name for name, words in TRAVEL_MODES if any(w in normalized for w in words)), None)
+            # Toutes les villes citées ("à 50 mn de Marrakech et à 2h10 de Casablanca")
+            travels = [match.groups() for match in TRAVEL_RE.finditer(item)]
+            if not travels:
+                travels = [(duration, city) for city, duration in TRAVEL_FROM_RE.findall(item)]
+            travels = [{"duration": duration.replace("mn", "min"), "city": city} for duration, city in travels]
+            if mode and travels:
+                facts.append(_fact("access", document, page, mode=mode, travels=travels,
+                                   text=re.sub(r"^En \w+ : ", "", item)))
+    return facts
+
+
+def extract_facts(documents: list) -> list:
+    """Faits structurés de tous les documents (à la construction de l'index)"""
+    facts = []
+    for document in documents:
+        blocks = _blocks(document)
+        facts += extract_deadlines(document, blocks)
+        facts += extract_durations(document, blocks)
+        facts += extract_contacts(document)
+        facts += extract_locations(document, blocks)
+    return facts
+
+
+def question_kind(question: str, school: str = DEFAULT_SCHOOL):
+    """Sujet factuel de la question (deadlines, duration, contact, location), sinon None"""
+    text = f" {normalize_question(question)} "
+    matches = [kind for kind, keywords in QUESTION_KEYWORDS.items()
+               if any(f" {keyword} " in text for keyword in keywords)]
+    subject = [normalize_question(school)] + SUBJECT_WORDS
+    if not any(f" {word} " in text for word in subject):
+        matches = [kind for kind in matches if kind not in SUBJECT_KINDS]
+    other_subject = any(f" {word} " in text for word in OTHER_SUBJECT_WORDS)
+    matches = [kind for kind in matches if kind not in CONTEXT_WORDS or (
+        not other_subject and (any(f" {word} " in text for word in CONTEXT_WORDS[kind])
+                               or _unqualified(text, kind, school)))]
+    # Plusieurs sujets ("durée et frais", "contact et adresse") : réponse du LLM
+    return matches[0] if len(matches) == 1 else None
+
+
+def _unqualified(text: str, kind: str, school: str) -> bool:
+    """Question sans autre mot que le sujet, l'école et des mots outils ("Quelles sont les dates limites ?")"""
+    if kind not in UNQUALIFIED_KINDS:
+        return False
+    allowed = FILLER_WORDS | set(normalize_question(school).split()) | {
+        word for keyword in QUESTION_KEYWORDS[kind] if f" {keyword} " in text for word in keyword.split()
+    }
+    return all(word in allowed for word in text.split())
+
+
+def question_programs(question: str) -> list:
+    """Cycles mentionnés dans la question (tous si aucun)"""
+    text = normalize_question(question)
+    wanted = [program for program, words in (("prepa", ("prepa", "preparatoire", "preparatory")),
+                                             ("ingenieur", ("ingenieur", "engineering", "engineer")))
+              if any(word in text.split() for word in words)]
+    return wanted or list(PROGRAMS)
+
+
+def _english_date(when: str) -> str:
+    words = re.split(r"(\s+|-)", when)
+    return "".join(ENGLISH_DATE_WORDS.get(word.lower(), word) for word in words)
+
+
+def render(kind: str, facts: list, language: str, school: str, programs: list):
+    """Réponse à partir d'un modèle, None si aucun fait ne correspond"""
+    t = TEMPLATES.get(language, TEMPLATES["french"])
+    lines = []
+    used = []
+    if kind == "deadlines":
+        for program in programs:
+            items = [f for f in facts if f["kind"] == "deadline" and f["program"] == program]
+            if items:
+                lines.append(f"\n**{t['programs'][program]}**")
+            for f in items:
+                when = _english_date(f["when"]) if language == "english" else f["when"]
+                lines.append(f"- {when}{t['sep']}{t['events'][f['event']]}")
+                used.append(f)
+    elif kind == "duration":
+        for f in facts:
+            if f["kind"] == "duration" and f["program"] in programs:
+                lines.append(f"- {t['programs'][f['program']]}{t['sep']}{t['years'].format(years=f['years'])}")
+                used.append(f)
+    elif kind == "contact":
+        for contact_kind, icon in (("email", "📧"), ("website", "🌐"), ("phone", "📞")):
+            found = [f for f in facts if f["kind"] == contact_kind]
+            if found:
+                # Le plus cité dans les documents (le site de l'école plutôt qu'un lien cité en passant)
+                best = max(found, key=lambda f: f["count"])
+                lines.append(f"{icon} {best['value']}")
+                used.append(best)
+    elif kind == "location":
+        address = next((f for f in facts if f["kind"] == "address"), None)
+        if address:
+            lines.append(f"📍 {address['value']}")
+            used.append(address)
+        access = [f for f in facts if f["kind"] == "access"]
+        if access:
+            lines.append(f"\n{t['access']}")
+        for f in access:
+            # Faits d'une version antérieure de l'index : une seule ville (duration, city)
+            travels = f.get("travels") or [{"duration": f["duration"], "city": f["city"]}]
+            travel = f["text"] if language == "french" else ", ".join(t["travel"].format(**x) for x in travels)
+            lines.append(f"- {t['modes'][f['mode']]}{t['sep']}{travel}")
+            used.append(f)
+    if not used:
+        return None
+    pages = {}
+    for f in used:
+        pages.setdefault(f["source"], set()).add(f["page"])
+    sources = ", ".join(f"{source} (p. {', '.join(str(p) for p in sorted(found))})"
+                        for source, found in pages.items())
+    header = t[kind].format(school=school)
+    return "\n".join([header] + lines + ["", t["source"].format(sources=sources)])
+
+
+class FactStore:
+    """Faits de la version active de l'index, rechargés quand elle change"""
+
+    def __init__(self, index_dir: str = index_store.INDEX_DIR, docs_dir: str = index_store.DOCS_DIR):
+        self.index_dir = index_dir
+        self.docs_dir = docs_dir
+        self.facts = []
+        self.version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        version_dir = index_store.current_version(self.index_dir)
+        if version_dir is not None and version_dir == self.version:
+            return
+        path = os.path.join(version_dir, FACTS_FILE) if version_dir else None
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.facts = json.load(f)["facts"]
+        elif version_dir is None and self.version is None and self.facts:
+            return  # déjà extraits des PDFs, aucune version publiée depuis
+        else:
+            self.facts = extract_facts(index_store.extract_documents(self.docs_dir))
+        self.version = version_dir
+        print(f"Faits chargés ({os.path.basename(version_dir) if version_dir else self.docs_dir}) : "
+              f"{dict(Counter(f['kind'] for f in self.facts))}")
+
+    def refresh(self, force: bool = False):
+        """Relit la table si index/CURRENT pointe vers une nouvelle version"""
+        with self._lock:
+            if not force and time.time() - self._checked_at < REFRESH_SECONDS:
+                return
+            self._checked_at = time.time()
+            try:
+                self._load()
+            except Exception as e:
+                # Table facultative : en cas d'erreur, les questions suivent le pipeline normal
+                print(f"Erreur chargement des faits: {e}")
+
+    def answer(self, question: str, language: str, schools: list = None):
+        """Réponse construite à partir des faits, None si la question n'est pas factuelle"""
+        school = (schools or [DEFAULT_SCHOOL])[0].upper()
+        kind = question_kind(question, school)
+        if kind is None:
+            return None
+        self.refresh()
+        facts = [f for f in self.facts if f["school"] == school]
+        answer = render(kind, facts, language, school, question_programs(question))
+        metrics.incr(f"facts.{'answered' if answer else 'missing'}.{kind}")
+        return answer
+
+    def status(self) -> dict:
+        """Version et nombre de faits par type (pour /api/metrics)"""
+        return {
+            "version": os.path.basename(self.version) if self.version else None,
+            "facts": dict(Counter(f["kind"] for f in self.facts)),
+        }
+
+
+# Table partagée par les instances du chatbot (chargée à la première question factuelle)
+fact_store = FactStore()
@@ -0,0 +1,53 @@
+"""
+Configuration gunicorn : un seul worker à plusieurs threads, index préchargé
+Usage: gunicorn app:app --config gunicorn.conf.py
+
+Un seul worker est pris en charge : les flux en cours et leur reprise
+(/api/stream/<id>, /api/stop), les questions coalescées, l'historique et les
+métriques sont en mémoire dans le processus. Avec plusieurs workers, une
+reprise ou un arrêt arriverait sur un autre worker et échouerait (404). La
+concurrence passe par les threads (GUNICORN_THREADS) ; WEB_CONCURRENCY est ignoré.
+Le partage de l'index entre plusieurs workers est prêt, mais leur prise en
+charge attend que cet état sorte du processus (voir DEPLOYMENT.md).
+
+L'application et l'index sont chargés une fois dans le maître (preload_app),
+avant le fork : un worker redémarré (timeout, plantage) hérite des pages en
+copie sur écriture et des vecteurs mappés depuis le fichier FAISS, sans relire
+l'index. La mémoire (RSS, PSS, privée) est affichée avant et après le
+chargement, puis au démarrage du worker.
+"""
+
+import os
+
+from metrics import format_memory, process_memory
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = 1
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = 120
+preload_app = True
+
+
+def on_starting(server):
+    """Maître, avant le fork : chargement unique de l'index"""
+    if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+        server.log.warning("WEB_CONCURRENCY ignoré : un seul worker est pris en charge "
+                           "(flux et reprises en mémoire), augmenter GUNICORN_THREADS")
+    if os.getenv("INDEX_PRELOAD", "1") != "1":
+        return
+    import index_store
+
+    before = process_memory()
+    index_store.shared_vector_store()
+    after = process_memory()
+    server.log.info(f"Index préchargé dans le maître : {format_memory(before)} -> {format_memory(after)}")
+
+
+def post_fork(server, worker):
+    server.log.info(f"Worker {worker.pid} démarré : {format_memory(process_memory())}")
+
+
+def post_worker_init(worker):
+    if os.getenv("CHATBOT_PRELOAD", "0") == "1":
+        from app import preload_chatbot
+        preload_chatbot()
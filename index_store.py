@@ -0,0 +1,489 @@
+"""
+Index documentaire : extraction des PDFs, découpage, artefact versionné et chargement
+
+L'index est construit hors ligne par build_index.py dans un dossier versionné
+(index/<version>/ : FAISS, index lexical, manifeste avec sommes de contrôle),
+la version active étant désignée par index/CURRENT. Au démarrage il est
+simplement chargé, après vérification des sommes de contrôle, sans lecture des
+PDFs ni appels d'embeddings. Sans artefact, il est reconstruit depuis docs/
+(développement local), sauf si INDEX_BUILD_ON_START=0. Les imports lourds
+(langchain, faiss, pypdf) sont faits ici, au premier chargement.
+
+Les vecteurs sont mappés en mémoire depuis le fichier FAISS (INDEX_MMAP=1) :
+les workers gunicorn partagent les mêmes pages du cache disque au lieu d'en
+garder chacun une copie. shared_vector_store() charge l'index une seule fois
+par processus ; appelé dans le maître avant le fork (gunicorn.conf.py), il est
+hérité par les workers en copie sur écriture.
+
+Les morceaux sont répartis par école (partitions) : un index FAISS par école,
+la recherche ne parcourant que les écoles demandées (et, si besoin, un
+ensemble de documents). L'école d'un PDF est le sigle entre parenthèses à la
+fin de son nom ("... (EMINES).pdf"), sinon le nom du fichier.
+
+La recherche combine FAISS et l'index lexical BM25 (lexical.json) par fusion
+des rangs (RRF) : un sigle, un nom de formation ou une adresse email que
+l'embedding rapproche mal est retrouvé par ses mots (INDEX_HYBRID=0 pour la
+recherche vectorielle seule).
+
+Le type d'index FAISS et la dimension des embeddings sont choisis à la
+construction (INDEX_TYPES, --index-type / --dimensions de build_index.py) et
+enregistrés dans le manifeste ; bench_index.py compare mémoire, temps de
+construction, latence et rappel de chaque option par rapport à l'index exact.
+"""
+
+import hashlib
+import json
+import math
+import os
+import pickle
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from metrics import metrics
+from question_clusters import normalize_question
+
+DOCS_DIR = "docs"
+INDEX_DIR = os.getenv("INDEX_DIR", "index")
+BUILD_ON_START = os.getenv("INDEX_BUILD_ON_START", "1") == "1"
+MMAP = os.getenv("INDEX_MMAP", "1") == "1"
+EMBEDDING_MODEL = "text-embedding-3-large"
+
+# Découpage des sections : chaque morceau garde l'en-tête de sa formation
+CHUNK_SIZE = 2000
+CHUNK_OVERLAP = 200
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+LEXICAL_FILE = "lexical.json"
+
+# Types d'index FAISS (chaînes index_factory, distance L2 comme LangChain) :
+# exact, vecteurs compressés (float16, 8 bits) ou recherche approchée (HNSW, IVF)
+INDEX_TYPES = {
+    "flat": "Flat",
+    "fp16": "SQfp16",
+    "sq8": "SQ8",
+    "hnsw": "HNSW32",
+    "hnsw-sq8": "HNSW32_SQ8",
+    "ivf": "IVF{nlist},Flat",
+    "ivf-sq8": "IVF{nlist},SQ8",
+}
+DEFAULT_INDEX_TYPE = "flat"
+# Paramètres de recherche des index approchés (compromis rappel / latence)
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 8
+
+# Paramètres BM25 de l'index lexical
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Recherche hybride : rangs FAISS et BM25 fusionnés, score 1 / (RRF_K + rang)
+HYBRID = os.getenv("INDEX_HYBRID", "1") == "1"
+RRF_K = 60
+
+
+def embeddings(dimensions: int = None):
+    """Embeddings OpenAI ; `dimensions` réduit la taille des vecteurs (text-embedding-3)"""
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(
+        model=EMBEDDING_MODEL,
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        dimensions=dimensions
+    )
+
+
+def ivf_lists(count: int) -> int:
+    """Nombre de listes IVF : ~√n, avec assez de vecteurs d'entraînement par liste"""
+    return max(1, min(int(math.sqrt(count)), count // 39))
+
+
+def make_faiss_index(index_type: str, vectors):
+    """Index FAISS du type demandé, entraîné si besoin et rempli avec `vectors` (float32)"""
+    import faiss
+
+    factory = INDEX_TYPES[index_type].format(nlist=ivf_lists(len(vectors)))
+    index = faiss.index_factory(vectors.shape[1], factory)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    if index_type.startswith("ivf"):
+        # reconstruct() (centroïdes du filtre hors sujet) nécessite la table directe
+        faiss.extract_index_ivf(index).make_direct_map()
+    tune_index(index, index_type)
+    return index
+
+
+def tune_index(index, index_type: str, ef_search: int = HNSW_EF_SEARCH, nprobe: int = IVF_NPROBE):
+    """Paramètres de recherche (non sauvegardés par FAISS pour nprobe)"""
+    import faiss
+
+    if index_type.startswith("hnsw"):
+        faiss.ParameterSpace().set_index_parameter(index, "efSearch", ef_search)
+    elif index_type.startswith("ivf"):
+        faiss.ParameterSpace().set_index_parameter(index, "nprobe", nprobe)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def school_of(pdf_file: str) -> str:
+    """École d'un PDF : "Cycle ingénieur (EMINES).pdf" -> EMINES, "UM6P.pdf" -> UM6P"""
+    stem = os.path.splitext(pdf_file)[0]
+    tag = re.search(r"\(([^()]+)\)\s*$", stem)
+    return (tag.group(1) if tag else stem).strip().upper()
+
+
+def partition_name(school: str) -> str:
+    """Nom de fichier de la partition d'une école ("EMINES" -> "emines")"""
+    return re.sub(r"[^a-z0-9]+", "-", normalize_question(school)).strip("-") or "default"
+
+
+def extract_documents(docs_dir: str = DOCS_DIR) -> list:
+    """Texte de chaque PDF de docs/ (entier et par page) avec son école, son nombre de pages et son empreinte"""
+    if not os.path.exists(docs_dir):
+        os.makedirs(docs_dir)
+        return []
+
+    from pypdf import PdfReader
+
+    documents = []
+    for pdf_file in sorted(f for f in os.listdir(docs_dir) if f.endswith(".pdf")):
+        pdf_path = os.path.join(docs_dir, pdf_file)
+        pdf_reader = PdfReader(pdf_path)
+        # Texte page par page : provenance des faits extraits (facts.py)
+        page_texts = [page.extract_text() or "" for page in pdf_reader.pages]
+        documents.append({
+            "file": pdf_file,
+            "school": school_of(pdf_file),
+            "sha256": file_sha256(pdf_path),
+            "pages": len(pdf_reader.pages),
+            "page_texts": page_texts,
+            "text": "\n".join(page_texts),
+        })
+    return documents
+
+
+def chunk_documents(documents: list, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> tuple:
+    """(textes, métadonnées, identifiants) des morceaux, préfixés par [FORMATION: ...]"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    texts, metadatas, ids = [], [], []
+    for document in documents:
+        chunks = splitter.split_text(document["text"])
+        document["chunks"] = len(chunks)
+        for i, chunk in enumerate(chunks):
+            texts.append(f"[FORMATION: {document['school']}]\n{chunk}")
+            metadatas.append({"source": document["file"], "school": document["school"], "chunk": i})
+            # Identifiant stable : permet de comparer deux versions de l'index
+            ids.append(f"{document['sha256'][:12]}-{i}")
+    return texts, metadatas, ids
+
+
+class PartitionedVectorStore:
+    """Un index FAISS par école : le coût d'une recherche dépend des seules partitions parcourues"""
+
+    def __init__(self, partitions: dict, embedding, lexical=None):
+        self.partitions = partitions  # école -> FAISS
+        self.embedding = embedding
+        self.lexical = lexical        # LexicalIndex de tous les morceaux, None si absent
+        # Morceaux par identifiant : résultats de l'index lexical
+        self.chunks = {
+            chunk_id: doc for partition in partitions.values() for chunk_id, doc in partition.docstore._dict.items()
+        }
+        # Documents de chaque partition : une recherche par document ne parcourt que leurs écoles
+        self.sources = {
+            school: {doc.metadata.get("source") for doc in partition.docstore._dict.values()}
+            for school, partition in partitions.items()
+        }
+
+    @property
+    def schools(self) -> list:
+        return list(self.partitions)
+
+    @property
+    def ntotal(self) -> int:
+        return sum(partition.index.ntotal for partition in self.partitions.values())
+
+    def _embed_query(self, query: str) -> list:
+        return self.embedding.embed_query(query)
+
+    def _select(self, schools: list = None, documents: list = None) -> dict:
+        wanted = {school.upper() for school in schools or self.partitions}
+        return {
+            school: partition for school, partition in self.partitions.items()
+            if school in wanted and (not documents or self.sources[school] & set(documents))
+        }
+
+    def similarity_search_with_score_by_vector(self, vector: list, k: int = 4, schools: list = None,
+                                               documents: list = None, query: str = None) -> list:
+        """(document, distance) des k morceaux les plus proches, parmi les écoles / documents demandés
+
+        Avec le texte de la question (query), résultats FAISS et BM25 fusionnés ;
+        la distance est alors 1 / score fusionné (croissante, comme la distance L2).
+        """
+        dense = self._dense_search(vector, k, schools, documents)
+        if not (HYBRID and query and self.lexical is not None):
+            return dense
+        lexical = self._lexical_search(query, k, schools, documents)
+        return self._fuse(dense, lexical, k)
+
+    def _dense_search(self, vector: list, k: int, schools: list = None, documents: list = None) -> list:
+        """(document, distance L2) des k morceaux les plus proches (FAISS)"""
+        selected = self._select(schools, documents)
+        results = []
+        for partition in selected.values():
+            if documents:
+                # Filtre par document à l'intérieur de la partition (parcourue en entier)
+                wanted = set(documents)
+                results += partition.similarity_search_with_score_by_vector(
+                    vector, k, filter=lambda metadata: metadata.get("source") in wanted,
+                    fetch_k=partition.index.ntotal
+                )
+            else:
+                results += partition.similarity_search_with_score_by_vector(vector, k)
+        metrics.observe("index.searched_vectors", sum(p.index.ntotal for p in selected.values()))
+        results.sort(key=lambda result: result[1])
+        return results[:k]
+
+    def _lexical_search(self, query: str, k: int, schools: list = None, documents: list = None) -> list:
+        """(document, score BM25) des k morceaux les plus pertinents, parmi les écoles / documents demandés"""
+        selected = self._select(schools, documents)
+        results = []
+        for chunk_id, score in self.lexical.search(query, k=None):
+            doc = self.chunks.get(chunk_id)
+            if doc is None or doc.metadata.get("school") not in selected:
+                continue
+            if documents and doc.metadata.get("source") not in documents:
+                continue
+            results.append((doc, score))
+            if len(results) == k:
+                break
+        return results
+
+    @staticmethod
+    def _fuse(dense: list, lexical: list, k: int) -> list:
+        """Fusion des rangs (RRF) des deux recherches ; (document, 1 / score) des k meilleurs"""
+        scores, docs = Counter(), {}
+        for ranking in (dense, lexical):
+            for rank, (doc, _) in enumerate(ranking):
+                key = (doc.metadata.get("source"), doc.metadata.get("chunk"))
+                scores[key] += 1 / (RRF_K + rank + 1)
+                docs[key] = doc
+        fused = scores.most_common(k)
+        # Morceaux apportés par les seuls mots-clés (absents des résultats FAISS retenus)
+        dense_keys = {(doc.metadata.get("source"), doc.metadata.get("chunk")) for doc, _ in dense}
+        metrics.observe("index.lexical_added", sum(key not in dense_keys for key, _ in fused))
+        return [(docs[key], 1 / score) for key, score in fused]
+
+    def similarity_search_by_vector(self, vector: list, k: int = 4, **scope) -> list:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(vector, k, **scope)]
+
+    def similarity_search(self, query: str, k: int = 4, **scope) -> list:
+        return self.similarity_search_by_vector(self._embed_query(query), k, **scope)
+
+    def save(self, folder: str) -> dict:
+        """Écrit une paire .faiss / .pkl par école ; retourne la description des partitions"""
+        described = {}
+        for school, partition in self.partitions.items():
+            name = partition_name(school)
+            partition.save_local(folder, index_name=name)
+            described[school] = {"name": name, "chunks": partition.index.ntotal}
+        return described
+
+
+def build_partitions(texts: list, metadatas: list, ids: list, vectors, embedding,
+                     index_type: str = DEFAULT_INDEX_TYPE) -> PartitionedVectorStore:
+    """Regroupe les morceaux par école et crée l'index FAISS de chaque école"""
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+
+    groups = defaultdict(list)
+    for position, metadata in enumerate(metadatas):
+        groups[metadata["school"]].append(position)
+
+    partitions = {}
+    for school, positions in groups.items():
+        index = make_faiss_index(index_type, vectors[positions])
+        docstore = InMemoryDocstore({
+            ids[i]: Document(page_content=texts[i], metadata=metadatas[i]) for i in positions
+        })
+        partitions[school] = FAISS(embedding, index, docstore, {j: ids[i] for j, i in enumerate(positions)})
+    return PartitionedVectorStore(partitions, embedding, LexicalIndex(LexicalIndex.build(texts, ids)))
+
+
+def build_vector_store(docs_dir: str = DOCS_DIR):
+    """Lit les PDFs de docs/ et crée le vector store (index exact, une partition par école)"""
+    documents = extract_documents(docs_dir)
+    if not documents:
+        return None
+
+    import numpy as np
+
+    texts, metadatas, ids = chunk_documents(documents)
+    embedding = embeddings()
+    vectors = np.array(embedding.embed_documents(texts), dtype="float32")
+    return build_partitions(texts, metadatas, ids, vectors, embedding)
+
+
+class LexicalIndex:
+    """Index BM25 des morceaux (recherche par mots-clés, complément de FAISS)"""
+
+    def __init__(self, data: dict):
+        self.data = data  # contenu de lexical.json
+        self.ids = data["ids"]
+        self.lengths = data["lengths"]
+        self.postings = data["postings"]  # terme -> {position du morceau: fréquence}
+        self.avgdl = data["avgdl"]
+        self.idf = {
+            term: math.log(1 + (len(self.ids) - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    @staticmethod
+    def build(texts: list, ids: list) -> dict:
+        postings = {}
+        lengths = []
+        for position, text in enumerate(texts):
+            terms = Counter(normalize_question(text).split())
+            lengths.append(sum(terms.values()))
+            for term, count in terms.items():
+                postings.setdefault(term, {})[str(position)] = count
+        return {
+            "ids": ids,
+            "lengths": lengths,
+            "postings": postings,
+            "avgdl": sum(lengths) / len(lengths) if lengths else 0.0,
+        }
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def search(self, query: str, k: int = 3) -> list:
+        """(identifiant, score) des k morceaux les plus pertinents (tous si k est None)"""
+        scores = Counter()
+        for term in set(normalize_question(query).split()):
+            for position, tf in self.postings.get(term, {}).items():
+                length = self.lengths[int(position)]
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / (self.avgdl or 1))
+                scores[int(position)] += self.idf[term] * tf * (BM25_K1 + 1) / norm
+        return [(self.ids[position], score) for position, score in scores.most_common(k)]
+
+
+def current_version(index_dir: str = INDEX_DIR):
+    """Dossier de la version active (index/CURRENT), None si aucun artefact"""
+    pointer = os.path.join(index_dir, CURRENT_FILE)
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer, "r", encoding="utf-8") as f:
+        version = f.read().strip()
+    path = os.path.join(index_dir, version)
+    return path if os.path.isdir(path) else None
+
+
+def read_manifest(version_dir: str) -> dict:
+    with open(os.path.join(version_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def verify_artifact(version_dir: str, manifest: dict) -> list:
+    """Fichiers absents ou dont la somme de contrôle ne correspond pas au manifeste"""
+    invalid = []
+    for name, expected in manifest.get("files", {}).items():
+        path = os.path.join(version_dir, name)
+        if not os.path.exists(path) or file_sha256(path) != expected:
+            invalid.append(name)
+    return invalid
+
+
+def read_faiss_index(path: str, mmap: bool = MMAP):
+    """Index FAISS en lecture seule, vecteurs mappés depuis le fichier si possible"""
+    import faiss
+
+    if mmap and hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            # Type d'index sans lecture mappée : chargement classique en mémoire
+            print(f"Index non mappable ({e}), chargement en mémoire")
+    return faiss.read_index(path)
+
+
+def load_artifact(version_dir: str, mmap: bool = MMAP):
+    """Vector store d'une version, après vérification des sommes de contrôle"""
+    manifest = read_manifest(version_dir)
+    invalid = verify_artifact(version_dir, manifest)
+    if invalid:
+        raise ValueError(f"Artefact d'index corrompu ({version_dir}) : {', '.join(invalid)}")
+
+    if "partitions" not in manifest:
+        raise ValueError(f"Version sans partitions par école ({version_dir}) : relancez build_index.py")
+
+    from langchain_community.vectorstores import FAISS
+
+    settings = manifest.get("index", {})
+    # Les questions sont embeddées à la même dimension que les documents
+    embedding = embeddings(settings.get("dimensions"))
+    partitions = {}
+    for school, partition in manifest["partitions"].items():
+        index = read_faiss_index(os.path.join(version_dir, f"{partition['name']}.faiss"), mmap)
+        tune_index(index, settings.get("type", DEFAULT_INDEX_TYPE),
+                   settings.get("ef_search", HNSW_EF_SEARCH), settings.get("nprobe", IVF_NPROBE))
+        # Le docstore est un pickle : chargé seulement s'il correspond au manifeste
+        with open(os.path.join(version_dir, f"{partition['name']}.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        partitions[school] = FAISS(embedding, index, docstore, index_to_docstore_id)
+    # Index lexical vérifié avec les autres fichiers ; versions sans lexical.json : FAISS seul
+    lexical_path = os.path.join(version_dir, LEXICAL_FILE)
+    lexical = LexicalIndex.load(lexical_path) if LEXICAL_FILE in manifest.get("files", {}) else None
+    return PartitionedVectorStore(partitions, embedding, lexical)
+
+
+def load_vector_store(index_dir: str = INDEX_DIR, docs_dir: str = DOCS_DIR):
+    """Index pré-construit s'il est livré, sinon construit depuis les PDFs"""
+    start = time.perf_counter()
+    version_dir = current_version(index_dir)
+    if version_dir:
+        try:
+            vector_store = load_artifact(version_dir)
+        except Exception as e:
+            print(f"Erreur chargement de l'index {version_dir}: {e}")
+        else:
+            elapsed = (time.perf_counter() - start) * 1000
+            metrics.observe("startup.index_load_ms", elapsed)
+            print(f"Index chargé depuis {version_dir}/ en {elapsed:.0f} ms ({vector_store.ntotal} vecteurs, "
+                  f"écoles : {', '.join(vector_store.schools)})")
+            return vector_store
+
+    if not BUILD_ON_START:
+        print(f"Aucun index utilisable dans {index_dir}/ (INDEX_BUILD_ON_START=0) : lancez python build_index.py")
+        return None
+
+    vector_store = build_vector_store(docs_dir)
+    if vector_store is not None:
+        elapsed = (time.perf_counter() - start) * 1000
+        metrics.observe("startup.index_build_ms", elapsed)
+        print(f"Index construit depuis {docs_dir}/ en {elapsed:.0f} ms "
+              f"(pas d'index utilisable dans {index_dir}/, voir build_index.py)")
+    return vector_store
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_vector_store(index_dir: str = INDEX_DIR, docs_dir: str = DOCS_DIR):
+    """Vector store unique du processus (chargé avant le fork, il est partagé par les workers)"""
+    with _shared_lock:
+        if index_dir not in _shared:
+            _shared[index_dir] = load_vector_store(index_dir, docs_dir)
+        return _shared[index_dir]
@@ -0,0 +1,124 @@
+"""
+Budget de réponse par intention : longueur maximale et style selon la question
+
+La question clarifiée est classée localement (mots-clés français, anglais
+et darija, sans accents) parmi quelques intentions ; chacune fixe max_tokens
+et une consigne de style ajoutée au prompt système. "Où se trouve EMINES ?"
+n'a pas besoin des 2000 tokens d'une présentation des programmes.
+Les démarches (postuler, s'inscrire) ne sont jamais classées dans une intention
+courte, et une réponse coupée par un budget court est poursuivie avec le
+budget par défaut (generate.py) plutôt que tronquée.
+Le budget et la longueur réelle sont suivis par intention dans /api/metrics.
+"""
+
+from dataclasses import dataclass
+
+from metrics import metrics
+from question_clusters import normalize_question
+
+
+@dataclass(frozen=True)
+class Budget:
+    max_tokens: int
+    style: str
+
+
+BUDGETS = {
+    "location": Budget(150, "Réponds en 2 ou 3 phrases : le lieu et comment s'y rendre, sans détails superflus."),
+    "contact": Budget(150, "Donne directement les coordonnées utiles (email, téléphone, site), en liste courte."),
+    "deadlines": Budget(250, "Donne les dates et étapes clés en liste courte, sans introduction."),
+    "fees": Budget(250, "Donne les montants et aides financières en liste courte, sans introduction."),
+    "admissions": Budget(500, "Décris les étapes de la démarche dans l'ordre, en liste numérotée courte."),
+    "programmes": Budget(700, "Présente les programmes de façon structurée et concise (titres courts, listes)."),
+    "off_topic": Budget(80, "Réponds en une seule phrase."),
+    "general": Budget(500, "Réponds de façon concise et structurée."),
+}
+# Budget de la suite d'une réponse coupée par un budget court
+DEFAULT_BUDGET = BUDGETS["general"]
+CONTINUATION_PROMPT = ("Ta réponse a été coupée. Continue-la exactement là où elle s'arrête, "
+                       "dans la même langue, sans répéter ce qui a déjà été dit.")
+
+# Mots-clés (normalisés : minuscules, sans accents) par intention
+INTENT_KEYWORDS = {
+    "location": [
+        "ou se trouve", "ou est", "adresse", "situe", "localisation", "ben guerir", "benguerir",
+        "acces", "venir", "where", "located", "location", "fin kayna", "fin jat", "fin kayn",
+    ],
+    "contact": [
+        "contact", "contacter", "email", "mail", "telephone", "numero", "joindre", "phone",
+        "reach", "call", "kifach ntwasel",
+    ],
+    "deadlines": [
+        "date", "dates", "limite", "date limite", "dates limites", "deadline", "deadlines",
+        "application deadline", "application deadlines", "calendrier", "quand", "concours",
+        "when", "imta", "fo9ach",
+    ],
+    # Démarches : budget moyen, jamais celui d'une question de date ou de lieu
+    "admissions": [
+        "postuler", "candidater", "candidature", "inscription", "inscrire", "admission", "dossier",
+        "apply", "application", "enroll", "register", "admission process",
+        "npostuler", "nsjel", "ntsejel", "kifach nsjel", "kifach npostuler",
+    ],
+    "fees": [
+        "frais", "cout", "coute", "prix", "tarif", "bourse", "bourses", "payer", "scolarite",
+        "fees", "cost", "tuition", "scholarship", "price", "chhal", "flouss", "bch7al",
+    ],
+    "programmes": [
+        "programme", "programmes", "formation", "cursus", "cycle", "filiere", "diplome", "cours",
+        "matieres", "specialite", "master", "ingenieur", "preparatoire", "program", "curriculum",
+        "degree", "courses", "chno kayqraw", "chnou kanqraw",
+    ],
+    "off_topic": [
+        "meteo", "match", "coupe du monde", "chanson", "film", "recette", "blague", "politique",
+        "weather", "world cup", "song", "movie", "joke", "recipe", "celebrity",
+    ],
+}
+
+
+def classify_intent(question: str) -> str:
+    """Intention de la question (general si aucun mot-clé ne l'emporte)"""
+    text = f" {normalize_question(question)} "
+    scores = {}
+    for intent, keywords in INTENT_KEYWORDS.items():
+        # Les expressions de plusieurs mots comptent davantage que les mots isolés
+        score = sum(len(keyword.split()) for keyword in keywords if f" {keyword} " in text)
+        if score:
+            scores[intent] = score
+    if not scores:
+        return "general"
+    # À égalité, le budget le plus large : "où trouver le programme des cours"
+    # ne doit pas être tronqué à 150 tokens comme une question de lieu
+    return max(scores, key=lambda intent: (scores[intent], BUDGETS[intent].max_tokens))
+
+
+def budget_for(question: str) -> tuple:
+    """(intention, Budget) pour une question clarifiée"""
+    intent = classify_intent(question)
+    return intent, BUDGETS[intent]
+
+
+def is_exhausted(budget: Budget, output_tokens: int) -> bool:
+    """Réponse ayant atteint max_tokens, donc probablement coupée"""
+    return output_tokens >= budget.max_tokens
+
+
+def needs_continuation(budget: Budget, output_tokens: int) -> bool:
+    """Réponse coupée par un budget plus court que le budget par défaut"""
+    return is_exhausted(budget, output_tokens) and budget.max_tokens < DEFAULT_BUDGET.max_tokens
+
+
+def continuation_messages(messages: list, partial_answer: str) -> list:
+    """Messages demandant la suite d'une réponse coupée, sans la répéter"""
+    return messages + [
+        {"role": "assistant", "content": partial_answer},
+        {"role": "user", "content": CONTINUATION_PROMPT},
+    ]
+
+
+def record_usage(intent: str, budget: Budget, output_tokens: int):
+    """Budget accordé et longueur réelle (tokens du texte généré) par intention"""
+    metrics.observe(f"llm.budget_tokens.{intent}", budget.max_tokens)
+    metrics.observe(f"llm.output_tokens.{intent}", output_tokens)
+    if is_exhausted(budget, output_tokens):
+        # Réponse probablement tronquée : budget à relever pour cette intention
+        metrics.incr(f"llm.budget_exhausted.{intent}")
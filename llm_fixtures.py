@@ -0,0 +1,218 @@
+"""
+Enregistrement et rejeu des appels OpenAI / Fireworks (tests de qualité des réponses)
+Usage: LLM_FIXTURES=record python test_answer_quality.py   (appels réels, réponses enregistrées)
+       python test_answer_quality.py                       (rejeu, sans réseau)
+
+Les méthodes create des complétions (OpenAI et Fireworks, même SDK) et des
+embeddings sont remplacées au niveau des classes du SDK : tous les clients
+sont couverts, y compris celui des embeddings de LangChain.
+- record : la requête part vers l'API ; la réponse (ou les fragments du flux,
+  s'il est lu jusqu'au bout) est écrite dans fixtures/llm/<empreinte>.json ;
+- replay : la réponse enregistrée pour la même requête (modèle, messages,
+  paramètres) est rejouée, dans les types du SDK. Une requête jamais
+  enregistrée lève MissingFixture ; si seuls le prompt ou le contexte ont
+  changé depuis l'enregistrement (même hôte, même dernier message
+  utilisateur), la réponse est périmée et StaleFixture est levée : elle a
+  été produite pour un autre contexte et ne dit rien du nouveau. Avec
+  LLM_FIXTURES_ALLOW_STALE=1, elle est rejouée quand même (mise au point).
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from openai.resources.chat.completions import Completions
+from openai.resources.embeddings import Embeddings
+from openai.types import CreateEmbeddingResponse
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+FIXTURES_DIR = os.getenv("LLM_FIXTURES_DIR", os.path.join("fixtures", "llm"))
+MODE = os.getenv("LLM_FIXTURES", "replay")  # replay ou record
+ALLOW_STALE = os.getenv("LLM_FIXTURES_ALLOW_STALE", "0") == "1"
+# Paramètres qui déterminent la réponse (timeout, en-têtes... exclus)
+REQUEST_KEYS = ("model", "messages", "temperature", "max_tokens", "input", "dimensions", "encoding_format")
+ENDPOINTS = {
+    "chat": (Completions, ChatCompletion),
+    "embeddings": (Embeddings, CreateEmbeddingResponse),
+}
+
+
+class MissingFixture(RuntimeError):
+    """Requête sans réponse enregistrée (relancer avec LLM_FIXTURES=record)"""
+
+
+class StaleFixture(MissingFixture):
+    """Réponse enregistrée pour la même question, mais avec un autre prompt ou contexte"""
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:24]
+
+
+def _last_user_message(request: dict) -> str:
+    if "input" in request:
+        return json.dumps(request["input"], ensure_ascii=False)
+    users = [m.get("content", "") for m in request.get("messages", []) if m.get("role") == "user"]
+    return users[-1] if users else ""
+
+
+def request_key(endpoint: str, host: str, stream: bool, request: dict) -> str:
+    """Empreinte exacte de la requête"""
+    return _digest([endpoint, host, stream, request])
+
+
+def match_key(endpoint: str, host: str, stream: bool, request: dict) -> str:
+    """Empreinte tolérante : même question, prompt système ou contexte éventuellement modifiés"""
+    return _digest([endpoint, host, stream, _last_user_message(request)])
+
+
+class _RecordingStream:
+    """Flux de l'API dont les fragments sont enregistrés s'il est lu jusqu'au bout"""
+
+    def __init__(self, stream, on_complete):
+        self.stream = stream
+        self.on_complete = on_complete
+
+    def __iter__(self):
+        chunks = []
+        for chunk in self.stream:
+            chunks.append(chunk.model_dump())
+            yield chunk
+        # Flux fermé avant la fin (requête de secours perdante, annulation) : rien d'enregistré
+        self.on_complete(chunks)
+
+    def close(self):
+        self.stream.close()
+
+
+class _ReplayStream:
+    """Fragments enregistrés, rejoués comme un flux du SDK"""
+
+    def __init__(self, chunks: list):
+        self.chunks = chunks
+        self.closed = False
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            if self.closed:
+                raise ConnectionError("flux fermé")
+            yield ChatCompletionChunk.model_validate(chunk)
+
+    def close(self):
+        self.closed = True
+
+
+class LLMFixtures:
+    """Remplace les appels API par l'enregistrement ou le rejeu des réponses"""
+
+    def __init__(self, mode: str = MODE, directory: str = FIXTURES_DIR, allow_stale: bool = ALLOW_STALE):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"LLM_FIXTURES doit valoir record ou replay (reçu : {mode})")
+        self.mode = mode
+        self.directory = directory
+        self.allow_stale = allow_stale
+        self.recorded = 0
+        self.replayed = 0
+        self.stale = []
+        self.missing = []
+        self._exact = {}
+        self._loose = {}
+        self._originals = {}
+        self._lock = threading.Lock()
+        if mode == "replay":
+            self._load()
+
+    def __len__(self):
+        return len(self._exact)
+
+    def _load(self):
+        if not os.path.isdir(self.directory):
+            return
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".json"):
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    fixture = json.load(f)
+                self._exact[name[:-len(".json")]] = fixture
+                self._loose.setdefault(fixture["match"], fixture)
+
+    def _save(self, key: str, fixture: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{key}.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False, indent=1)
+        os.replace(f"{path}.tmp", path)
+        with self._lock:
+            self.recorded += 1
+
+    def install(self):
+        for endpoint, (resource, _) in ENDPOINTS.items():
+            self._originals[endpoint] = resource.create
+            resource.create = self._patched(endpoint)
+        return self
+
+    def uninstall(self):
+        for endpoint, original in self._originals.items():
+            ENDPOINTS[endpoint][0].create = original
+        self._originals = {}
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc):
+        self.uninstall()
+
+    def _patched(self, endpoint: str):
+        fixtures = self
+        original = self._originals[endpoint]
+
+        def create(resource, **kwargs):
+            return fixtures._call(endpoint, original, resource, kwargs)
+        return create
+
+    def _call(self, endpoint: str, original, resource, kwargs: dict):
+        request = {key: kwargs[key] for key in REQUEST_KEYS if key in kwargs}
+        host = resource._client.base_url.host
+        stream = bool(kwargs.get("stream"))
+        key = request_key(endpoint, host, stream, request)
+        entry = {
+            "endpoint": endpoint,
+            "host": host,
+            "stream": stream,
+            "match": match_key(endpoint, host, stream, request),
+            "request": request,
+        }
+
+        if self.mode == "record":
+            response = original(resource, **kwargs)
+            if stream:
+                return _RecordingStream(response, lambda chunks: self._save(key, entry | {"chunks": chunks}))
+            self._save(key, entry | {"response": response.model_dump()})
+            return response
+
+        fixture = self._exact.get(key)
+        with self._lock:
+            if fixture is None:
+                fixture = self._loose.get(entry["match"])
+                question = _last_user_message(request)[:80]
+                if fixture is None:
+                    self.missing.append(f"{endpoint} {host}: {question}")
+                    raise MissingFixture(f"Aucune réponse enregistrée pour {endpoint} ({host}) : {question}")
+                self.stale.append(f"{endpoint} {host}: {question}")
+                if not self.allow_stale:
+                    raise StaleFixture(f"Réponse périmée pour {endpoint} ({host}), prompt ou contexte "
+                                       f"modifié depuis l'enregistrement : {question}")
+            self.replayed += 1
+        if stream:
+            return _ReplayStream(fixture["chunks"])
+        return ENDPOINTS[endpoint][1].model_validate(fixture["response"])
+
+    def status(self) -> dict:
+        return {
+            "mode": self.mode,
+            "fixtures": len(self),
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "stale": len(self.stale),
+            "missing": len(self.missing),
+        }
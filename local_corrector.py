@@ -0,0 +1,183 @@
+"""
+Correcteur local des noms propres EMINES dans les transcriptions vocales
+
+Les variantes connues ("émine", "hémine", "um 6p", "ben guérir"...) sont compilées
+dans un trie de mots ; chaque mot est comparé sans accents ni casse, avec une
+distance d'édition bornée pour rattraper les fautes proches. Une correction
+prend quelques microsecondes ; seuls les cas peu sûrs sont renvoyés au LLM.
+"""
+
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+# Forme correcte -> variantes connues (la forme correcte est elle-même une variante)
+PROPER_NOUNS = {
+    "EMINES": ["emines", "emine", "hemine", "hemines", "eminez", "aimines", "emmines"],
+    "UM6P": ["um6p", "um 6p", "um 6 p", "u m 6 p", "um6 p", "um six p", "um6b", "um 6b"],
+    "Ben Guerir": ["ben guerir", "benguerir", "ben gerir", "ben grir", "bengrir", "ben guarir"],
+    "Management Industriel": ["management industriel", "management industrielle"],
+    "Cycle Ingénieur": ["cycle ingenieur"],
+    "Cycle Préparatoire": ["cycle preparatoire"],
+    "Mohammed VI Polytechnique": ["mohammed vi polytechnique", "mohammed 6 polytechnique",
+                                  "mohamed 6 polytechnique", "mohamed vi polytechnique"],
+}
+
+# Mots courants et prénoms à distance 1 d'une variante : jamais corrigés par distance d'édition
+PROTECTED_WORDS = {
+    "mines", "mine", "minces", "ben", "cycle", "management", "semaine", "examen", "termine",
+    "amine", "amines", "emile", "emise", "emises", "hermine", "hermines",
+}
+
+# Confiance selon la distance d'édition cumulée d'une correction
+CONFIDENCE_BY_DISTANCE = {0: 1.0, 1: 0.85, 2: 0.6}
+DEFAULT_MIN_CONFIDENCE = 0.8
+
+# Distance d'édition maximale explorée : au-delà de 1, la correction est jugée
+# douteuse (confiance < seuil) et la transcription est confiée au LLM
+MAX_EDIT_DISTANCE = 2
+MIN_FUZZY_LENGTH = 5
+_FUZZY_CACHE_SIZE = 10000
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _fold(text: str) -> str:
+    """Minuscules sans accents"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def _bounded_levenshtein(a: str, b: str, bound: int) -> int:
+    """Distance de Levenshtein, ou bound + 1 dès qu'elle dépasse bound"""
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > bound:
+            return bound + 1
+        previous = current
+    return previous[-1]
+
+
+class _TrieNode:
+    __slots__ = ("children", "canonical", "fuzzy_cache")
+
+    def __init__(self):
+        self.children = {}
+        self.canonical = None
+        self.fuzzy_cache = {}
+
+    def fuzzy_children(self, word: str) -> list:
+        """Enfants à distance d'édition 1..MAX_EDIT_DISTANCE du mot (résultat mémorisé)"""
+        cached = self.fuzzy_cache.get(word)
+        if cached is not None:
+            return cached
+        matches = []
+        for key, child in self.children.items():
+            if key != word:
+                d = _bounded_levenshtein(word, key, MAX_EDIT_DISTANCE)
+                if d <= MAX_EDIT_DISTANCE:
+                    matches.append((child, d))
+        if len(self.fuzzy_cache) >= _FUZZY_CACHE_SIZE:
+            self.fuzzy_cache.clear()
+        self.fuzzy_cache[word] = matches
+        return matches
+
+
+@dataclass
+class Correction:
+    original: str
+    replacement: str
+    distance: int
+
+    @property
+    def confidence(self) -> float:
+        return CONFIDENCE_BY_DISTANCE.get(self.distance, 0.0)
+
+
+@dataclass
+class CorrectionResult:
+    text: str
+    corrections: list = field(default_factory=list)
+    uncertain: list = field(default_factory=list)
+
+    @property
+    def confident(self) -> bool:
+        """Vrai si aucune correction douteuse n'a été rencontrée"""
+        return not self.uncertain
+
+
+class LocalCorrector:
+    """Correction déterministe des noms propres par trie de mots et distance bornée"""
+
+    def __init__(self, proper_nouns: dict = None, min_confidence: float = DEFAULT_MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+        self.root = _TrieNode()
+        for canonical, variants in (proper_nouns or PROPER_NOUNS).items():
+            for variant in [canonical] + variants:
+                node = self.root
+                for word in _WORD_RE.findall(_fold(variant)):
+                    node = node.children.setdefault(word, _TrieNode())
+                node.canonical = canonical
+
+    def _match(self, words: list, start: int):
+        """Plus longue correspondance depuis words[start] : (fin, forme correcte, distance)"""
+        best = None
+        stack = [(self.root, start, 0)]
+        while stack:
+            node, pos, distance = stack.pop()
+            if node.canonical and pos > start:
+                candidate = (pos, node.canonical, distance)
+                if best is None or (pos, -distance) > (best[0], -best[2]):
+                    best = candidate
+            if pos >= len(words):
+                continue
+            word = words[pos]
+            child = node.children.get(word)
+            if child is not None:
+                stack.append((child, pos + 1, distance))
+            if len(word) < MIN_FUZZY_LENGTH or word in PROTECTED_WORDS:
+                continue
+            for fuzzy_child, d in node.fuzzy_children(word):
+                stack.append((fuzzy_child, pos + 1, distance + d))
+        return best
+
+    def correct(self, text: str) -> CorrectionResult:
+        """Corrige les noms propres d'une transcription"""
+        spans = [(m.start(), m.end()) for m in _WORD_RE.finditer(text)]
+        words = [_fold(text[s:e]) for s, e in spans]
+
+        result = CorrectionResult(text=text)
+        pieces = []
+        cursor = 0
+        i = 0
+        while i < len(words):
+            match = self._match(words, i)
+            if match is None:
+                i += 1
+                continue
+            end, canonical, distance = match
+            start_char, end_char = spans[i][0], spans[end - 1][1]
+            original = text[start_char:end_char]
+            correction = Correction(original, canonical, distance)
+
+            if correction.confidence < self.min_confidence:
+                result.uncertain.append(correction)
+            elif original != canonical:
+                pieces.append(text[cursor:start_char])
+                pieces.append(canonical)
+                cursor = end_char
+                result.corrections.append(correction)
+            i = end
+
+        pieces.append(text[cursor:])
+        result.text = "".join(pieces)
+        return result
+
+
+# Instance partagée (le trie est compilé une seule fois)
+local_corrector = LocalCorrector()
@@ -0,0 +1,91 @@
+"""
+Compteurs et mesures de performance en mémoire (exposés par /api/metrics)
+"""
+
+import os
+import threading
+from collections import defaultdict, deque
+
+# Nombre de mesures conservées par série (fenêtre glissante)
+WINDOW_SIZE = 500
+
+
+class Metrics:
+    """Registre de compteurs et de séries de mesures, partagé entre les threads"""
+
+    def __init__(self, window_size: int = WINDOW_SIZE):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._series = defaultdict(lambda: deque(maxlen=window_size))
+
+    def incr(self, name: str, value: float = 1):
+        """Incrémente un compteur"""
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float):
+        """Ajoute une mesure (latence, taille...) à une série"""
+        with self._lock:
+            self._series[name].append(value)
+
+    def snapshot(self) -> dict:
+        """Retourne les compteurs et un résumé (moyenne, p50, p95) de chaque série"""
+        with self._lock:
+            counters = dict(self._counters)
+            series = {name: list(values) for name, values in self._series.items()}
+
+        summaries = {}
+        for name, values in series.items():
+            if not values:
+                continue
+            ordered = sorted(values)
+            summaries[name] = {
+                "count": len(ordered),
+                "mean": round(sum(ordered) / len(ordered), 3),
+                "p50": round(ordered[len(ordered) // 2], 3),
+                "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                "last": round(values[-1], 3),
+            }
+        return {"counters": counters, "series": summaries}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._series.clear()
+
+
+# Instance globale
+metrics = Metrics()
+
+
+def process_memory() -> dict:
+    """Mémoire du processus en Mo : RSS, PSS (pages partagées réparties entre processus) et privée
+
+    Le RSS compte en entier les pages partagées (index mappé, pages héritées du
+    maître gunicorn) dans chaque worker ; le PSS et la mémoire privée montrent
+    ce que chaque worker coûte réellement.
+    """
+    memory = {"pid": os.getpid()}
+    try:
+        with open("/proc/self/smaps_rollup", "r") as f:
+            fields = dict(line.split()[:2] for line in f if line.endswith("kB\n"))
+    except OSError:
+        # Hors Linux : pic de RSS seulement
+        import resource
+        memory["rss_max_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        return memory
+    to_mb = lambda *keys: round(sum(int(fields.get(key, 0)) for key in keys) / 1024, 1)
+    memory.update({
+        "rss_mb": to_mb("Rss:"),
+        "pss_mb": to_mb("Pss:"),
+        "shared_mb": to_mb("Shared_Clean:", "Shared_Dirty:"),
+        "private_mb": to_mb("Private_Clean:", "Private_Dirty:"),
+    })
+    return memory
+
+
+def format_memory(memory: dict) -> str:
+    if "rss_mb" not in memory:
+        return f"RSS max {memory.get('rss_max_mb')} Mo"
+    return (f"RSS {memory['rss_mb']} Mo (PSS {memory['pss_mb']}, partagée {memory['shared_mb']}, "
+            f"privée {memory['private_mb']})")
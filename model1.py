@@ -4,579 +4,75 @@ import os
 # Fix OpenMP conflict
 os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
 
-from openai import OpenAI
-from pypdf import PdfReader
-from typing import Generator
 import streamlit as st
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
 from audio_recorder_streamlit import audio_recorder
-import tempfile
-import json
-from datetime import datetime
-from collections import Counter
+import threading
+from question_clusters import cluster_questions, top_questions
+from answer_cache import AnswerCache, warm_up, warmup_questions
+from analytics_store import AnalyticsStore
+from index_store import shared_vector_store
+from pipeline import DEFAULT_LIMITATIONS, PDFChatbot
 
 # Chargement des variables d'environnement
 load_dotenv()
 
-# Fichier de log pour les analytics
-ANALYTICS_FILE = "analytics.json"
-
-def load_analytics():
-    """Charge les données analytics depuis le fichier JSON"""
-    if os.path.exists(ANALYTICS_FILE):
-        try:
-            with open(ANALYTICS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {"visitors": 0, "interactions": []}
-    return {"visitors": 0, "interactions": []}
-
-def save_analytics(data):
-    """Sauvegarde les données analytics dans le fichier JSON"""
-    with open(ANALYTICS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+# Analytics stockées dans SQLite (analytics_store.py)
+analytics_store = AnalyticsStore()
 
 def log_interaction(question: str, response: str, input_type: str):
     """Log une interaction utilisateur"""
-    analytics = load_analytics()
-    
-    interaction = {
-        "timestamp": datetime.now().isoformat(),
-        "question": question,
-        "response": response[:200],  # Limiter la taille
-        "input_type": input_type,  # "text" ou "voice"
-    }
-    
-    analytics["interactions"].append(interaction)
-    save_analytics(analytics)
+    analytics_store.log_interaction(
+        question=question,
+        response=response,  # Tronquée à 200 caractères par le store
+        input_type=input_type  # "text", "voice" ou "suggested"
+    )
 
 def increment_visitor():
     """Incrémente le compteur de visiteurs"""
-    analytics = load_analytics()
-    analytics["visitors"] += 1
-    save_analytics(analytics)
+    analytics_store.record_visit()
 
 def get_analytics_summary():
     """Retourne un résumé des analytics"""
-    analytics = load_analytics()
-    
-    total_visitors = analytics["visitors"]
-    total_questions = len(analytics["interactions"])
-    
-    # Questions les plus fréquentes (top 5)
-    questions = [i["question"] for i in analytics["interactions"]]
-    question_counts = Counter(questions)
-    top_questions = question_counts.most_common(5)
+    summary = analytics_store.summary()
     
-    # Type d'entrée (texte vs vocal)
-    input_types = [i["input_type"] for i in analytics["interactions"]]
-    input_counts = Counter(input_types)
+    # Questions les plus fréquentes (top 5), variantes quasi-identiques regroupées
+    top_5 = top_questions(cluster_questions(analytics_store.questions()), 5)
     
     return {
-        "total_visitors": total_visitors,
-        "total_questions": total_questions,
-        "top_questions": top_questions,
-        "input_counts": dict(input_counts),
-        "recent_interactions": analytics["interactions"][-10:]  # 10 dernières
+        "total_visitors": summary["total_visitors"],
+        "total_questions": summary["total_questions"],
+        "top_questions": top_5,
+        "input_counts": summary["input_counts"],
+        "recent_interactions": analytics_store.interactions_page(page_size=10)["items"]  # 10 dernières
     }
 
-class TranscriptionCorrector:
-    """Corrige les transcriptions vocales avec GPT-4o-mini d'OpenAI"""
-    def __init__(self):
-        # Utilisation d'OpenAI pour une meilleure obéissance aux instructions
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-    def correct_transcription(self, transcription: str) -> str:
-        """Corrige automatiquement les erreurs courantes dans la transcription"""
-        correction_prompt = [
-            {
-                "role": "system",
-                "content": """Tu es un correcteur orthographique automatique. Tu corriges UNIQUEMENT l'orthographe, tu ne réponds JAMAIS aux questions.
-
-**Ta seule mission** : Corriger les fautes d'orthographe dans les noms propres et termes techniques d'EMINES.
-
-**Corrections autorisées** :
-- "émine", "hémine", "émines" → "EMINES"
-- "um6p", "um 6p" → "UM6P"  
-- "ben guérir" → "Ben Guerir"
-- "management industrielle" → "Management Industriel"
-- "cycle ingénieur" → "Cycle Ingénieur"
-
-**INTERDICTIONS ABSOLUES** :
-❌ NE réponds JAMAIS à la question posée
-❌ NE fournis JAMAIS d'information
-❌ NE reformule PAS la phrase
-❌ NE change que les mots mal orthographiés
-❌ NE modifie PAS la structure de la phrase
-
-**Exemples corrects** :
-
-Entrée: "Combien coûte hémine ?"
-Sortie: "Combien coûte EMINES ?"
-
-Entrée: "Où se trouve émine exactement ?"
-Sortie: "Où se trouve EMINES exactement ?"
-
-Entrée: "Quel est le programme de première année à l'émine ?"
-Sortie: "Quel est le programme de première année à l'EMINES ?"
-
-Entrée: "Comment postuler à um 6p ?"
-Sortie: "Comment postuler à UM6P ?"
-
-Retourne UNIQUEMENT le texte avec corrections orthographiques, rien d'autre."""
-            },
-            {"role": "user", "content": transcription}
-        ]
-
-        try:
-            # Utilisation de GPT-4o-mini (meilleur rapport qualité/prix/obéissance)
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=correction_prompt,
-                temperature=0.1,
-                max_tokens=150
-            )
-            corrected = response.choices[0].message.content.strip()
-            
-            # Nettoyer les préfixes indésirables (au cas où le modèle désobéit)
-            unwanted_prefixes = [
-                "Voici la transcription corrigée :",
-                "Voici la correction :",
-                "La transcription corrigée est :",
-                "Transcription corrigée :",
-                "Correction :",
-                "Voici :",
-                "Le programme",
-                "La première année",
-            ]
-            
-            for prefix in unwanted_prefixes:
-                if corrected.lower().startswith(prefix.lower()):
-                    corrected = corrected[len(prefix):].strip()
-                    break
-            
-            # Vérification de sécurité : si la réponse est beaucoup plus longue,
-            # c'est probablement que le modèle a répondu à la question au lieu de corriger
-            if len(corrected) > len(transcription) * 2:
-                # Le modèle a probablement répondu à la question, on retourne l'original
-                return transcription
-            
-            return corrected
-        except Exception as e:
-            st.error(f"Erreur lors de la correction : {e}")
-            return transcription  # Retourne l'original en cas d'erreur
-
-
-class InteractiveClarifier:
-    def __init__(self):
-        # Utilisation d'OpenAI GPT-4o-mini pour une meilleure clarification
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.conversation_history = []
-
-    def clarify_question(self, user_query: str, chat_history: list = None, detected_language: str = "french") -> str:
-        """Clarifie la question utilisateur en utilisant l'historique de conversation
-        
-        Args:
-            user_query: La question de l'utilisateur
-            chat_history: L'historique de conversation
-            detected_language: La langue détectée (french, english, darija)
-        
-        Returns:
-            Question clarifiée en français + instruction de langue si nécessaire
-        """
-        
-        # Construire le contexte depuis l'historique de conversation
-        context_text = "Aucune conversation précédente"
-        if chat_history and len(chat_history) > 0:
-            # Prendre les 2 dernières interactions pour le contexte
-            recent_history = chat_history[-2:]
-            context_parts = []
-            for interaction in recent_history:
-                context_parts.append(f"Q: {interaction['user']}")
-            context_text = "\n".join(context_parts)
-        
-        clarification_prompt = [
-            {
-                "role": "system",
-                "content": f"""Tu es un assistant qui clarifie les questions pour EMINES - School of Industrial Management (UM6P).
-
-**Ta mission** : Reformuler les questions en FRANÇAIS (pour chercher dans la base de données française).
-
-**À propos d'EMINES** :
-- École : EMINES (School of Industrial Management)
-- Université : UM6P (Université Mohammed VI Polytechnique)
-- Localisation : Ben Guerir, Maroc
-- Programmes : Cycle Préparatoire (2 ans) + Cycle Ingénieur (3 ans) en Management Industriel
-
-**Règles de clarification** :
-
-1. **Traduire en FRANÇAIS** si la question est en darija ou anglais :
-   - "kifach npostuler?" → "Comment postuler à EMINES ?"
-   - "how to apply?" → "Comment postuler à EMINES ?"
-   - "wach kayna bourse?" → "Y a-t-il des bourses à EMINES ?"
-
-2. **Si la question est vague ou incomplète**, la clarifier :
-   - "et pour les frais?" → "Quels sont les frais de scolarité à EMINES ?"
-   - "la bourse?" → "Y a-t-il des bourses d'études disponibles à EMINES ?"
-
-3. **Ne JAMAIS répondre à la question**, seulement la clarifier/traduire.
-
-**Historique de conversation récent :**
-{context_text}
-
-**Exemples de clarification :**
-
-Question: "kifach ndfE3 l EMINES?"
-Clarification: "Comment postuler à EMINES ?"
-
-Question: "wach kayna bourse?"
-Clarification: "Y a-t-il des bourses à EMINES ?"
-
-Question: "how much does it cost?"
-Clarification: "Quels sont les frais de scolarité à EMINES ?"
-
-Question: "et pour les frais?"
-Clarification: "Quels sont les frais de scolarité à EMINES ?"
-
-Retourne UNIQUEMENT la question clarifiée EN FRANÇAIS, rien d'autre."""
-            },
-            {"role": "user", "content": user_query}
-        ]
-
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=clarification_prompt,
-                temperature=0.2,
-                max_tokens=150
-            )
-            clarified = response.choices[0].message.content.strip()
-            
-            # Ajouter l'instruction de langue si ce n'est pas du français
-            if detected_language == "darija":
-                clarified = f"{clarified} [RÉPONDS EN DARIJA MAROCAIN]"
-            elif detected_language == "english":
-                clarified = f"{clarified} [RESPOND IN ENGLISH]"
-            
-            # Enregistrer dans l'historique
-            self.conversation_history.append({
-                "original": user_query,
-                "clarified": clarified,
-                "language": detected_language
-            })
-            
-            return clarified
-        except Exception as e:
-            print(f"Erreur clarification: {e}")
-            return user_query
-
 @st.cache_resource
-def load_vector_store():
-    """Charge les PDFs et crée le vector store"""
-    if not os.path.exists("docs"):
-        os.makedirs("docs")
-        return None
-    
-    pdf_files = [f for f in os.listdir("docs") if f.endswith(".pdf")]
-    if not pdf_files:
-        return None
-
-    sections = []
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join("docs", pdf_file)
-        school_name = os.path.splitext(pdf_file)[0].upper()
-        
-        pdf_reader = PdfReader(pdf_path)
-        text = "\n".join([page.extract_text() or "" for page in pdf_reader.pages])
-        
-        sections.append(f"[FORMATION: {school_name}]\n{text}")
-
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-large",
-        openai_api_key=os.getenv("OPENAI_API_KEY")
-    )
-    
-    return FAISS.from_texts(
-        texts=sections,
-        embedding=embeddings
+def load_answer_cache():
+    """Cache de réponses pré-calculées, partagé entre les sessions"""
+    return AnswerCache()
+
+def log_turn(turn):
+    """Étape log du pipeline : échange enregistré dans les analytics"""
+    log_interaction(
+        question=turn.question,
+        response=turn.answer,
+        input_type=turn.input_type
     )
 
-class PDFChatbot:
-    def __init__(self, temperature: float = 0.2):
-        self.temperature = temperature
-        self.clarifier = InteractiveClarifier()
-        self.corrector = TranscriptionCorrector()  # Nouveau correcteur
-        self.client = OpenAI(
-            api_key=os.getenv("FIREWORKS_API_KEY"),
-            base_url="https://api.fireworks.ai/inference/v1"
-        )
-        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.vector_store = load_vector_store()
-        self.chat_history = []
-        self.last_limitations = None
-
-    def transcribe_audio(self, audio_bytes: bytes) -> str:
-        """Transcrit l'audio en texte en utilisant Whisper d'OpenAI"""
-        try:
-            # Créer un fichier temporaire pour l'audio
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
-                tmp_file.write(audio_bytes)
-                tmp_file_path = tmp_file.name
-            
-            # Transcription avec Whisper (détection automatique de la langue)
-            with open(tmp_file_path, "rb") as audio_file:
-                transcript = self.openai_client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language=None,  # Détection automatique (fr, en, ar)
-                    response_format="text"
-                )
-            
-            # Supprimer le fichier temporaire
-            os.unlink(tmp_file_path)
-            
-            return transcript
-        except Exception as e:
-            return f"Erreur de transcription : {str(e)}"
-    
-    def correct_and_transcribe(self, audio_bytes: bytes) -> tuple[str, str]:
-        """Transcrit l'audio et corrige automatiquement les erreurs courantes
-        
-        Returns:
-            tuple: (transcription_brute, transcription_corrigée)
-        """
-        # Étape 1 : Transcription brute avec Whisper
-        raw_transcription = self.transcribe_audio(audio_bytes)
-        
-        if raw_transcription.startswith("Erreur"):
-            return raw_transcription, raw_transcription
-        
-        # Étape 2 : Correction automatique avec le petit modèle
-        corrected_transcription = self.corrector.correct_transcription(raw_transcription)
-        print("raw_transcription:", raw_transcription)
-        print("corrected_transcription:", corrected_transcription)
-        return raw_transcription, corrected_transcription
-
-    def detect_language(self, text: str) -> str:
-        """Détecte la langue du texte en utilisant GPT-4o-mini"""
-        try:
-            detection_prompt = [
-                {
-                    "role": "system",
-                    "content": """Tu es un détecteur de langue expert. Analyse le texte et identifie la langue principale.
-
-**Langues possibles :**
-- french (Français standard)
-- english (Anglais)
-- darija (Arabe dialectal marocain / Darija)
-
-**Règles :**
-1. Si le texte contient du Darija (même mélangé avec du français), retourne "darija"
-2. Si le texte est en anglais pur, retourne "english"
-3. Si le texte est en français standard (sans Darija), retourne "french"
-
-**Exemples :**
-
-Texte: "kifach npostuler l EMINES?"
-Langue: darija
-
-Texte: "wach kayna bourse f EMINES?"
-Langue: darija
-
-Texte: "chno homa les programmes?"
-Langue: darija
-
-Texte: "Quels sont les programmes d'EMINES ?"
-Langue: french
-
-Texte: "how to apply to EMINES?"
-Langue: english
-
-Texte: "fine kayna EMINES?"
-Langue: darija
-
-Texte: "et pour les frais?"
-Langue: french
-
-Réponds UNIQUEMENT par un seul mot : "french", "english" ou "darija"."""
-                },
-                {"role": "user", "content": f"Texte: {text}\nLangue:"}
-            ]
-            
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=detection_prompt,
-                temperature=0.0,
-                max_tokens=10
-            )
-            
-            detected = response.choices[0].message.content.strip().lower()
-            
-            # Vérifier que la réponse est valide
-            if detected in ["french", "english", "darija"]:
-                return detected
-            else:
-                # Fallback : français par défaut
-                return "french"
-                
-        except Exception as e:
-            print(f"Erreur détection langue: {e}")
-            return "french"  # Fallback en cas d'erreur
-
-    def generate_response(self, user_query: str) -> Generator[str, None, None]:
-        """Génère une réponse avec streaming"""
-        if self.last_limitations != st.session_state.limitations:
-            self.chat_history.clear()
-            self.last_limitations = st.session_state.limitations
-
-        # Détecter la langue de l'utilisateur
-        detected_language = self.detect_language(user_query)
-        print("original_query:", user_query)
-        print("detected_language:", detected_language)
-        
-        # Passer l'historique ET la langue détectée au clarifier
-        clarified_query = self.clarifier.clarify_question(user_query, self.chat_history, detected_language)
-        print("clarified_query:", clarified_query)
-        
-        if not self.vector_store:
-            yield "⚠️ Créez un dossier 'docs/' avec des PDFs des formations"
-            return
-
-        relevant_docs = self.vector_store.similarity_search(clarified_query, k=3)
-        context = "\n".join([doc.page_content for doc in relevant_docs])
-
-        messages = [
-            {
-            "role": "system",
-            "content": f"""
-            **Répondre toujours dans la même langue que l'utilisateur**
-            
-            **Rôle** : Assistant spécialisé exclusivement pour EMINES - School of Industrial Management (UM6P).
-            Tu es l'assistant virtuel d'EMINES et tu ne dois répondre qu'aux questions concernant cette école.
-
-            **À propos d'EMINES** :
-            - Nom complet : EMINES - School of Industrial Management
-            - Université : UM6P (Université Mohammed VI Polytechnique)
-            - Date de création : 2013
-            - Localisation : Ben Guerir, Maroc
-            - Mission : Former des ingénieurs managers capables d'innover et de diriger dans un environnement industriel moderne
-            
-            **Programmes EMINES** :
-            1. **Cycle Préparatoire Intégré en Management Industriel** (2 ans)
-               - Durée : 2 ans (Bac à Bac+2)
-               - Date limite de candidature : 1 juin 2025
-               - Débouchés : Accès au Cycle Ingénieur
-            
-            2. **Cycle Ingénieur en Management Industriel** (3 ans)
-               - Durée : 3 ans (Bac+2 à Bac+5)
-               - Date limite de candidature : 15 mai 2025
-               - Diplôme : Diplôme d'Ingénieur d'État en Management Industriel
-            
-            **Contacts EMINES** :
-            📧 Email : contact@emines-ingenieur.org
-            🌐 Site web : emines-ingenieur.org
-            📍 Adresse : UM6P - Ben Guerir, Maroc
-            
-            **Directives STRICTES** :
-            
-            0. **LIMITATION STRICTE**: 
-            {st.session_state.limitations}
-
-            1. **Spécialisation EMINES Uniquement** :
-            - Tu ne réponds QU'AUX questions concernant EMINES
-            - Si on te pose une question sur une autre école de l'UM6P (CC, GTI, SAP+D, ABS, etc.), réponds :
-              "Je suis spécialisé uniquement pour EMINES - School of Industrial Management. Pour des informations sur [nom de l'école], veuillez consulter le site officiel : 🌐 https://um6p.ma/fr"
-            
-            2. **Utilisation du Contexte** :
-            - Utilise UNIQUEMENT les informations du contexte fourni (PDFs EMINES et UM6P)
-            - Si l'information n'est pas dans le contexte, réponds :
-              "Je ne trouve pas cette information précise. Pour plus de détails sur EMINES, veuillez contacter :
-              📧 contact@emines-ingenieur.org
-              🌐 emines-ingenieur.org"
-            
-            3. **LANGUE DE RÉPONSE - RÈGLE ABSOLUE** :
-            
-            ⚠️ CRITIQUE : Vérifie si la question contient une instruction de langue :
-            - Si tu vois "[RÉPONDS EN DARIJA MAROCAIN]" → Réponds UNIQUEMENT en DARIJA
-            - Si tu vois "[RESPOND IN ENGLISH]" → Réponds UNIQUEMENT en ANGLAIS
-            - Sinon, réponds en FRANÇAIS
-            
-            **La question en français est juste pour chercher dans la base de données. L'instruction entre crochets indique la langue de réponse !**
-            
-            **Exemples de réponse en DARIJA :**
-            - "EMINES kayna f Ben Guerir, f UM6P"
-            - "Les programmes dyali homa Cycle Préparatoire (2 ans) w Cycle Ingénieur (3 ans)"
-            - "Wakha tktb l contact@emines-ingenieur.org"
-            - "Ta9dim l candidature khass tkoun 9bel 1 juin 2025"
-            - "Bach tpostuler, khassek tmchi l site dyal EMINES w t3mer le formulaire"
-            
-            **Exemples de réponse en ANGLAIS :**
-            - "EMINES is located in Ben Guerir, at UM6P"
-            - "Our programs are the Preparatory Cycle (2 years) and Engineering Cycle (3 years)"
-            - "You can contact us at contact@emines-ingenieur.org"
-            
-            NE JAMAIS traduire ou mélanger les langues !
-            
-            4. **Format des Réponses** :
-            - Sois clair, précis et professionnel
-            - Structure tes réponses avec des puces ou numéros si nécessaire
-            - Toujours inclure les contacts EMINES quand pertinent
-            - Reste concis mais complet
-            
-            5. **Interdictions** :
-            - Ne JAMAIS inventer d'informations
-            - Ne JAMAIS donner d'informations sur d'autres écoles de l'UM6P
-            - Ne JAMAIS mélanger les informations d'EMINES avec d'autres écoles
-            - Ne pas répondre à des questions générales non liées à EMINES
-
-            **Contexte actuel (Documents EMINES et UM6P)** :
-            {context}"""
-                        }
-        ]
-
-        for msg in self.chat_history:
-            messages.append({"role": "user", "content": msg["user"]})
-            messages.append({"role": "assistant", "content": msg["assistant"]})
-
-        messages.append({"role": "user", "content": clarified_query})
-
-        try:
-            model_name = "accounts/fireworks/models/deepseek-v3p1"
-            
-            stream = self.client.chat.completions.create(
-                model=model_name,
-                messages=messages,
-                temperature=float(self.temperature),  # Use the temperature parameter
-                max_tokens=2000,
-                stream=True
-            )
-
-            full_response = []
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    text_chunk = chunk.choices[0].delta.content
-                    full_response.append(text_chunk)
-                    yield text_chunk
-
-            self.chat_history.append({
-                "user": user_query,
-                "assistant": "".join(full_response)
-            })
-            
-            # Logger l'interaction pour analytics
-            log_interaction(
-                question=user_query,
-                response="".join(full_response),
-                input_type=st.session_state.get('last_input_type', 'text')
-            )
-
-        except Exception as e:
-            yield f"Erreur : {str(e)}"
-
-    def update_temperature(self, new_temperature: float):
-        """Met à jour la température pour les futures réponses"""
-        self.temperature = new_temperature
+@st.cache_resource
+def start_answer_warmup(limitations: str):
+    """Pré-calcule en arrière-plan les réponses des questions fréquentes (ANSWER_WARMUP=1)"""
+    vector_store = shared_vector_store()
+    if os.getenv("ANSWER_WARMUP", "0") != "1" or not vector_store:
+        return
+    # Sans journal : les réponses pré-calculées ne sont pas des questions d'utilisateurs
+    worker = PDFChatbot(vector_store=vector_store, answer_cache=load_answer_cache())
+    worker.limitations = limitations
+    threading.Thread(
+        target=warm_up,
+        args=(worker, load_answer_cache(), warmup_questions()),
+        daemon=True
+    ).start()
 
 def main():
     st.set_page_config(
@@ -587,10 +83,7 @@ def main():
     
     # Initialisation des limitations
     if 'limitations' not in st.session_state:
-        st.session_state.limitations = """- Tu ne peux répondre qu'aux questions concernant EMINES (School of Industrial Management).
-            - Si on te pose une question sur une autre école de l'UM6P, réponds : "Je suis spécialisé uniquement pour EMINES - School of Industrial Management. Pour des informations sur d'autres écoles, veuillez consulter : 🌐 https://um6p.ma/fr"
-            - Pour TOUTE question non liée à EMINES ou l'UM6P, réponds : "Je suis un assistant spécialisé uniquement pour EMINES - School of Industrial Management. Je ne peux pas répondre à cette question."
-            - Ne jamais répondre à des questions générales, culturelles ou personnelles (musique, célébrités, actualités, politique, etc.)"""
+        st.session_state.limitations = DEFAULT_LIMITATIONS
 
     with st.sidebar:
         st.markdown("### 🏭 EMINES Assistant")
@@ -657,7 +150,7 @@ def main():
         
         # Reset button (admin)
         if st.button("🔄 Réinitialiser Stats", use_container_width=True):
-            save_analytics({"visitors": 0, "interactions": []})
+            analytics_store.reset()
             st.success("Statistiques réinitialisées!")
             st.rerun()
 
@@ -703,7 +196,7 @@ def main():
             """)
 
     if 'chatbot' not in st.session_state:
-        st.session_state.chatbot = PDFChatbot()
+        st.session_state.chatbot = PDFChatbot(answer_cache=load_answer_cache(), log_sink=log_turn)
         st.session_state.current_temperature = 0.2
     
     if 'last_audio' not in st.session_state:
@@ -725,6 +218,10 @@ def main():
     if 'last_input_type' not in st.session_state:
         st.session_state.last_input_type = 'text'
 
+    # Synchroniser les règles de restriction de la session avec le chatbot
+    st.session_state.chatbot.limitations = st.session_state.limitations
+    start_answer_warmup(st.session_state.limitations)
+
     if st.session_state.current_temperature != temperature:
         st.session_state.chatbot.update_temperature(temperature)
         st.session_state.current_temperature = temperature
@@ -755,7 +252,7 @@ def main():
         st.session_state.last_input_type = 'voice'
         
         with st.spinner("🎧 Transcription en cours..."):
-            raw_transcription, corrected_transcription = st.session_state.chatbot.correct_and_transcribe(audio_bytes)
+            raw_transcription, corrected_transcription = st.session_state.chatbot.correct_and_transcribe(audio_bytes, "recording.wav")
             
             if not raw_transcription.startswith("Erreur"):
                 # Afficher les deux versions pour information
@@ -868,7 +365,9 @@ def main():
             response = st.empty()
             full_response = ""
             
-            for chunk in st.session_state.chatbot.generate_response(user_input):
+            for chunk in st.session_state.chatbot.generate_response(
+                user_input, input_type=st.session_state.last_input_type
+            ):
                 full_response += chunk
                 response.markdown(f'<div class="streaming blink-cursor">{full_response}</div>', unsafe_allow_html=True)
             
@@ -0,0 +1,256 @@
+"""
+Routeur des modèles Fireworks : latence au premier token, santé et bascule
+
+Pour chaque modèle, le routeur suit sur une fenêtre glissante le temps
+jusqu'au premier token (TTFT) et le taux d'erreur. Une requête part vers le
+modèle sain le plus rapide du niveau de qualité choisi ; si le premier token
+tarde au-delà de HEDGE_AFTER, une seconde requête est lancée sur le modèle
+suivant et la première réponse l'emporte. Une erreur avant le premier token
+bascule immédiatement sur le modèle suivant ; un modèle en échec répété est
+écarté pendant COOLDOWN secondes.
+"""
+
+import os
+import queue
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+
+from metrics import metrics
+
+# Modèles interchangeables par niveau de qualité, dans l'ordre de préférence
+MODEL_TIERS = {
+    "quality": [
+        "accounts/fireworks/models/deepseek-v3p1",
+        "accounts/fireworks/models/deepseek-v3",
+        "accounts/fireworks/models/llama-v3p3-70b-instruct",
+    ],
+    "fast": [
+        "accounts/fireworks/models/llama-v3p1-8b-instruct",
+        "accounts/fireworks/models/llama-v3p2-3b-instruct",
+    ],
+}
+DEFAULT_TIER = os.getenv("FIREWORKS_MODEL_TIER", "quality")
+
+# Délai avant d'envoyer une requête de secours si le premier token n'est pas arrivé
+HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER_MS", "2500")) / 1000
+STATS_WINDOW = 20
+MIN_SAMPLES = 3
+MAX_ERROR_RATE = 0.5
+CONSECUTIVE_ERRORS_LIMIT = 2
+COOLDOWN = 60
+# TTFT supposé d'un modèle pas encore mesuré (il reste derrière un modèle mesuré rapide)
+DEFAULT_TTFT = 1.5
+
+
+def short_name(model: str) -> str:
+    return model.split("/")[-1]
+
+
+class ModelStats:
+    """TTFT et erreurs récentes d'un modèle"""
+
+    def __init__(self):
+        self.ttfts = deque(maxlen=STATS_WINDOW)
+        self.outcomes = deque(maxlen=STATS_WINDOW)  # True = succès
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+
+    def record_success(self, ttft: float):
+        self.ttfts.append(ttft)
+        self.outcomes.append(True)
+        self.consecutive_errors = 0
+
+    def record_error(self):
+        self.outcomes.append(False)
+        self.consecutive_errors += 1
+        if self.consecutive_errors >= CONSECUTIVE_ERRORS_LIMIT:
+            self.cooldown_until = time.monotonic() + COOLDOWN
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    @property
+    def healthy(self) -> bool:
+        if time.monotonic() < self.cooldown_until:
+            return False
+        return len(self.outcomes) < MIN_SAMPLES or self.error_rate <= MAX_ERROR_RATE
+
+    @property
+    def ttft(self) -> float:
+        return statistics.median(self.ttfts) if self.ttfts else DEFAULT_TTFT
+
+
+class _Attempt:
+    """Requête en streaming vers un modèle, ouverte dans un thread jusqu'au premier token"""
+
+    def __init__(self, router, model: str, request: dict, events: queue.Queue):
+        self.model = model
+        self.stream = None
+        self.first_text = None
+        self.abandoned = False
+        self._router = router
+        self._request = request
+        self._events = events
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+        threading.Thread(target=self._open, daemon=True).start()
+
+    def _open(self):
+        try:
+            stream = self._router.client.chat.completions.create(model=self.model, stream=True, **self._request)
+            with self._lock:
+                self.stream = stream
+            if self.abandoned:
+                stream.close()
+                self._events.put(("abandoned", self))
+                return
+            self.chunks = iter(stream)
+            for chunk in self.chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    self.first_text = chunk.choices[0].delta.content
+                    break
+            self._router.record_success(self.model, time.monotonic() - self.started_at)
+            self._events.put(("first", self))
+        except Exception as e:
+            if self.abandoned:
+                # Requête fermée volontairement (secours devenu inutile, annulation)
+                self._events.put(("abandoned", self))
+            else:
+                self._router.record_error(self.model)
+                self._events.put(("error", self, e))
+
+    def close(self):
+        with self._lock:
+            self.abandoned = True
+            stream = self.stream
+        if stream is not None:
+            stream.close()
+
+
+class ModelRouter:
+    """Choix du modèle Fireworks, requête de secours (hedging) et bascule en cas d'erreur"""
+
+    _stats = defaultdict(ModelStats)  # partagées entre les instances
+    _stats_lock = threading.Lock()
+
+    def __init__(self, client, models: list = None, tier: str = None, hedge_after: float = HEDGE_AFTER):
+        self.client = client
+        self.models = models or MODEL_TIERS.get(tier or DEFAULT_TIER, MODEL_TIERS["quality"])
+        self.hedge_after = hedge_after
+        self.last_model = None
+
+    def record_success(self, model: str, ttft: float):
+        with self._stats_lock:
+            self._stats[model].record_success(ttft)
+        metrics.observe(f"llm.ttft_ms.{short_name(model)}", ttft * 1000)
+
+    def record_error(self, model: str):
+        with self._stats_lock:
+            self._stats[model].record_error()
+        metrics.incr(f"llm.errors.{short_name(model)}")
+
+    def ranked_models(self) -> list:
+        """Modèles sains du niveau, du plus rapide au plus lent ; tous si aucun n'est sain"""
+        with self._stats_lock:
+            stats = {model: self._stats[model] for model in self.models}
+            healthy = [model for model in self.models if stats[model].healthy]
+            order = {model: i for i, model in enumerate(self.models)}
+            candidates = healthy or list(self.models)
+            return sorted(candidates, key=lambda model: (stats[model].ttft, order[model]))
+
+    def status(self) -> dict:
+        """État de chaque modèle (pour /api/metrics)"""
+        with self._stats_lock:
+            return {
+                short_name(model): {
+                    "healthy": self._stats[model].healthy,
+                    "ttft_ms": round(self._stats[model].ttft * 1000),
+                    "error_rate": round(self._stats[model].error_rate, 2),
+                    "samples": len(self._stats[model].outcomes),
+                }
+                for model in self.models
+            }
+
+    def stream_chat(self, messages: list, handle=None, **params):
+        """Fragments de texte de la réponse du modèle retenu
+
+        Args:
+            messages: Messages du chat
+            handle: Poignée d'annulation (streaming.StreamHandle) fermant les requêtes en cours
+            **params: temperature, max_tokens...
+        """
+        request = dict(messages=messages, **params)
+        candidates = self.ranked_models()
+        events = queue.Queue()
+        attempts = []
+        failed = []
+
+        def launch():
+            attempts.append(_Attempt(self, candidates[len(attempts)], request, events))
+
+        def close_all(keep=None):
+            for attempt in list(attempts):
+                if attempt is not keep:
+                    attempt.close()
+
+        if handle is not None:
+            handle.on_cancel(close_all)
+
+        try:
+            launch()
+            winner = None
+            while winner is None:
+                in_flight = len(attempts) - len(failed)
+                can_hedge = len(attempts) < len(candidates)
+                try:
+                    event = events.get(timeout=self.hedge_after if can_hedge else None)
+                except queue.Empty:
+                    # Premier token trop lent : requête de secours sur le modèle suivant
+                    metrics.incr("llm.hedges")
+                    print(f"Premier token lent sur {short_name(attempts[-1].model)}, "
+                          f"requête de secours sur {short_name(candidates[len(attempts)])}")
+                    launch()
+                    continue
+
+                if handle is not None and handle.cancelled:
+                    return
+                kind, attempt = event[0], event[1]
+                if kind == "first":
+                    winner = attempt
+                    continue
+
+                failed.append(attempt)
+                if kind == "error":
+                    print(f"Erreur du modèle {short_name(attempt.model)}: {event[2]}")
+                if len(attempts) < len(candidates):
+                    # Bascule immédiate sur le modèle suivant
+                    metrics.incr("llm.failovers")
+                    launch()
+                elif in_flight == 1:
+                    raise event[2] if kind == "error" else RuntimeError("Requête abandonnée")
+
+            close_all(keep=winner)
+            if winner is not attempts[0]:
+                metrics.incr("llm.failover_wins" if attempts[0] in failed else "llm.hedge_wins")
+            self.last_model = winner.model
+            if handle is not None:
+                handle.on_cancel(winner.close)
+
+            if winner.first_text:
+                yield winner.first_text
+            try:
+                for chunk in winner.chunks:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            except Exception:
+                # Erreur en cours de réponse : pas de bascule (texte déjà envoyé)
+                if not winner.abandoned:
+                    self.record_error(winner.model)
+                raise
+        finally:
+            close_all()
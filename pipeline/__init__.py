@@ -0,0 +1,29 @@
+"""
+Pipeline de réponse commun à app.py (Flask) et model1.py (Streamlit)
+
+Une question traverse des étapes à l'interface commune (Stage.run(turn)),
+chacune remplaçable indépendamment et chronométrée (pipeline.<étape>_ms dans
+/api/metrics, turn.timings pour le traitement par lot) :
+- understand : langue et question clarifiée (understand.py) ;
+- retrieve : passages les plus proches dans l'index (retrieve.py) ;
+- assemble : contexte dédoublonné, budget et messages (assemble.py) ;
+- generate : réponse en streaming du routeur Fireworks (generate.py) ;
+- log : historique et journal des échanges (log.py).
+Caches, filtre hors sujet et table de faits s'appliquent ainsi aux deux
+interfaces (chatbot.py).
+"""
+
+from pipeline.assemble import DEFAULT_LIMITATIONS, SYSTEM_PROMPT_TEMPLATE, Assemble
+from pipeline.base import Stage, Turn
+from pipeline.chatbot import PDFChatbot
+from pipeline.generate import Generate
+from pipeline.log import Log
+from pipeline.retrieve import Retrieve
+from pipeline.understand import InteractiveClarifier, TranscriptionCorrector, Understand
+
+__all__ = [
+    "PDFChatbot", "Turn", "Stage",
+    "Understand", "Retrieve", "Assemble", "Generate", "Log",
+    "TranscriptionCorrector", "InteractiveClarifier",
+    "DEFAULT_LIMITATIONS", "SYSTEM_PROMPT_TEMPLATE",
+]
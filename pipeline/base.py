@@ -0,0 +1,57 @@
+"""
+Tour de conversation et interface commune des étapes du pipeline
+"""
+
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from context_builder import Context
+from intent_budget import Budget
+from metrics import metrics
+from streaming import StreamHandle
+
+
+@dataclass
+class Turn:
+    """Une question et ce que chaque étape en a tiré"""
+    question: str
+    history: list                  # historique de la conversation (modifié par l'étape log)
+    index: int = 0                 # échanges précédents de cette conversation (0 : première question)
+    language: str = None           # french, english ou darija
+    clarified: str = None          # question reformulée en français, avec l'instruction de langue
+    scope: dict = field(default_factory=dict)   # {"schools": [...], "documents": [...]}
+    handle: StreamHandle = None
+    input_type: str = "text"       # text, voice ou suggested
+    vector: list = None            # embedding de recherche (celui du filtre hors sujet s'il existe)
+    passages: list = field(default_factory=list)  # (document, distance)
+    context: Context = None
+    intent: str = None
+    budget: Budget = None
+    messages: list = None
+    answer: str = ""
+    source: str = None             # cache, topic_guard, facts ou llm
+    failed: bool = False           # erreur ou réponse interrompue : ni historique ni journal
+    timings: dict = field(default_factory=dict)   # étape -> ms
+
+
+class Stage:
+    """Étape remplaçable du pipeline : run(turn) complète le tour
+
+    La durée de chaque exécution est gardée dans turn.timings et suivie dans
+    /api/metrics (pipeline.<étape>_ms).
+    """
+    name = "stage"
+
+    @contextmanager
+    def timed(self, turn: Turn):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            turn.timings[self.name] = round(elapsed, 1)
+            metrics.observe(f"pipeline.{self.name}_ms", elapsed)
+
+    def run(self, turn: Turn):
+        raise NotImplementedError
@@ -0,0 +1,283 @@
+"""
+Chatbot EMINES commun à app.py (Flask) et model1.py (Streamlit)
+
+Réponses directes, sans appel LLM, dans l'ordre :
+- réponse pré-calculée (début de conversation, answer_cache.py) ;
+- refus d'une question nettement hors périmètre (topic_guard.py) ;
+- réponse factuelle de la table de faits (facts.py).
+Sinon, étapes du pipeline : understand -> retrieve -> assemble -> generate,
+les questions identiques posées en même temps étant regroupées (inflight).
+L'étape log ajoute enfin l'échange à l'historique et au journal de chaque
+conversation, une seule fois par historique.
+"""
+
+import json
+import os
+import time
+from typing import Generator
+
+from openai import OpenAI
+
+import facts
+from answer_cache import AnswerCache, prompt_fingerprint, replay_answer
+from audio_preprocessing import prepare_for_whisper, record_transcription_latency
+from index_store import shared_vector_store
+from model_router import ModelRouter
+from pipeline.assemble import DEFAULT_LIMITATIONS, SYSTEM_PROMPT_TEMPLATE, Assemble
+from pipeline.base import Turn
+from pipeline.generate import Generate
+from pipeline.log import Log
+from pipeline.retrieve import Retrieve
+from pipeline.understand import TranscriptionCorrector, Understand
+from question_clusters import normalize_question
+from streaming import StreamHandle, inflight
+from stt_backends import create_stt_backend
+from topic_guard import TopicGuard, guess_language, refusal_text
+
+
+class PDFChatbot:
+    def __init__(self, temperature: float = 0.2, vector_store=None, answer_cache: AnswerCache = None,
+                 log_sink=None):
+        self.corrector = TranscriptionCorrector()
+        self.client = OpenAI(
+            api_key=os.getenv("FIREWORKS_API_KEY"),
+            base_url="https://api.fireworks.ai/inference/v1"
+        )
+        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.stt = create_stt_backend(self.openai_client)
+        vector_store = vector_store if vector_store is not None else shared_vector_store()
+        self.topic_guard = TopicGuard(vector_store)
+        self.answer_cache = answer_cache if answer_cache is not None else AnswerCache()
+        self.chat_history = []
+        self.limitations = DEFAULT_LIMITATIONS
+        self.last_limitations = self.limitations
+        self.last_detected_language = None
+        self.last_turn = None
+
+        # Étapes remplaçables une à une (ex. chatbot.retrieve = Retrieve(autre_index))
+        self.understand = Understand(self.openai_client)
+        # Écoles parcourues par défaut (SEARCH_SCHOOLS=EMINES,...), toutes si vide
+        schools = [s.strip() for s in os.getenv("SEARCH_SCHOOLS", "").split(",") if s.strip()]
+        self.retrieve = Retrieve(vector_store, schools)
+        self.assemble = Assemble(self.system_prompt)
+        # Modèle Fireworks choisi à chaque requête selon la latence et la santé (model_router.py)
+        self.generate = Generate(ModelRouter(self.client), self.topic_guard, temperature)
+        self.log = Log(log_sink)
+
+    @property
+    def clarifier(self):
+        return self.understand.clarifier
+
+    @property
+    def vector_store(self):
+        return self.retrieve.vector_store
+
+    @vector_store.setter
+    def vector_store(self, vector_store):
+        self.retrieve.vector_store = vector_store
+
+    @property
+    def router(self) -> ModelRouter:
+        return self.generate.router
+
+    @router.setter
+    def router(self, router: ModelRouter):
+        self.generate.router = router
+
+    @property
+    def search_schools(self) -> list:
+        return self.retrieve.schools
+
+    @property
+    def temperature(self) -> float:
+        return self.generate.temperature
+
+    def update_temperature(self, new_temperature: float):
+        """Met à jour la température pour les futures réponses"""
+        self.generate.temperature = new_temperature
+
+    def system_prompt(self, context: str = "") -> str:
+        """Construit le prompt système avec les limitations et le contexte documentaire"""
+        return SYSTEM_PROMPT_TEMPLATE.format(limitations=self.limitations, context=context)
+
+    def detect_language(self, text: str) -> str:
+        """Détecte la langue du texte en utilisant GPT-4o-mini"""
+        return self.understand.detect_language(text)
+
+    def transcribe_audio(self, audio_bytes: bytes, filename: str = "recording.webm") -> str:
+        """Transcrit l'audio en texte avec le backend STT configuré (STT_BACKEND)
+
+        L'audio est envoyé depuis la mémoire (tuple nom de fichier + octets),
+        le nom servant uniquement à indiquer le format à Whisper.
+        Avec AUDIO_PREPROCESS=1, l'audio est d'abord réduit (audio_preprocessing.py).
+        """
+        text, _ = self._transcribe(audio_bytes, filename, with_language=False)
+        return text
+
+    def transcribe_audio_with_language(self, audio_bytes: bytes, filename: str = "recording.webm") -> tuple:
+        """Transcrit l'audio et retourne aussi la langue détectée par Whisper
+
+        Returns:
+            tuple: (transcription, langue parmi french/english/darija, ou None si inconnue)
+        """
+        return self._transcribe(audio_bytes, filename, with_language=True)
+
+    def _transcribe(self, audio_bytes: bytes, filename: str, with_language: bool) -> tuple:
+        try:
+            audio_bytes, filename, label = prepare_for_whisper(audio_bytes, filename)
+            started_at = time.perf_counter()
+            transcription = self.stt.transcribe(audio_bytes, filename, with_language=with_language)
+            record_transcription_latency(f"{self.stt.name}.{label}", started_at)
+            return transcription.text, transcription.language
+        except Exception as e:
+            return f"Erreur de transcription : {str(e)}", None
+
+    def correct_and_transcribe(self, audio_bytes: bytes, filename: str = "recording.webm") -> tuple:
+        """Transcrit l'audio et corrige automatiquement les erreurs courantes
+
+        Returns:
+            tuple: (transcription_brute, transcription_corrigée)
+        """
+        raw_transcription = self.transcribe_audio(audio_bytes, filename)
+        if raw_transcription.startswith("Erreur"):
+            return raw_transcription, raw_transcription
+        corrected_transcription = self.corrector.correct_transcription(raw_transcription)
+        print(f"Transcription brute: {raw_transcription}")
+        print(f"Transcription corrigée: {corrected_transcription}")
+        return raw_transcription, corrected_transcription
+
+    def generate_response(self, user_query: str, use_cache: bool = True, detected_language: str = None,
+                          clarified_query: str = None, handle: StreamHandle = None,
+                          scope: dict = None, input_type: str = "text",
+                          turn_index: int = None) -> Generator[str, None, None]:
+        """Génère une réponse avec streaming
+
+        Args:
+            user_query: Question de l'utilisateur
+            use_cache: Utiliser les réponses pré-calculées
+            detected_language: Langue déjà connue (ex. détectée par Whisper), sinon détectée ici
+            clarified_query: Question déjà clarifiée (pipeline vocal), sinon clarifiée ici
+            handle: Poignée d'annulation du flux (déconnexion du client, /api/stop)
+            scope: Recherche limitée à des écoles / documents ({"schools": [...], "documents": [...]})
+            input_type: Origine de la question pour le journal (text, voice, suggested)
+            turn_index: Échanges déjà affichés dans la conversation de l'appelant ; par défaut
+                la longueur de chat_history, partagé par tous les visiteurs côté Flask
+        """
+        # Règles de restriction modifiées (barre latérale Streamlit) : nouvelle conversation
+        if self.last_limitations != self.limitations:
+            self.chat_history.clear()
+            self.last_limitations = self.limitations
+
+        if turn_index is None:
+            turn_index = len(self.chat_history)
+        turn = Turn(user_query, self.chat_history, turn_index, language=detected_language,
+                    clarified=clarified_query, scope=scope or {}, handle=handle, input_type=input_type)
+        self.last_turn = turn
+        yield from self._answer(turn, use_cache)
+
+    def _logged(self, turn: Turn, chunks) -> Generator[str, None, None]:
+        """Fragments de la réponse, puis étape log une fois la réponse complète"""
+        answer = []
+        for chunk in chunks:
+            answer.append(chunk)
+            yield chunk
+        turn.answer = "".join(answer)
+        self.log.run(turn)
+
+    def _answer(self, turn: Turn, use_cache: bool) -> Generator[str, None, None]:
+        # Réponse pré-calculée (warm-up) : uniquement en début de conversation,
+        # la clarification dépendant de l'historique ; calculée sur le périmètre par défaut
+        if use_cache and turn.index == 0 and not turn.scope:
+            cached = self.answer_cache.get(turn.question, self.system_prompt())
+            if cached:
+                print(f"Réponse en cache: {turn.question}")
+                turn.source = "cache"
+                self.last_detected_language = cached["language"]
+                yield from self._logged(turn, replay_answer(cached["answer"]))
+                return
+
+        # Question nettement hors périmètre (autre école, sujet général) :
+        # refus des limitations renvoyé aussitôt, sans appel LLM (topic_guard.py)
+        guarded = turn.clarified or turn.question
+        start = time.perf_counter()
+        verdict = self.topic_guard.check(guarded, first_turn=turn.index == 0)
+        turn.timings["topic_guard"] = round((time.perf_counter() - start) * 1000, 1)
+        # Embedding calculé par le filtre (question ambiguë du premier tour) : repris par
+        # retrieve plutôt qu'un second embedding de la question clarifiée
+        turn.vector = self.topic_guard.cached_vector(guarded)
+        if verdict:
+            language = turn.language or guess_language(turn.question)
+            turn.source = "topic_guard"
+            self.last_detected_language = language
+            yield from self._logged(turn, [refusal_text(verdict.kind, language, self.limitations)])
+            return
+
+        # Question factuelle (dates limites, durée, contact, lieu) : réponse construite
+        # depuis la table de faits extraite des PDFs, sans appel LLM (facts.py)
+        if facts.ENABLED and not turn.scope.get("documents"):
+            language = turn.language or guess_language(turn.question)
+            schools = turn.scope.get("schools") or self.search_schools
+            answer = facts.fact_store.answer(turn.clarified or turn.question, language, schools)
+            if answer:
+                print(f"Réponse factuelle: {turn.question}")
+                turn.source = "facts"
+                self.last_detected_language = language
+                yield from self._logged(turn, replay_answer(answer))
+                return
+
+        # Questions identiques posées en même temps (plusieurs bornes, question suggérée) :
+        # une seule détection / clarification / recherche / génération, diffusée à tous
+        if turn.index == 0:
+            yield from self._coalesced(turn)
+            return
+
+        yield from self._logged(turn, self._run_stages(turn, turn.handle))
+
+    def _coalesced(self, turn: Turn) -> Generator[str, None, None]:
+        """Génération partagée entre les demandeurs simultanés de la même question
+
+        La clé couvre tout ce qui change la réponse : prompt système (limitations),
+        température, langue, périmètre et question. Le premier demandeur écrit son
+        historique et son journal dans le thread de génération, même s'il se
+        déconnecte ; chaque suivant écrit les siens en fin de lecture, sauf s'il
+        partage l'historique du premier (chatbot commun de Flask).
+        """
+        key = f"{prompt_fingerprint(self.system_prompt())}|{self.temperature}|{turn.language or 'auto'}|" \
+              f"{json.dumps(turn.scope, sort_keys=True)}|{normalize_question(turn.question)}"
+        leader = yield from inflight.run(
+            key, lambda upstream: self._logged(turn, self._run_stages(turn, upstream)), turn.handle, context=turn
+        )
+        if leader is turn:
+            return
+
+        # Réponse lue dans la génération d'une autre requête : état repris du premier demandeur
+        turn.source = leader.source
+        turn.language = leader.language
+        turn.clarified = leader.clarified
+        turn.intent, turn.budget, turn.messages = leader.intent, leader.budget, leader.messages
+        turn.answer = leader.answer
+        turn.failed = leader.failed or (turn.handle is not None and turn.handle.cancelled)
+        self.last_detected_language = leader.language
+        if turn.history is not leader.history:
+            self.log.run(turn)
+
+    def _run_stages(self, turn: Turn, handle: StreamHandle = None) -> Generator[str, None, None]:
+        """Pipeline complet : langue, clarification, recherche, génération Fireworks"""
+        turn.source = "llm"
+        turn.handle = handle  # poignée amont, partagée par les requêtes regroupées
+        self.understand.run(turn)
+        self.last_detected_language = turn.language
+
+        if not self.vector_store:
+            turn.failed = True
+            yield "⚠️ Aucun document trouvé dans le dossier 'docs/'"
+            return
+
+        # Flux arrêté pendant la détection / clarification : pas d'appel Fireworks
+        if handle is not None and handle.cancelled:
+            turn.failed = True
+            return
+
+        self.retrieve.run(turn)
+        self.assemble.run(turn)
+        yield from self.generate.run(turn)
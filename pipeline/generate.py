@@ -0,0 +1,79 @@
+"""
+Étape « generate » : réponse en streaming du modèle Fireworks
+"""
+
+import time
+from typing import Generator
+
+import intent_budget
+from context_builder import count_tokens
+from metrics import metrics
+from pipeline.base import Stage, Turn
+from streaming import record_generation
+
+
+class Generate(Stage):
+    """Modèle le plus rapide parmi les modèles sains (model_router.py), annulable"""
+    name = "generate"
+
+    def __init__(self, router, topic_guard=None, temperature: float = 0.2):
+        self.router = router
+        self.topic_guard = topic_guard
+        self.temperature = temperature
+
+    def run(self, turn: Turn) -> Generator[str, None, None]:
+        with self.timed(turn):
+            start = time.perf_counter()
+            try:
+                answer = yield from self._stream(turn, turn.messages, turn.budget.max_tokens, start)
+                if turn.failed:
+                    return
+                generated_tokens = count_tokens(answer)
+                intent_budget.record_usage(turn.intent, turn.budget, generated_tokens)
+                if intent_budget.needs_continuation(turn.budget, generated_tokens):
+                    # Réponse coupée par un budget court : suite avec le budget par défaut,
+                    # affichée à la suite du texte déjà envoyé
+                    print(f"Réponse coupée ({turn.intent}, {turn.budget.max_tokens} tokens), suite demandée")
+                    metrics.incr(f"llm.budget_continued.{turn.intent}")
+                    answer += yield from self._stream(
+                        turn, intent_budget.continuation_messages(turn.messages, answer),
+                        intent_budget.DEFAULT_BUDGET.max_tokens, start
+                    )
+                if not turn.failed and self.topic_guard is not None:
+                    self.topic_guard.record_answer(answer)
+
+            except Exception as e:
+                turn.failed = True
+                # Connexion fermée par une annulation : rien à renvoyer
+                if turn.handle is None or not turn.handle.cancelled:
+                    yield f"Erreur : {str(e)}"
+
+    def _stream(self, turn: Turn, messages: list, max_tokens: int, start: float) -> Generator[str, None, str]:
+        """Fragments d'un appel au modèle ; renvoie le texte reçu (turn.failed si interrompu)
+
+        Le délai du premier fragment depuis start est gardé dans turn.timings["first_token"].
+        """
+        # Secours si le premier token tarde ; une annulation ferme aussitôt les requêtes en cours
+        chunks = self.router.stream_chat(
+            messages,
+            handle=turn.handle,
+            temperature=float(self.temperature),
+            max_tokens=max_tokens
+        )
+
+        full_response = []
+        completed = False
+        try:
+            for text_chunk in chunks:
+                turn.timings.setdefault("first_token", round((time.perf_counter() - start) * 1000, 1))
+                full_response.append(text_chunk)
+                yield text_chunk
+            completed = turn.handle is None or not turn.handle.cancelled
+        finally:
+            # Libère la connexion Fireworks, y compris si le client est parti
+            chunks.close()
+            # Réponse interrompue : ni historique ni journal
+            turn.failed = turn.failed or not completed
+            # Tokens réels du texte reçu (un fragment peut en contenir plusieurs)
+            record_generation(count_tokens("".join(full_response)), completed, max_tokens)
+        return "".join(full_response)
@@ -0,0 +1,24 @@
+"""
+Étape « log » : historique de la conversation et journal des échanges
+"""
+
+from pipeline.base import Stage, Turn
+
+
+class Log(Stage):
+    """Ajoute l'échange à l'historique et le transmet au journal (analytics de model1.py)"""
+    name = "log"
+
+    def __init__(self, sink=None):
+        self.sink = sink  # sink(turn), appelé pour chaque réponse complète
+
+    def run(self, turn: Turn):
+        if turn.failed or not turn.answer:
+            return
+        with self.timed(turn):
+            turn.history.append({
+                "user": turn.question,
+                "assistant": turn.answer
+            })
+            if self.sink is not None:
+                self.sink(turn)
@@ -0,0 +1,28 @@
+"""
+Étape « retrieve » : passages les plus proches de la question clarifiée
+(FAISS et index lexical BM25, voir index_store.py)
+"""
+
+from context_builder import FETCH_K as CONTEXT_FETCH_K
+from pipeline.base import Stage, Turn
+
+
+class Retrieve(Stage):
+    """Recherche dans les partitions des écoles demandées (index_store.py)"""
+    name = "retrieve"
+
+    def __init__(self, vector_store, schools: list = None, k: int = CONTEXT_FETCH_K):
+        self.vector_store = vector_store
+        self.schools = schools or []  # écoles parcourues par défaut, toutes si vide
+        self.k = k
+
+    def run(self, turn: Turn):
+        with self.timed(turn):
+            schools = turn.scope.get("schools") or self.schools
+            documents = turn.scope.get("documents")
+            # Vecteur déjà posé par le filtre hors sujet (question du premier tour) : réutilisé
+            if turn.vector is None:
+                turn.vector = self.vector_store._embed_query(turn.clarified)
+            turn.passages = self.vector_store.similarity_search_with_score_by_vector(
+                turn.vector, k=self.k, schools=schools, documents=documents, query=turn.clarified
+            )
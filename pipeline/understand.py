@@ -0,0 +1,350 @@
+"""
+Étape « understand » : langue de la question et question clarifiée
+
+- langue détectée par GPT-4o-mini, sauf si elle est déjà connue (Whisper) ;
+- question reformulée en français pour la recherche, avec l'instruction de
+  langue de réponse ([RESPOND IN ENGLISH], [RÉPONDS EN DARIJA MAROCAIN]).
+Le correcteur de transcriptions (voix) et le clarifieur sont partagés par
+app.py et model1.py.
+"""
+
+import json
+import os
+
+from openai import OpenAI
+
+from local_corrector import local_corrector
+from pipeline.base import Stage, Turn
+
+
+class TranscriptionCorrector:
+    """Corrige les transcriptions vocales avec GPT-4o-mini d'OpenAI"""
+    def __init__(self):
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    def correct_transcription(self, transcription: str) -> str:
+        """Corrige automatiquement les erreurs courantes dans la transcription
+        
+        La correction locale (local_corrector.py) suffit dans la plupart des cas ;
+        le LLM n'est appelé que si une correction est douteuse.
+        """
+        local = local_corrector.correct(transcription)
+        if local.confident:
+            return local.text
+        return self.correct_with_llm(transcription)
+
+    def correct_with_llm(self, transcription: str) -> str:
+        """Corrige la transcription avec GPT-4o-mini"""
+        correction_prompt = [
+            {
+                "role": "system",
+                "content": """Tu es un correcteur orthographique automatique. Tu corriges UNIQUEMENT l'orthographe, tu ne réponds JAMAIS aux questions.
+
+**Ta seule mission** : Corriger les fautes d'orthographe dans les noms propres et termes techniques d'EMINES.
+
+**Corrections autorisées** :
+- "émine", "hémine", "émines" → "EMINES"
+- "um6p", "um 6p" → "UM6P"  
+- "ben guérir" → "Ben Guerir"
+- "management industrielle" → "Management Industriel"
+- "cycle ingénieur" → "Cycle Ingénieur"
+
+**INTERDICTIONS ABSOLUES** :
+❌ NE réponds JAMAIS à la question posée
+❌ NE fournis JAMAIS d'information
+❌ NE reformule PAS la phrase
+❌ NE change que les mots mal orthographiés
+❌ NE modifie PAS la structure de la phrase
+
+**Exemples corrects** :
+
+Entrée: "Combien coûte hémine ?"
+Sortie: "Combien coûte EMINES ?"
+
+Entrée: "Où se trouve émine exactement ?"
+Sortie: "Où se trouve EMINES exactement ?"
+
+Entrée: "Quel est le programme de première année à l'émine ?"
+Sortie: "Quel est le programme de première année à l'EMINES ?"
+
+Entrée: "Comment postuler à um 6p ?"
+Sortie: "Comment postuler à UM6P ?"
+
+Retourne UNIQUEMENT le texte avec corrections orthographiques, rien d'autre."""
+            },
+            {"role": "user", "content": transcription}
+        ]
+
+        try:
+            response = self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=correction_prompt,
+                temperature=0.1,
+                max_tokens=150
+            )
+            corrected = response.choices[0].message.content.strip()
+            
+            unwanted_prefixes = [
+                "Voici la transcription corrigée :",
+                "Voici la correction :",
+                "La transcription corrigée est :",
+                "Transcription corrigée :",
+                "Correction :",
+                "Voici :",
+                "Le programme",
+                "La première année",
+            ]
+            
+            for prefix in unwanted_prefixes:
+                if corrected.lower().startswith(prefix.lower()):
+                    corrected = corrected[len(prefix):].strip()
+                    break
+            
+            if len(corrected) > len(transcription) * 2:
+                return transcription
+            
+            return corrected
+        except Exception as e:
+            print(f"Erreur correction: {e}")
+            return transcription
+
+
+class InteractiveClarifier:
+    def __init__(self):
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.conversation_history = []
+
+    def clarify_question(self, user_query: str, chat_history: list = None, detected_language: str = "french") -> str:
+        """Clarifie la question utilisateur en utilisant l'historique de conversation"""
+        
+        context_text = "Aucune conversation précédente"
+        if chat_history and len(chat_history) > 0:
+            recent_history = chat_history[-2:]
+            context_parts = []
+            for interaction in recent_history:
+                context_parts.append(f"Q: {interaction['user']}")
+            context_text = "\n".join(context_parts)
+        
+        clarification_prompt = [
+            {
+                "role": "system",
+                "content": f"""Tu es un assistant qui clarifie les questions pour EMINES - School of Industrial Management (UM6P).
+
+**Ta mission** : Reformuler les questions en FRANÇAIS (pour chercher dans la base de données française).
+
+**À propos d'EMINES** :
+- École : EMINES (School of Industrial Management)
+- Université : UM6P (Université Mohammed VI Polytechnique)
+- Localisation : Ben Guerir, Maroc
+- Programmes : Cycle Préparatoire (2 ans) + Cycle Ingénieur (3 ans) en Management Industriel
+
+**Règles de clarification** :
+
+1. **Traduire en FRANÇAIS** si la question est en darija ou anglais :
+   - "kifach npostuler?" → "Comment postuler à EMINES ?"
+   - "how to apply?" → "Comment postuler à EMINES ?"
+   - "wach kayna bourse?" → "Y a-t-il des bourses à EMINES ?"
+
+2. **Si la question est vague ou incomplète**, la clarifier :
+   - "et pour les frais?" → "Quels sont les frais de scolarité à EMINES ?"
+   - "la bourse?" → "Y a-t-il des bourses d'études disponibles à EMINES ?"
+
+3. **Ne JAMAIS répondre à la question**, seulement la clarifier/traduire.
+
+**Historique de conversation récent :**
+{context_text}
+
+**Exemples de clarification :**
+
+Question: "kifach ndfE3 l EMINES?"
+Clarification: "Comment postuler à EMINES ?"
+
+Question: "wach kayna bourse?"
+Clarification: "Y a-t-il des bourses à EMINES ?"
+
+Question: "how much does it cost?"
+Clarification: "Quels sont les frais de scolarité à EMINES ?"
+
+Question: "et pour les frais?"
+Clarification: "Quels sont les frais de scolarité à EMINES ?"
+
+Retourne UNIQUEMENT la question clarifiée EN FRANÇAIS, rien d'autre."""
+            },
+            {"role": "user", "content": user_query}
+        ]
+
+        try:
+            response = self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=clarification_prompt,
+                temperature=0.2,
+                max_tokens=150
+            )
+            clarified = response.choices[0].message.content.strip()
+            
+            if detected_language == "darija":
+                clarified = f"{clarified} [RÉPONDS EN DARIJA MAROCAIN]"
+            elif detected_language == "english":
+                clarified = f"{clarified} [RESPOND IN ENGLISH]"
+            
+            self.conversation_history.append({
+                "original": user_query,
+                "clarified": clarified,
+                "language": detected_language
+            })
+            
+            return clarified
+        except Exception as e:
+            print(f"Erreur clarification: {e}")
+            return user_query
+
+    def correct_and_clarify(self, transcription: str, chat_history: list = None, detected_language: str = "french") -> tuple:
+        """Corrige une transcription vocale et la clarifie en un seul appel GPT-4o-mini
+        
+        Returns:
+            tuple: (transcription_corrigée, question_clarifiée)
+        """
+        context_text = "Aucune conversation précédente"
+        if chat_history and len(chat_history) > 0:
+            context_text = "\n".join(f"Q: {interaction['user']}" for interaction in chat_history[-2:])
+        
+        prompt = [
+            {
+                "role": "system",
+                "content": f"""Tu traites des questions vocales transcrites pour EMINES - School of Industrial Management (UM6P), Ben Guerir, Maroc.
+Tu ne réponds JAMAIS à la question.
+
+**Étape 1 - "corrected"** : corrige UNIQUEMENT l'orthographe des noms propres, sans reformuler :
+- "émine", "hémine", "émines" → "EMINES"
+- "um6p", "um 6p" → "UM6P"
+- "ben guérir" → "Ben Guerir"
+- "management industrielle" → "Management Industriel"
+- "cycle ingénieur" → "Cycle Ingénieur"
+
+**Étape 2 - "clarified"** : reformule la question corrigée EN FRANÇAIS (traduis le darija ou l'anglais), en la complétant si elle est vague grâce à l'historique :
+- "kifach npostuler?" → "Comment postuler à EMINES ?"
+- "how much does it cost?" → "Quels sont les frais de scolarité à EMINES ?"
+- "et pour les frais?" → "Quels sont les frais de scolarité à EMINES ?"
+
+**Historique de conversation récent :**
+{context_text}
+
+Retourne UNIQUEMENT un objet JSON : {{"corrected": "...", "clarified": "..."}}"""
+            },
+            {"role": "user", "content": transcription}
+        ]
+
+        try:
+            response = self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=prompt,
+                temperature=0.1,
+                max_tokens=300,
+                response_format={"type": "json_object"}
+            )
+            result = json.loads(response.choices[0].message.content)
+            corrected = (result.get("corrected") or transcription).strip()
+            clarified = (result.get("clarified") or corrected).strip()
+            
+            # Même garde-fou que le correcteur : une "correction" trop longue est une réponse
+            if len(corrected) > len(transcription) * 2:
+                corrected = transcription
+            
+            if detected_language == "darija":
+                clarified = f"{clarified} [RÉPONDS EN DARIJA MAROCAIN]"
+            elif detected_language == "english":
+                clarified = f"{clarified} [RESPOND IN ENGLISH]"
+            
+            self.conversation_history.append({
+                "original": transcription,
+                "clarified": clarified,
+                "language": detected_language
+            })
+            
+            return corrected, clarified
+        except Exception as e:
+            print(f"Erreur correction/clarification: {e}")
+            return transcription, self.clarify_question(transcription, chat_history, detected_language)
+
+
+class Understand(Stage):
+    """Langue (si elle n'est pas connue) puis question clarifiée"""
+    name = "understand"
+
+    def __init__(self, openai_client, clarifier: InteractiveClarifier = None):
+        self.openai_client = openai_client
+        self.clarifier = clarifier if clarifier is not None else InteractiveClarifier()
+
+    def detect_language(self, text: str) -> str:
+        """Détecte la langue du texte en utilisant GPT-4o-mini"""
+        try:
+            detection_prompt = [
+                {
+                    "role": "system",
+                    "content": """Tu es un détecteur de langue expert. Analyse le texte et identifie la langue principale.
+
+**Langues possibles :**
+- french (Français standard)
+- english (Anglais)
+- darija (Arabe dialectal marocain / Darija)
+
+**Règles :**
+1. Si le texte contient du Darija (même mélangé avec du français), retourne "darija"
+2. Si le texte est en anglais pur, retourne "english"
+3. Si le texte est en français standard (sans Darija), retourne "french"
+
+**Exemples :**
+
+Texte: "kifach npostuler l EMINES?"
+Langue: darija
+
+Texte: "wach kayna bourse f EMINES?"
+Langue: darija
+
+Texte: "chno homa les programmes?"
+Langue: darija
+
+Texte: "Quels sont les programmes d'EMINES ?"
+Langue: french
+
+Texte: "how to apply to EMINES?"
+Langue: english
+
+Texte: "fine kayna EMINES?"
+Langue: darija
+
+Texte: "et pour les frais?"
+Langue: french
+
+Réponds UNIQUEMENT par un seul mot : "french", "english" ou "darija"."""
+                },
+                {"role": "user", "content": f"Texte: {text}\nLangue:"}
+            ]
+            
+            response = self.openai_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=detection_prompt,
+                temperature=0.0,
+                max_tokens=10
+            )
+            
+            detected = response.choices[0].message.content.strip().lower()
+            
+            if detected in ["french", "english", "darija"]:
+                return detected
+            else:
+                return "french"
+                
+        except Exception as e:
+            print(f"Erreur détection langue: {e}")
+            return "french"
+
+    def run(self, turn: Turn):
+        with self.timed(turn):
+            if turn.language is None:
+                turn.language = self.detect_language(turn.question)
+            print(f"Langue détectée: {turn.language}")
+
+            if turn.clarified is None:
+                turn.clarified = self.clarifier.clarify_question(turn.question, turn.history, turn.language)
+            print(f"Question clarifiée: {turn.clarified}")
@@ -0,0 +1,259 @@
+"""
+Regroupement des questions quasi-identiques pour le "Top Questions"
+Usage: python question_clusters.py [--threshold 0.7] [--output question_clusters.json]
+
+Les questions sont normalisées (casse, accents, ponctuation) puis regroupées
+par MinHash/LSH sur des n-grammes de caractères, ce qui reste rapide même sur
+des dizaines de milliers de lignes. Le résultat (question_clusters.json) est
+consommé par le dashboard et par le cache de réponses.
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import unicodedata
+import zlib
+from collections import Counter, defaultdict
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:  # numpy est installé avec faiss, mais le script reste utilisable sans
+    np = None
+
+from analytics_store import ANALYTICS_DB
+
+CLUSTERS_FILE = "question_clusters.json"
+
+# Paramètres MinHash / LSH : 16 bandes de 4 lignes -> seuil implicite ~0.5,
+# les paires candidates sont ensuite vérifiées avec la similarité de Jaccard exacte
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.7
+
+# Premier de Mersenne 2^31 - 1 : a * h reste sous 2^63, sans débordement en uint64
+_MERSENNE_PRIME = (1 << 31) - 1
+
+# Coefficients des permutations, fixés pour que les signatures soient reproductibles
+_PERMUTATIONS = [
+    (
+        (zlib.crc32(f"a{i}".encode()) * 2654435761 + 1) % _MERSENNE_PRIME,
+        zlib.crc32(f"b{i}".encode()) % _MERSENNE_PRIME,
+    )
+    for i in range(NUM_PERMUTATIONS)
+]
+
+if np is not None:
+    _PERM_A = np.array([[a] for a, _ in _PERMUTATIONS], dtype=np.uint64)
+    _PERM_B = np.array([[b] for _, b in _PERMUTATIONS], dtype=np.uint64)
+
+
+def normalize_question(text: str) -> str:
+    """Normalise une question : minuscules, sans accents ni ponctuation"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w]+", " ", text)
+    return " ".join(text.split())
+
+
+def _shingles(normalized: str) -> set:
+    """Découpe une question normalisée en n-grammes de caractères"""
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def _minhash(shingles: set) -> list:
+    """Calcule la signature MinHash d'un ensemble de n-grammes"""
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+    if np is not None:
+        values = (_PERM_A * np.array(hashes, dtype=np.uint64) + _PERM_B) % _MERSENNE_PRIME
+        return values.min(axis=1).tolist()
+    return [
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def _original_marks(question: str) -> int:
+    """Majuscules et caractères accentués d'une forme brute (perdus à la normalisation)"""
+    return sum(1 for c in question if c.isupper() or (c.isalpha() and not c.isascii()))
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def cluster_questions(questions: list, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """Regroupe les questions similaires
+
+    Args:
+        questions: Liste des questions brutes (avec répétitions)
+        threshold: Similarité de Jaccard minimale entre deux questions normalisées
+
+    Returns:
+        Liste de groupes triés par fréquence décroissante :
+        [{"canonical": str, "count": int, "members": {question: count}}]
+    """
+    raw_counts = Counter(q.strip() for q in questions if q and q.strip())
+
+    # Les doublons exacts après normalisation sont fusionnés avant le MinHash,
+    # seules les formes normalisées distinctes passent par le LSH
+    by_normalized = defaultdict(Counter)
+    for question, count in raw_counts.items():
+        by_normalized[normalize_question(question)][question] += count
+
+    keys = list(by_normalized.keys())
+    shingles = [_shingles(k) for k in keys]
+
+    parent = list(range(len(keys)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    buckets = defaultdict(list)
+    for idx, sh in enumerate(shingles):
+        signature = _minhash(sh)
+        for band in range(BANDS):
+            start = band * ROWS_PER_BAND
+            buckets[(band, tuple(signature[start:start + ROWS_PER_BAND]))].append(idx)
+
+    # Dans chaque seau, un membre n'est comparé qu'à un représentant par groupe
+    # déjà présent : on évite ainsi le coût quadratique des gros seaux
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        representatives = {}
+        for i in members:
+            root = find(i)
+            if root in representatives:
+                continue
+            for rep_root, rep in list(representatives.items()):
+                if find(rep_root) == root:
+                    break
+                if _jaccard(shingles[i], shingles[rep]) >= threshold:
+                    parent[root] = find(rep_root)
+                    break
+            else:
+                representatives[root] = i
+
+    grouped = defaultdict(Counter)
+    for idx, key in enumerate(keys):
+        grouped[find(idx)].update(by_normalized[key])
+
+    groups = []
+    for members in grouped.values():
+        # Forme canonique : la plus fréquente ; à égalité, la forme d'origine
+        # (accents, majuscules) plutôt que sa variante en minuscules sans accents
+        canonical = min(
+            members.items(),
+            key=lambda item: (-item[1], -_original_marks(item[0]), len(item[0]), item[0])
+        )[0]
+        groups.append({
+            "canonical": canonical,
+            "count": sum(members.values()),
+            "members": dict(members.most_common()),
+        })
+
+    groups.sort(key=lambda g: (-g["count"], g["canonical"]))
+    return groups
+
+
+def build_canonical_index(groups: list) -> dict:
+    """Construit la table question normalisée -> question canonique"""
+    index = {}
+    for group in groups:
+        for member in group["members"]:
+            index[normalize_question(member)] = group["canonical"]
+    return index
+
+
+def canonicalize(question: str, canonical_index: dict) -> str:
+    """Retourne la question canonique du groupe, ou la question elle-même"""
+    return canonical_index.get(normalize_question(question), question)
+
+
+def top_questions(groups: list, n: int = 10) -> list:
+    """Retourne les n groupes les plus fréquents sous forme (canonique, fréquence)"""
+    return [(g["canonical"], g["count"]) for g in groups[:n]]
+
+
+def save_question_clusters(groups: list, path: str = CLUSTERS_FILE, threshold: float = DEFAULT_THRESHOLD):
+    """Sauvegarde les groupes de questions dans un fichier JSON"""
+    data = {
+        "generated_at": datetime.now().isoformat(),
+        "threshold": threshold,
+        "total_questions": sum(g["count"] for g in groups),
+        "groups": groups,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def load_question_clusters(path: str = CLUSTERS_FILE, newer_than: str = None):
+    """Charge les groupes de questions, ou None si le fichier est absent ou périmé
+
+    Args:
+        path: Fichier produit par ce script
+        newer_than: Horodatage ISO (ex. dernière interaction) ; le fichier est
+            considéré périmé s'il a été généré avant. None : pas de vérification.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if newer_than and data.get("generated_at", "") < newer_than:
+        return None
+    return data.get("groups")
+
+
+def load_logged_questions(db_path: str = ANALYTICS_DB) -> list:
+    """Charge les questions enregistrées dans la base analytics (lecture seule)
+
+    La base n'est ni créée ni migrée : liste vide si elle n'existe pas encore.
+    """
+    if not os.path.exists(db_path):
+        return []
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=10)
+    try:
+        return [row[0] for row in conn.execute("SELECT question FROM interactions")]
+    except sqlite3.OperationalError:
+        return []  # base sans table interactions
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regroupe les questions quasi-identiques")
+    parser.add_argument("--input", default=ANALYTICS_DB, help="Base analytics SQLite")
+    parser.add_argument("--output", default=CLUSTERS_FILE, help="Fichier de sortie")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Similarité minimale (0-1) pour fusionner deux questions")
+    args = parser.parse_args()
+
+    questions = load_logged_questions(args.input)
+    start = datetime.now()
+    groups = cluster_questions(questions, threshold=args.threshold)
+    elapsed = (datetime.now() - start).total_seconds()
+
+    save_question_clusters(groups, args.output, args.threshold)
+
+    print(f"{len(questions)} questions -> {len(groups)} groupes en {elapsed:.2f}s")
+    for canonical, count in top_questions(groups):
+        print(f"  {count:>5}  {canonical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,10 @@ let mediaRecorder = null;
 let audioChunks = [];
 let isRecording = false;
 let currentTranscription = '';
+let currentStreamId = null;
+// Answers shown in this conversation (the server history is shared by all visitors)
+let conversationTurns = 0;
+const STREAM_RESUME_ATTEMPTS = 3;
 
 // Initialize on page load
 document.addEventListener('DOMContentLoaded', () => {
@@ -27,6 +31,9 @@ async function sendMessage() {
     // Hide welcome screen
     hideWelcomeScreen();
     
+    // A new question replaces the answer still being generated
+    stopCurrentStream();
+    
     // Clear input
     input.value = '';
     
@@ -67,15 +74,13 @@ function formatMarkdown(text) {
 
 // Stream chat response from backend
 async function streamChatResponse(message, typingId) {
-    const chatMessages = document.getElementById('chat-messages');
-    
     try {
         const response = await fetch('/api/chat', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ message: message })
+            body: JSON.stringify({ message: message, turn: conversationTurns })
         });
 
         if (!response.ok) {
@@ -86,58 +91,23 @@ async function streamChatResponse(message, typingId) {
         removeTypingIndicator(typingId);
 
         // Create message element for bot response
-        const messageDiv = document.createElement('div');
-        messageDiv.className = 'message message-bot';
-        
-        const avatar = document.createElement('div');
-        avatar.className = 'message-avatar';
-        avatar.innerHTML = '<i class="fas fa-robot"></i>';
-        
-        const contentDiv = document.createElement('div');
-        contentDiv.className = 'message-content';
-        
-        const textDiv = document.createElement('div');
-        textDiv.className = 'message-text';
-        
-        contentDiv.appendChild(textDiv);
-        messageDiv.appendChild(avatar);
-        messageDiv.appendChild(contentDiv);
-        chatMessages.appendChild(messageDiv);
-
-        // Read the stream
-        const reader = response.body.getReader();
-        const decoder = new TextDecoder();
+        const textDiv = createBotMessage();
         let fullText = '';
+        let streamId = null;
 
-        while (true) {
-            const { done, value } = await reader.read();
-            
-            if (done) break;
-            
-            const chunk = decoder.decode(value);
-            const lines = chunk.split('\n');
-            
-            for (const line of lines) {
-                if (line.startsWith('data: ')) {
-                    const data = line.substring(6).trim();
-                    
-                    if (data === '[DONE]') {
-                        continue;
-                    }
-                    
-                    try {
-                        const parsed = JSON.parse(data);
-                        if (parsed.text) {
-                            fullText += parsed.text;
-                            textDiv.innerHTML = formatMarkdown(fullText);
-                            scrollToBottom();
-                        }
-                    } catch (e) {
-                        console.error('Error parsing SSE data:', e);
-                    }
-                }
+        // Read the stream (the server sends coalesced text frames)
+        await readResumableStream(response, (data) => {
+            if (data.stream) {
+                streamId = currentStreamId = data.stream;
+            } else if (data.text) {
+                fullText += data.text;
+                textDiv.innerHTML = formatMarkdown(fullText);
+                scrollToBottom();
             }
-        }
+        });
+
+        if (currentStreamId === streamId) currentStreamId = null;
+        if (fullText) conversationTurns++;
 
         // Final scroll
         scrollToBottom();
@@ -149,6 +119,202 @@ async function streamChatResponse(message, typingId) {
     }
 }
 
+// Create an empty bot message and return its text element
+function createBotMessage() {
+    const chatMessages = document.getElementById('chat-messages');
+
+    const messageDiv = document.createElement('div');
+    messageDiv.className = 'message message-bot';
+    
+    const avatar = document.createElement('div');
+    avatar.className = 'message-avatar';
+    avatar.innerHTML = '<i class="fas fa-robot"></i>';
+    
+    const contentDiv = document.createElement('div');
+    contentDiv.className = 'message-content';
+    
+    const textDiv = document.createElement('div');
+    textDiv.className = 'message-text';
+    
+    contentDiv.appendChild(textDiv);
+    messageDiv.appendChild(avatar);
+    messageDiv.appendChild(contentDiv);
+    chatMessages.appendChild(messageDiv);
+
+    return textDiv;
+}
+
+// Read an SSE response, calling onData with each parsed JSON payload and its event id.
+// Events are buffered so that those split across network chunks are not lost;
+// heartbeat comments (": keep-alive") carry no data and are skipped.
+// Returns true if the stream ended normally ([DONE]).
+async function readEventStream(response, onData) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let finished = false;
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const event of events) {
+            const lines = event.split('\n');
+            const idLine = lines.find(line => line.startsWith('id: '));
+            const data = lines
+                .filter(line => line.startsWith('data: '))
+                .map(line => line.substring(6))
+                .join('\n')
+                .trim();
+
+            if (data === '[DONE]') {
+                finished = true;
+                continue;
+            }
+            if (!data) continue;
+
+            try {
+                onData(JSON.parse(data), idLine ? idLine.substring(4) : null);
+            } catch (e) {
+                console.error('Error parsing SSE data:', e);
+            }
+        }
+    }
+    return finished;
+}
+
+// Read an SSE response; if the connection drops mid-answer, reconnect to
+// /api/stream/<id> with Last-Event-ID to get the missed part and the live tail
+async function readResumableStream(response, onData) {
+    let streamId = null;
+    let lastEventId = null;
+    let attempts = 0;
+    
+    const handleEvent = (data, id) => {
+        if (id) lastEventId = id;
+        if (data.stream) streamId = data.stream;
+        onData(data);
+    };
+    
+    while (true) {
+        try {
+            if (await readEventStream(response, handleEvent)) return;
+        } catch (error) {
+            console.warn('Stream interrupted:', error);
+        }
+        
+        let resumed = null;
+        while (!resumed) {
+            if (!streamId || attempts >= STREAM_RESUME_ATTEMPTS) {
+                throw new Error('Stream interrupted');
+            }
+            attempts++;
+            await new Promise(resolve => setTimeout(resolve, 500 * attempts));
+            
+            let retry;
+            try {
+                retry = await fetch(`/api/stream/${streamId}`, {
+                    headers: lastEventId ? { 'Last-Event-ID': lastEventId } : {}
+                });
+            } catch (error) {
+                continue;
+            }
+            if (!retry.ok) {
+                throw new Error('Stream could not be resumed');
+            }
+            console.log('Resuming stream', streamId, 'after', lastEventId);
+            resumed = retry;
+        }
+        response = resumed;
+    }
+}
+
+// Stop the answer being streamed, if any, so the server cancels its generation
+function stopCurrentStream() {
+    if (!currentStreamId) return;
+    
+    fetch('/api/stop', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ stream: currentStreamId })
+    }).catch(error => console.error('Error stopping stream:', error));
+    currentStreamId = null;
+}
+
+// Voice question: transcription, correction and answer over a single SSE stream
+async function voiceToAnswer(audioBlob) {
+    hideWelcomeScreen();
+    stopCurrentStream();
+    let typingId = showTypingIndicator();
+    
+    try {
+        const formData = new FormData();
+        const extension = audioBlob.type.includes('webm') ? 'webm' : 
+                         audioBlob.type.includes('ogg') ? 'ogg' : 
+                         audioBlob.type.includes('mp4') ? 'mp4' : 'wav';
+        formData.append('audio', audioBlob, `recording.${extension}`);
+        formData.append('turn', conversationTurns);
+        
+        console.log('Sending audio to voice pipeline:', audioBlob.size, 'bytes');
+        
+        const response = await fetch('/api/voice', {
+            method: 'POST',
+            body: formData
+        });
+        
+        if (!response.ok) {
+            const errorData = await response.json();
+            throw new Error(errorData.error || 'Voice pipeline failed');
+        }
+        
+        let userTextDiv = null;
+        let botTextDiv = null;
+        let fullText = '';
+        let error = null;
+        let streamId = null;
+        
+        await readResumableStream(response, (data) => {
+            if (data.stream) {
+                streamId = currentStreamId = data.stream;
+            } else if (data.error) {
+                error = data.error;
+            } else if (data.transcript) {
+                // Show the raw transcript right away, replaced by the corrected text
+                removeTypingIndicator(typingId);
+                userTextDiv = addMessage(data.transcript, 'user');
+                typingId = showTypingIndicator();
+            } else if (data.corrected) {
+                if (userTextDiv) userTextDiv.textContent = data.corrected;
+            } else if (data.text) {
+                if (!botTextDiv) {
+                    removeTypingIndicator(typingId);
+                    botTextDiv = createBotMessage();
+                }
+                fullText += data.text;
+                botTextDiv.innerHTML = formatMarkdown(fullText);
+                scrollToBottom();
+            }
+        });
+        
+        if (currentStreamId === streamId) currentStreamId = null;
+        removeTypingIndicator(typingId);
+        if (error) throw new Error(error);
+        if (fullText) conversationTurns++;
+        scrollToBottom();
+        
+    } catch (error) {
+        console.error('Error in voice pipeline:', error);
+        removeTypingIndicator(typingId);
+        addMessage('Erreur lors de la transcription. Veuillez réessayer.', 'bot');
+    }
+}
+
 // Add message to chat
 function addMessage(text, sender) {
     const chatMessages = document.getElementById('chat-messages');
@@ -181,6 +347,7 @@ function addMessage(text, sender) {
     
     chatMessages.appendChild(messageDiv);
     scrollToBottom();
+    return textDiv;
 }
 
 // Show typing indicator
@@ -250,10 +417,13 @@ function sendQuickQuestion(question) {
 
 // New chat
 async function newChat() {
+    stopCurrentStream();
+    
     try {
         await fetch('/api/clear', {
             method: 'POST'
         });
+        conversationTurns = 0;
         
         // Clear chat messages
         const chatMessages = document.getElementById('chat-messages');
@@ -350,7 +520,7 @@ async function startRecording() {
             console.log('Recording stopped, total chunks:', audioChunks.length);
             const audioBlob = new Blob(audioChunks, { type: mimeType || 'audio/webm' });
             console.log('Audio blob created:', audioBlob.size, 'bytes');
-            await transcribeAudio(audioBlob);
+            await voiceToAnswer(audioBlob);
             
             // Stop all tracks
             stream.getTracks().forEach(track => {
@@ -407,66 +577,6 @@ async function stopRecording() {
     }
 }
 
-async function transcribeAudio(audioBlob) {
-    const messageInput = document.getElementById('messageInput');
-    
-    // Afficher un indicateur visuel dans l'input
-    const originalPlaceholder = messageInput.placeholder;
-    messageInput.placeholder = '🎤 Transcription en cours...';
-    messageInput.disabled = true;
-    
-    try {
-        const formData = new FormData();
-        // Utiliser l'extension appropriée selon le type
-        const extension = audioBlob.type.includes('webm') ? 'webm' : 
-                         audioBlob.type.includes('ogg') ? 'ogg' : 
-                         audioBlob.type.includes('mp4') ? 'mp4' : 'wav';
-        formData.append('audio', audioBlob, `recording.${extension}`);
-        
-        console.log('Sending audio for transcription:', audioBlob.size, 'bytes');
-        
-        const response = await fetch('/api/transcribe', {
-            method: 'POST',
-            body: formData
-        });
-        
-        if (!response.ok) {
-            const errorData = await response.json();
-            throw new Error(errorData.error || 'Transcription failed');
-        }
-        
-        const data = await response.json();
-        console.log('Transcription response:', data);
-        
-        if (data.corrected || data.raw) {
-            // Utiliser la version corrigée ou la version brute
-            currentTranscription = data.corrected || data.raw;
-            
-            // Mettre la transcription directement dans l'input
-            messageInput.value = currentTranscription;
-            messageInput.placeholder = originalPlaceholder;
-            messageInput.disabled = false;
-            messageInput.focus();
-            
-            // Afficher aussi la version brute si différente (pour debug)
-            if (data.raw && data.corrected && data.raw !== data.corrected) {
-                console.log('Raw transcription:', data.raw);
-                console.log('Corrected transcription:', data.corrected);
-            }
-        } else {
-            throw new Error('No transcription data received');
-        }
-        
-    } catch (error) {
-        console.error('Error transcribing audio:', error);
-        
-        // Restaurer l'input et afficher une alerte
-        messageInput.placeholder = originalPlaceholder;
-        messageInput.disabled = false;
-        alert('Erreur lors de la transcription. Veuillez réessayer.');
-    }
-}
-
 function sendTranscription() {
     if (currentTranscription) {
         const input = document.getElementById('messageInput');
@@ -0,0 +1,454 @@
+"""
+Couche de streaming SSE commune à /api/chat et /api/voice
+
+La génération tourne dans un thread producteur ; un thread de diffusion
+regroupe les fragments de texte en trames (fenêtre de temps ou de taille)
+et les numérote dans un tampon circulaire. Chaque client abonné lit ce
+tampon : événements "id: <flux>:<numéro>", battements de cœur pendant les
+silences. Un client reconnecté avec Last-Event-ID reçoit la partie manquée
+puis la suite en direct, sans nouvel appel au LLM.
+
+Chaque flux a un StreamHandle (annulation coopérative) et reste dans
+active_streams jusqu'à RESUME_TTL après sa fin. Le flux est annulé via
+/api/stop, ou si aucun client ne s'est reconnecté RESUME_GRACE secondes
+après une déconnexion ; la connexion Fireworks est alors fermée aussitôt
+au lieu d'aller jusqu'à max_tokens.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+
+from metrics import metrics
+
+# Une trame part dès que FLUSH_INTERVAL est écoulé depuis son premier fragment
+# ou qu'elle atteint FLUSH_SIZE caractères
+FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_MS", "50")) / 1000
+FLUSH_SIZE = 64
+# Commentaire SSE envoyé en l'absence de données : garde la connexion
+# ouverte derrière les proxies et révèle les clients déconnectés
+HEARTBEAT_INTERVAL = float(os.getenv("STREAM_HEARTBEAT_S", "10"))
+# Fragments en attente au-delà desquels le producteur attend la diffusion
+QUEUE_SIZE = 256
+# Trames conservées par flux pour la reprise (une réponse complète en fait ~150)
+RING_SIZE = 512
+# Délai laissé à un client déconnecté pour se reconnecter avant d'annuler la génération
+RESUME_GRACE = float(os.getenv("STREAM_RESUME_GRACE_S", "15"))
+# Durée de conservation d'un flux terminé
+RESUME_TTL = 60
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache, no-transform",
+    "X-Accel-Buffering": "no",  # pas de mise en tampon par nginx / proxies
+}
+
+_END = object()
+
+
+class StreamHandle:
+    """Poignée d'annulation d'une génération, partagée entre la route et le générateur"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:12]
+        self._cancelled = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def on_cancel(self, callback):
+        """Enregistre une fonction appelée à l'annulation (immédiatement si déjà annulé)"""
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        with self._lock:
+            if self.cancelled:
+                return
+            self._cancelled.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Erreur lors de l'annulation du flux {self.id}: {e}")
+
+
+class StreamRegistry:
+    """Flux en cours ou récemment terminés, par identifiant (/api/stop, reprise)"""
+
+    def __init__(self):
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def register(self, stream):
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                stream_id for stream_id, s in self._streams.items()
+                if s.finished_at is not None and now - s.finished_at > RESUME_TTL
+            ]
+            for stream_id in expired:
+                del self._streams[stream_id]
+            self._streams[stream.id] = stream
+
+    def get(self, stream_id: str):
+        with self._lock:
+            return self._streams.get(stream_id)
+
+    def cancel(self, stream_id: str) -> bool:
+        """Annule un flux ; False s'il est inconnu ou déjà terminé"""
+        stream = self.get(stream_id)
+        if stream is None or stream.finished_at is not None:
+            return False
+        stream.handle.cancel()
+        metrics.incr("stream.stopped")
+        return True
+
+
+active_streams = StreamRegistry()
+
+
+def record_generation(generated_tokens: int, completed: bool, max_tokens: int):
+    """Comptabilise une génération LLM terminée ou interrompue
+
+    generated_tokens est compté sur le texte reçu (context_builder.count_tokens),
+    un fragment du flux pouvant contenir plusieurs tokens. Pour une
+    génération annulée, les tokens économisés sont estimés par rapport à la
+    longueur moyenne des réponses complètes (et majorés par max_tokens).
+    """
+    if completed:
+        metrics.observe("llm.completion_tokens", generated_tokens)
+        return
+    metrics.incr("llm.cancelled")
+    metrics.incr("llm.tokens_before_cancel", generated_tokens)
+    metrics.incr("llm.tokens_saved_max", max(0, max_tokens - generated_tokens))
+    completed_lengths = metrics.snapshot()["series"].get("llm.completion_tokens")
+    if completed_lengths:
+        metrics.incr("llm.tokens_saved_estimate", max(0, completed_lengths["mean"] - generated_tokens))
+
+
+def format_event(payload, event_id: str = None) -> str:
+    """Formate un événement SSE (payload JSON, ou chaîne brute comme [DONE])"""
+    data = payload if isinstance(payload, str) else json.dumps(payload)
+    if event_id is None:
+        return f"data: {data}\n\n"
+    return f"id: {event_id}\ndata: {data}\n\n"
+
+
+def parse_event_id(event_id: str) -> tuple:
+    """ "<flux>:<numéro>" -> (flux, numéro), ou (None, 0) si invalide"""
+    stream_id, _, seq = (event_id or "").partition(":")
+    if not stream_id or not seq.isdigit():
+        return None, 0
+    return stream_id, int(seq)
+
+
+class EventStream:
+    """Flux SSE alimenté par un générateur de fragments de texte (str) ou d'événements (dict)
+
+    Les fragments sont regroupés dans des trames {"text": ...} ; les dict sont
+    diffusés tels quels, immédiatement, après la trame en cours. La génération
+    démarre dès la création ; les clients lisent le flux avec subscribe().
+    """
+
+    def __init__(self, source, handle: StreamHandle = None):
+        self.source = source
+        self.handle = handle or StreamHandle()
+        self.id = self.handle.id
+        self.finished_at = None
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._ring = deque(maxlen=RING_SIZE)  # (numéro, payload)
+        self._seq = 0
+        self._finished = False
+        self._cond = threading.Condition()
+        self._subscribers = 0
+        self._grace_timer = None
+
+        # Réveille la diffusion si le flux est arrêté pendant une attente
+        self.handle.on_cancel(self._wake)
+        active_streams.register(self)
+        self._publish({"stream": self.id})
+        # Sans abonné pour l'instant : annulé si personne ne vient le lire
+        self._arm_grace_timer()
+        threading.Thread(target=self._produce, daemon=True).start()
+        threading.Thread(target=self._broadcast, daemon=True).start()
+
+    def _wake(self):
+        try:
+            self._queue.put_nowait(_END)
+        except queue.Full:
+            pass  # la diffusion a des fragments à traiter et verra l'annulation
+
+    # === Production : source -> file d'attente ===
+
+    def _put(self, item) -> bool:
+        # Bloque si la diffusion prend du retard, sans ignorer une annulation
+        while not self.handle.cancelled:
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        try:
+            for item in self.source:
+                if not self._put(item):
+                    break
+        except Exception as e:
+            self._put({"error": str(e)})
+        finally:
+            # Ferme le générateur, et avec lui le flux HTTP amont s'il est encore ouvert
+            self.source.close()
+            self._put(_END)
+
+    # === Diffusion : file d'attente -> trames numérotées dans le tampon ===
+
+    def _publish(self, payload):
+        with self._cond:
+            self._seq += 1
+            self._ring.append((self._seq, payload))
+            self._cond.notify_all()
+
+    def _finish(self):
+        with self._cond:
+            self._finished = True
+            self.finished_at = time.monotonic()
+            self._cond.notify_all()
+            timer = self._grace_timer
+        if timer is not None:
+            timer.cancel()
+
+    def _broadcast(self):
+        pending = []
+        pending_size = 0
+        pending_since = None
+
+        def flush():
+            nonlocal pending, pending_size, pending_since
+            self._publish({"text": "".join(pending)})
+            metrics.incr("stream.frames")
+            pending, pending_size, pending_since = [], 0, None
+
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0.0, pending_since + FLUSH_INTERVAL - time.monotonic())
+
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                flush()
+                continue
+
+            if item is _END or self.handle.cancelled:
+                if pending:
+                    flush()
+                if self.handle.cancelled:
+                    self._publish({"stopped": True})
+                self._finish()
+                return
+
+            if isinstance(item, str):
+                if not item:
+                    continue
+                metrics.incr("stream.deltas")
+                pending.append(item)
+                pending_size += len(item)
+                if pending_since is None:
+                    pending_since = time.monotonic()
+                if pending_size >= FLUSH_SIZE:
+                    flush()
+            else:
+                if pending:
+                    flush()
+                self._publish(item)
+
+    # === Abonnés ===
+
+    def _arm_grace_timer(self):
+        with self._cond:
+            if self._finished or self._subscribers:
+                return
+            if self._grace_timer is not None:
+                self._grace_timer.cancel()
+            self._grace_timer = threading.Timer(RESUME_GRACE, self._abandon)
+            self._grace_timer.daemon = True
+            self._grace_timer.start()
+
+    def _abandon(self):
+        with self._cond:
+            if self._subscribers or self._finished:
+                return
+        metrics.incr("stream.disconnects")
+        self.handle.cancel()
+
+    def can_resume(self, last_seq: int) -> bool:
+        """Vrai si les trames suivant last_seq sont encore dans le tampon"""
+        with self._cond:
+            oldest = self._ring[0][0] if self._ring else self._seq + 1
+            return last_seq + 1 >= oldest
+
+    def subscribe(self, last_seq: int = 0):
+        """Générateur SSE : trames après last_seq, puis la suite en direct jusqu'à [DONE]"""
+        with self._cond:
+            self._subscribers += 1
+            if self._grace_timer is not None:
+                self._grace_timer.cancel()
+        if last_seq:
+            metrics.incr("stream.resumes")
+
+        try:
+            while True:
+                with self._cond:
+                    events = [(seq, payload) for seq, payload in self._ring if seq > last_seq]
+                    if not events and not self._finished:
+                        self._cond.wait(timeout=HEARTBEAT_INTERVAL)
+                        events = [(seq, payload) for seq, payload in self._ring if seq > last_seq]
+                    finished = self._finished
+
+                for seq, payload in events:
+                    yield format_event(payload, f"{self.id}:{seq}")
+                    last_seq = seq
+
+                if not events:
+                    if finished:
+                        yield format_event("[DONE]")
+                        return
+                    yield ": keep-alive\n\n"
+        finally:
+            # Fin normale, ou client parti (GeneratorExit levée par le serveur WSGI) :
+            # la génération continue RESUME_GRACE secondes en attendant une reconnexion
+            with self._cond:
+                self._subscribers -= 1
+            self._arm_grace_timer()
+
+
+class _Flight:
+    """Génération partagée : fragments accumulés et lus par chaque abonné à son rythme"""
+
+    def __init__(self, context=None):
+        self.handle = StreamHandle()
+        self.context = context     # état du premier demandeur, rendu aux suivants
+        self.chunks = []
+        self.finished = False
+        self.subscribers = 0       # protégé par _cond, comme abandoned
+        self.abandoned = False
+        self._cond = threading.Condition()
+
+    def join(self) -> bool:
+        """Ajoute un abonné, sauf si la génération a déjà été abandonnée par tous"""
+        with self._cond:
+            if self.abandoned or self.handle.cancelled:
+                return False
+            self.subscribers += 1
+            return True
+
+    def publish(self, chunk: str):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self):
+        with self._cond:
+            self.finished = True
+            self._cond.notify_all()
+
+    def _notify(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def follow(self, handle: StreamHandle = None):
+        """Fragments de la génération depuis le début, jusqu'à sa fin ou l'annulation de handle"""
+        if handle is not None:
+            handle.on_cancel(self._notify)
+        index = 0
+        try:
+            while True:
+                with self._cond:
+                    while (index >= len(self.chunks) and not self.finished
+                           and not (handle is not None and handle.cancelled)):
+                        self._cond.wait()
+                    new_chunks = self.chunks[index:]
+                    finished = self.finished
+                if handle is not None and handle.cancelled:
+                    return
+                index += len(new_chunks)
+                yield from new_chunks
+                if finished and not new_chunks:
+                    return
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+                orphaned = self.subscribers == 0 and not self.finished
+                # Décidé sous le même verrou que join() : aucun abonné ne peut
+                # rejoindre une génération sur le point d'être annulée
+                self.abandoned = self.abandoned or orphaned
+            # Plus personne n'attend la réponse : la génération amont est annulée
+            if orphaned:
+                self.handle.cancel()
+
+
+class SingleFlight:
+    """Regroupe les générations identiques simultanées sur un seul appel amont
+
+    Le premier demandeur lance la génération dans un thread dédié ; les
+    suivants, avec la même clé, reçoivent ses fragments depuis le début.
+    L'annulation d'un abonné ne touche pas les autres ; la génération n'est
+    annulée que lorsque le dernier abonné est parti.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: str, factory, handle: StreamHandle = None, context=None):
+        """Fragments de factory(handle_amont), partagés entre les appels simultanés de même clé
+
+        Valeur de retour du générateur (result = yield from inflight.run(...)) :
+        le context passé par le premier demandeur, pour que les suivants
+        reprennent son état une fois la réponse lue.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None or not flight.join()
+            if leader:
+                flight = _Flight(context)
+                flight.join()
+                self._flights[key] = flight
+
+        if leader:
+            metrics.incr("singleflight.leaders")
+            threading.Thread(target=self._run, args=(key, flight, factory), daemon=True).start()
+        else:
+            metrics.incr("singleflight.coalesced")
+            print(f"Requête regroupée avec une génération en cours: {key}")
+
+        yield from flight.follow(handle)
+        return flight.context
+
+    def _run(self, key: str, flight: _Flight, factory):
+        try:
+            for chunk in factory(flight.handle):
+                flight.publish(chunk)
+        except Exception as e:
+            flight.publish(f"Erreur : {str(e)}")
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.finish()
+
+
+inflight = SingleFlight()
@@ -0,0 +1,116 @@
+"""
+Backends de reconnaissance vocale (STT) interchangeables
+
+- "openai" : Whisper hébergé (whisper-1), comportement historique
+- "local"  : Whisper quantifié int8 sur CPU via faster-whisper, sans réseau
+
+Choix par STT_BACKEND dans .env (openai par défaut). Si le backend local est
+demandé mais que faster-whisper n'est pas installé, on revient à OpenAI.
+"""
+
+import io
+import os
+import threading
+from dataclasses import dataclass
+from importlib.util import find_spec
+
+# Langues renvoyées par Whisper (nom complet en verbose_json, code ISO en local)
+# -> langues du chatbot
+WHISPER_LANGUAGES = {
+    "french": "french",
+    "english": "english",
+    "arabic": "darija",
+    "fr": "french",
+    "en": "english",
+    "ar": "darija",
+}
+
+DEFAULT_LOCAL_MODEL = "small"
+
+
+@dataclass
+class Transcription:
+    text: str
+    language: str = None  # french / english / darija, ou None si inconnue
+
+
+class STTBackend:
+    """Interface commune : transcrit des octets audio (format indiqué par le nom de fichier)"""
+
+    name = "base"
+
+    def transcribe(self, audio_bytes: bytes, filename: str, with_language: bool = False) -> Transcription:
+        raise NotImplementedError
+
+
+class OpenAIWhisperBackend(STTBackend):
+    """Whisper hébergé par OpenAI (whisper-1)"""
+
+    name = "openai"
+
+    def __init__(self, client):
+        self.client = client
+
+    def transcribe(self, audio_bytes: bytes, filename: str, with_language: bool = False) -> Transcription:
+        # "text" est plus léger ; verbose_json seulement si la langue est demandée
+        transcript = self.client.audio.transcriptions.create(
+            model="whisper-1",
+            file=(filename, audio_bytes),
+            language=None,  # Détection automatique (fr, en, ar)
+            response_format="verbose_json" if with_language else "text"
+        )
+        if not with_language:
+            return Transcription(text=transcript)
+        whisper_language = (getattr(transcript, "language", None) or "").lower()
+        return Transcription(text=transcript.text, language=WHISPER_LANGUAGES.get(whisper_language))
+
+
+class LocalWhisperBackend(STTBackend):
+    """Whisper quantifié (int8) exécuté sur CPU avec faster-whisper
+
+    Le modèle est chargé au premier appel (STT_LOCAL_MODEL : tiny, base, small...).
+    """
+
+    name = "local"
+
+    def __init__(self, model_size: str = None, compute_type: str = "int8"):
+        self.model_size = model_size or os.getenv("STT_LOCAL_MODEL", DEFAULT_LOCAL_MODEL)
+        self.compute_type = compute_type
+        self._model = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        return find_spec("faster_whisper") is not None
+
+    def _get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from faster_whisper import WhisperModel
+                    print(f"Chargement du modèle Whisper local '{self.model_size}' ({self.compute_type})...")
+                    self._model = WhisperModel(self.model_size, device="cpu", compute_type=self.compute_type)
+        return self._model
+
+    def transcribe(self, audio_bytes: bytes, filename: str, with_language: bool = False) -> Transcription:
+        # faster-whisper décode lui-même le conteneur (webm, ogg, wav) depuis la mémoire
+        segments, info = self._get_model().transcribe(
+            io.BytesIO(audio_bytes),
+            language=None,
+            beam_size=1,
+            vad_filter=True
+        )
+        text = " ".join(segment.text.strip() for segment in segments).strip()
+        return Transcription(text=text, language=WHISPER_LANGUAGES.get((info.language or "").lower()))
+
+
+def create_stt_backend(openai_client, name: str = None) -> STTBackend:
+    """Instancie le backend choisi (argument ou STT_BACKEND), OpenAI par défaut"""
+    name = (name or os.getenv("STT_BACKEND", "openai")).lower()
+    if name == "local":
+        if LocalWhisperBackend.available():
+            return LocalWhisperBackend()
+        print("⚠️ STT_BACKEND=local mais faster-whisper n'est pas installé : utilisation de Whisper OpenAI")
+    elif name != "openai":
+        print(f"⚠️ Backend STT inconnu '{name}' : utilisation de Whisper OpenAI")
+    return OpenAIWhisperBackend(openai_client)
@@ -0,0 +1,273 @@
+"""
+Tests de qualité des réponses : langue, refus hors périmètre et ancrage dans le contexte
+(réponses OpenAI / Fireworks rejouées depuis fixtures/llm/, index de test fixtures/index/,
+aucun appel réseau)
+
+Usage: python test_answer_quality.py                       (ou pytest test_answer_quality.py)
+       LLM_FIXTURES=record python test_answer_quality.py   (enregistre les réponses réelles :
+                                                            clés API requises)
+
+Chaque question suit le pipeline complet de PDFChatbot (filtre hors sujet,
+faits, langue, clarification, recherche, génération) sur un petit index
+livré avec les tests (fixtures/index/, format de build_index.py : quelques
+morceaux des brochures, vecteurs à 8 dimensions écrits à la main, faits),
+si bien que la suite tourne hors ligne sans index construit.
+Après une modification du prompt ou de la recherche, les réponses
+enregistrées sont périmées : les questions concernées sont ignorées (et
+signalées) jusqu'au réenregistrement, une réponse produite pour un autre
+contexte ne prouvant rien. Avec LLM_FIXTURES_REQUIRED=1 (intégration
+continue), une réponse manquante ou périmée, ou l'absence d'index, fait
+échouer la suite au lieu de l'ignorer.
+"""
+
+import os
+import re
+import sys
+import unittest
+from dataclasses import dataclass
+
+import llm_fixtures
+from topic_guard import DARIJA_MARKERS, is_refusal
+
+# Couleurs pour le terminal
+GREEN = '\033[92m'
+RED = '\033[91m'
+YELLOW = '\033[93m'
+BLUE = '\033[94m'
+RESET = '\033[0m'
+
+FRENCH_WORDS = {"le", "la", "les", "des", "du", "est", "et", "en", "pour", "une", "dans", "sont", "vous", "avec"}
+ENGLISH_WORDS = {"the", "and", "is", "are", "of", "to", "for", "in", "you", "with", "can", "your"}
+# Éléments vérifiables d'une réponse : nombres, emails, liens
+CHECKABLE_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+|(?:https?://|www\.)[^\s)\]]+|\d{2,}")
+# Réponses manquantes ou périmées : échec plutôt que test ignoré
+REQUIRED = os.getenv("LLM_FIXTURES_REQUIRED", "0") == "1"
+INDEX_DIR = os.getenv("ANSWER_QUALITY_INDEX_DIR", os.path.join("fixtures", "index"))
+
+
+@dataclass(frozen=True)
+class Case:
+    question: str
+    language: str      # french, english ou darija
+    refusal: bool = False
+
+
+CASES = [
+    Case("Quels sont les programmes de formation proposés par EMINES ?", "french"),
+    Case("Combien coûtent les frais de scolarité à EMINES ?", "french"),
+    Case("What programs does EMINES offer?", "english"),
+    Case("Is there a scholarship for EMINES students?", "english"),
+    Case("What are the application deadlines at EMINES?", "english"),
+    Case("chno homa les formations li kaynin f EMINES?", "darija"),
+    Case("kifach n9der ndir l'inscription f EMINES?", "darija"),
+    Case("Quels sont les programmes du College of Computing ?", "french", refusal=True),
+    Case("Who won the last football world cup?", "english", refusal=True),
+    Case("Donne-moi une recette de tajine marocain", "french", refusal=True),
+]
+
+
+@dataclass
+class Result:
+    answer: str
+    context: str = None    # prompt envoyé au LLM, None si réponse sans LLM (filtre, faits)
+    skipped: str = None
+
+
+class QuestionEmbeddings:
+    """Embeddings des questions par le SDK OpenAI, questions envoyées telles quelles
+
+    LangChain découpe d'abord le texte en tokens avec tiktoken, dont l'encodage est
+    téléchargé au premier usage : indisponible hors ligne, il empêcherait le rejeu.
+    """
+
+    def __init__(self, dimensions: int = None):
+        from openai import OpenAI
+
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.dimensions = dimensions
+
+    def embed_query(self, text: str) -> list:
+        import index_store
+
+        params = {"dimensions": self.dimensions} if self.dimensions else {}
+        response = self.client.embeddings.create(model=index_store.EMBEDDING_MODEL, input=[text], **params)
+        return response.data[0].embedding
+
+
+_session = {}
+_results = {}
+
+
+def skip(reason: str):
+    """Test ignoré, ou en échec avec LLM_FIXTURES_REQUIRED=1"""
+    if REQUIRED:
+        raise AssertionError(reason)
+    raise unittest.SkipTest(reason)
+
+
+def session():
+    """Index de test et rejeu des réponses, chargés une fois pour toute la suite (voir close_session)"""
+    if "fixtures" not in _session:
+        fixtures = llm_fixtures.LLMFixtures()
+        if fixtures.mode == "replay":
+            if not len(fixtures):
+                skip(f"Aucune réponse enregistrée dans {fixtures.directory}/ "
+                     f"(LLM_FIXTURES=record python test_answer_quality.py)")
+            # Clients construits sans clé : aucune requête ne part en rejeu
+            os.environ.setdefault("OPENAI_API_KEY", "replay")
+            os.environ.setdefault("FIREWORKS_API_KEY", "replay")
+        from dotenv import load_dotenv
+        load_dotenv()
+        import facts
+        import index_store
+
+        version_dir = index_store.current_version(INDEX_DIR)
+        if not version_dir:
+            skip(f"Aucun index de test dans {INDEX_DIR}/")
+        vector_store = index_store.load_artifact(version_dir)
+        vector_store.embedding = QuestionEmbeddings(index_store.read_manifest(version_dir)["index"]["dimensions"])
+        _session["vector_store"] = vector_store
+        # Faits de la même version que l'index ; table partagée remise en place par close_session
+        _session["fact_store"] = facts.fact_store
+        facts.fact_store = facts.FactStore(index_dir=INDEX_DIR)
+        _session["fixtures"] = fixtures.install()
+    return _session["fixtures"], _session["vector_store"]
+
+
+def close_session():
+    """Rétablit les appels API (install() les remplace pour tout le processus) et la table de faits"""
+    if "fixtures" in _session:
+        _session["fixtures"].uninstall()
+    if "fact_store" in _session:
+        import facts
+        facts.fact_store = _session["fact_store"]
+    _session.clear()
+    _results.clear()
+
+
+def teardown_module(module):
+    close_session()
+
+
+def ask(case: Case) -> Result:
+    """Réponse du pipeline complet à une question, en début de conversation"""
+    if case in _results:
+        return _results[case]
+    fixtures, vector_store = session()
+    from model_router import ModelRouter
+    from pipeline import PDFChatbot
+
+    ModelRouter._stats.clear()
+    bot = PDFChatbot(vector_store=vector_store)
+    # Pas de requête de secours : le même modèle est interrogé à l'enregistrement et au rejeu
+    bot.router = ModelRouter(bot.client, hedge_after=3600)
+
+    missing, stale = len(fixtures.missing), len(fixtures.stale)
+    answer = "".join(bot.generate_response(case.question, use_cache=False)).strip()
+    if len(fixtures.missing) > missing:
+        result = Result(answer, skipped=f"réponse non enregistrée ({fixtures.missing[-1]})")
+    elif len(fixtures.stale) > stale and not fixtures.allow_stale:
+        result = Result(answer, skipped=f"réponse périmée, à réenregistrer ({fixtures.stale[-1]})")
+    else:
+        # Messages envoyés au LLM (passages compris), absents pour le filtre hors sujet et les faits
+        messages = bot.last_turn.messages
+        result = Result(answer, "\n".join(m["content"] for m in messages) if messages else None)
+    _results[case] = result
+    return result
+
+
+def answer_language(text: str) -> str:
+    """Langue dominante d'une réponse (mots-outils, écriture arabe)"""
+    if len(re.findall(r"[؀-ۿ]", text)) > len(text) / 4:
+        return "darija"
+    words = re.findall(r"[\w']+", text.lower())
+    if len({word for word in words if word in DARIJA_MARKERS}) >= 2:
+        return "darija"
+    french = sum(word in FRENCH_WORDS for word in words)
+    english = sum(word in ENGLISH_WORDS for word in words)
+    return "english" if english > french else "french"
+
+
+def ungrounded(answer: str, context: str) -> list:
+    """Nombres, emails et liens de la réponse absents du contexte envoyé au LLM"""
+    flat = re.sub(r"\s+", "", context.lower())
+    return [item for item in CHECKABLE_RE.findall(answer.lower())
+            if re.sub(r"\s+", "", item).rstrip(".,;:") not in flat]
+
+
+def run_cases(check, cases: list):
+    """Vérifie chaque cas rejouable ; la suite est ignorée si aucun ne l'est"""
+    checked = 0
+    skipped = []
+    for case in cases:
+        result = ask(case)
+        if result.skipped:
+            skipped.append(f"{case.question}: {result.skipped}")
+            continue
+        assert not result.answer.startswith("Erreur"), f"{case.question!r} -> {result.answer}"
+        check(case, result)
+        checked += 1
+    if skipped and REQUIRED:
+        raise AssertionError("; ".join(skipped))
+    if not checked:
+        raise unittest.SkipTest("; ".join(skipped))
+
+
+def test_language_compliance():
+    def check(case, result):
+        language = answer_language(result.answer)
+        assert language == case.language, \
+            f"{case.question!r} : réponse en {language}, {case.language} attendu\n{result.answer[:200]}"
+    run_cases(check, CASES)
+
+
+def test_refusals():
+    def check(case, result):
+        if case.refusal:
+            assert is_refusal(result.answer), f"{case.question!r} : refus attendu\n{result.answer[:200]}"
+        else:
+            assert not is_refusal(result.answer), f"{case.question!r} : refus inattendu\n{result.answer[:200]}"
+    run_cases(check, CASES)
+
+
+def test_answers_grounded_in_context():
+    def check(case, result):
+        if result.context is None:
+            return  # filtre hors sujet ou table de faits : texte issu des documents
+        missing = ungrounded(result.answer, f"{result.context}\n{case.question}")
+        assert not missing, f"{case.question!r} : absents du contexte : {missing}"
+    run_cases(check, [case for case in CASES if not case.refusal])
+
+
+def main():
+    print(f"\n{BLUE}{'='*60}{RESET}")
+    print(f"{BLUE}{'TEST DE LA QUALITÉ DES RÉPONSES'.center(60)}{RESET}")
+    print(f"{BLUE}{'='*60}{RESET}\n")
+
+    tests = [
+        test_language_compliance,
+        test_refusals,
+        test_answers_grounded_in_context,
+    ]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{GREEN}✓ {test.__name__}{RESET}")
+        except unittest.SkipTest as e:
+            print(f"{YELLOW}- {test.__name__} ignoré : {e}{RESET}")
+        except AssertionError as e:
+            failures += 1
+            print(f"{RED}✗ {test.__name__}: {e}{RESET}")
+
+    if "fixtures" in _session:
+        status = _session["fixtures"].status()
+        print(f"\nFixtures ({status['mode']}) : {status['fixtures']} chargées, {status['recorded']} enregistrées, "
+              f"{status['replayed']} rejouées, {status['stale']} périmées, {status['missing']} manquantes")
+    close_session()
+    print(f"\n{len(tests) - failures}/{len(tests)} tests réussis")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,101 @@
+"""
+Tests des réponses factuelles sans appel LLM (facts.py), sur une table de faits
+écrite à la main (aucun PDF lu, aucun appel réseau)
+
+Usage: python test_facts.py   (ou pytest test_facts.py)
+"""
+
+import sys
+import time
+
+from facts import FactStore, question_kind
+from topic_guard import guess_language
+
+# Couleurs pour le terminal
+GREEN = '\033[92m'
+RED = '\033[91m'
+BLUE = '\033[94m'
+RESET = '\033[0m'
+
+SOURCE = "Cycle de formation ingénieur en Management Industriel (EMINES).pdf"
+FACTS = [
+    {"kind": "deadline", "school": "EMINES", "source": SOURCE, "page": 4, "program": "ingenieur",
+     "when": "15 mars 2025", "event": "application", "text": "15 mars 2025 : Dépôt des candidatures"},
+    {"kind": "deadline", "school": "EMINES", "source": SOURCE, "page": 4, "program": "ingenieur",
+     "when": "10 mai 2025", "event": "exams", "text": "10 mai 2025 : Épreuves écrites"},
+    {"kind": "duration", "school": "EMINES", "source": SOURCE, "page": 3, "program": "ingenieur",
+     "years": 3, "text": "Cycle Ingénieur : 3 ans"},
+]
+
+
+def make_store() -> FactStore:
+    """Table écrite à la main, considérée comme fraîchement chargée (pas de relecture)"""
+    store = FactStore(index_dir="index-absent", docs_dir="docs-absent")
+    store.facts = FACTS
+    store._checked_at = time.time()
+    return store
+
+
+def test_admission_deadlines_without_qualifier():
+    cases = [
+        "Quelles sont les dates limites ?",
+        "Quelles sont les dates limites à EMINES ?",
+        "imta akhir ajal bach npostuler?",
+        "What are the application deadlines?",
+    ]
+    for question in cases:
+        assert question_kind(question) == "deadlines", f"{question!r} : dates d'admission attendues"
+
+
+def test_other_deadlines_left_to_llm():
+    cases = [
+        "Quelles sont les dates limites de paiement des frais ?",
+        "Quelles sont les dates limites du stage ?",
+        "Date limite pour rendre le rapport ?",
+        "Quel est le calendrier des cours ?",
+    ]
+    for question in cases:
+        assert question_kind(question) is None, f"{question!r} : réponse du LLM attendue"
+
+
+def test_darija_deadline_question():
+    question = "imta akhir ajal bach npostuler?"
+    assert guess_language(question) == "darija"
+    answer = make_store().answer(question, guess_language(question))
+    assert answer is not None, "aucune réponse factuelle"
+    assert answer.startswith("Les dates dyal l'admission f EMINES"), answer
+    assert "15 mars 2025" in answer and SOURCE in answer, answer
+
+
+def test_suggested_question_answered_from_facts():
+    answer = make_store().answer("Quelles sont les dates limites ?", "french")
+    assert answer is not None, "aucune réponse factuelle"
+    assert "15 mars 2025" in answer and "10 mai 2025" in answer, answer
+
+
+def main():
+    print(f"\n{BLUE}{'='*60}{RESET}")
+    print(f"{BLUE}{'TEST DES RÉPONSES FACTUELLES'.center(60)}{RESET}")
+    print(f"{BLUE}{'='*60}{RESET}\n")
+
+    tests = [
+        test_admission_deadlines_without_qualifier,
+        test_other_deadlines_left_to_llm,
+        test_darija_deadline_question,
+        test_suggested_question_answered_from_facts,
+    ]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{GREEN}✓ {test.__name__}{RESET}")
+        except AssertionError as e:
+            failures += 1
+            print(f"{RED}✗ {test.__name__}: {e}{RESET}")
+
+    print(f"\n{len(tests) - failures}/{len(tests)} tests réussis")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,81 @@
+"""
+Tests du correcteur local des noms propres (aucun appel réseau)
+
+Usage: python test_local_corrector.py   (ou pytest test_local_corrector.py)
+"""
+
+import sys
+
+from local_corrector import local_corrector
+
+# Couleurs pour le terminal
+GREEN = '\033[92m'
+RED = '\033[91m'
+BLUE = '\033[94m'
+RESET = '\033[0m'
+
+
+def test_corrects_known_variants():
+    cases = [
+        ("Combien coûte hémine ?", "Combien coûte EMINES ?"),
+        ("Comment postuler à um 6p ?", "Comment postuler à UM6P ?"),
+        ("C'est loin de ben guérir ?", "C'est loin de Ben Guerir ?"),
+        ("Eminnes est à benguerir ?", "EMINES est à Ben Guerir ?"),
+    ]
+    for raw, expected in cases:
+        result = local_corrector.correct(raw)
+        assert result.text == expected, f"{raw!r} -> {result.text!r}, {expected!r} attendu"
+        assert result.confident, f"{raw!r} : correction jugée douteuse"
+
+
+def test_keeps_common_words_and_first_names():
+    # Mots à distance 1 de "emine" / "emines" : ni corrigés ni renvoyés au LLM
+    for raw in [
+        "Je m'appelle Amine, comment postuler ?",
+        "Les notes sont émises quand ?",
+        "Emile veut s'inscrire",
+        "Quelles écoles des mines au Maroc ?",
+    ]:
+        result = local_corrector.correct(raw)
+        assert result.text == raw, f"{raw!r} réécrit en {result.text!r}"
+        assert not result.corrections and not result.uncertain, f"{raw!r} : {result}"
+
+
+def test_corrects_variant_next_to_first_name():
+    result = local_corrector.correct("Emile veut étudier à émine")
+    assert result.text == "Emile veut étudier à EMINES", result.text
+
+
+def test_doubtful_match_is_left_to_llm():
+    # Distance 2 : confiance sous le seuil, transcription inchangée
+    result = local_corrector.correct("Parlez-moi de eminnnes")
+    assert result.text == "Parlez-moi de eminnnes", result.text
+    assert not result.confident
+
+
+def main():
+    print(f"\n{BLUE}{'='*60}{RESET}")
+    print(f"{BLUE}{'TEST DU CORRECTEUR LOCAL'.center(60)}{RESET}")
+    print(f"{BLUE}{'='*60}{RESET}\n")
+
+    tests = [
+        test_corrects_known_variants,
+        test_keeps_common_words_and_first_names,
+        test_corrects_variant_next_to_first_name,
+        test_doubtful_match_is_left_to_llm,
+    ]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{GREEN}✓ {test.__name__}{RESET}")
+        except AssertionError as e:
+            failures += 1
+            print(f"{RED}✗ {test.__name__}: {e}{RESET}")
+
+    print(f"\n{len(tests) - failures}/{len(tests)} tests réussis")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
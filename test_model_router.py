@@ -0,0 +1,184 @@
+"""
+Tests du routeur de modèles Fireworks contre un faux serveur local
+(latence au premier token et erreurs injectées, aucun appel réseau)
+
+Usage: python test_model_router.py   (ou pytest test_model_router.py)
+"""
+
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import model_router
+from model_router import ModelRouter
+from streaming import StreamHandle
+
+# Couleurs pour le terminal
+GREEN = '\033[92m'
+RED = '\033[91m'
+BLUE = '\033[94m'
+RESET = '\033[0m'
+
+MODEL_A = "accounts/fireworks/models/model-a"
+MODEL_B = "accounts/fireworks/models/model-b"
+
+
+class MockStream:
+    """Flux de réponse : premier token après `ttft` secondes, puis un mot toutes les `delay` secondes"""
+
+    def __init__(self, text: str, ttft: float, delay: float = 0.0):
+        self.text = text
+        self.ttft = ttft
+        self.delay = delay
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        # Fragment initial sans contenu, comme l'API (rôle assistant)
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None))])
+        if self.closed.wait(self.ttft):
+            raise ConnectionError("flux fermé")
+        for word in self.text.split(" "):
+            if self.delay and self.closed.wait(self.delay):
+                raise ConnectionError("flux fermé")
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))])
+
+    def close(self):
+        self.closed.set()
+
+
+class MockFireworks:
+    """Faux client OpenAI/Fireworks : comportement configurable par modèle"""
+
+    def __init__(self, behaviours: dict):
+        # modèle -> {"ttft": secondes, "fail": bool, "delay": secondes entre mots}
+        self.behaviours = behaviours
+        self.calls = []
+        self.streams = {}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model=None, stream=False, **kwargs):
+        self.calls.append(model)
+        behaviour = self.behaviours[model]
+        if behaviour.get("fail"):
+            raise RuntimeError(f"503 Service Unavailable ({model})")
+        response = MockStream(f"réponse de {model_router.short_name(model)}",
+                              behaviour.get("ttft", 0.0), behaviour.get("delay", 0.0))
+        self.streams.setdefault(model, []).append(response)
+        return response
+
+
+def reset_stats():
+    ModelRouter._stats.clear()
+
+
+def answer(router, **kwargs) -> str:
+    return "".join(router.stream_chat([{"role": "user", "content": "Où se trouve EMINES ?"}], **kwargs)).strip()
+
+
+def test_routes_to_fastest_healthy_model():
+    reset_stats()
+    client = MockFireworks({MODEL_A: {"ttft": 0.2}, MODEL_B: {"ttft": 0.02}})
+    router = ModelRouter(client, models=[MODEL_A, MODEL_B], hedge_after=5)
+
+    # B mesuré plus rapide que le TTFT supposé de A (non mesuré)
+    router.record_success(MODEL_B, 0.02)
+    assert router.ranked_models() == [MODEL_B, MODEL_A]
+    assert answer(router) == "réponse de model-b"
+    assert client.calls == [MODEL_B]
+
+
+def test_hedges_slow_first_token():
+    reset_stats()
+    client = MockFireworks({MODEL_A: {"ttft": 2.0}, MODEL_B: {"ttft": 0.05}})
+    router = ModelRouter(client, models=[MODEL_A, MODEL_B], hedge_after=0.1)
+
+    start = time.monotonic()
+    text = answer(router)
+    elapsed = time.monotonic() - start
+
+    assert text == "réponse de model-b"
+    assert client.calls == [MODEL_A, MODEL_B]
+    assert elapsed < 1.0, f"la requête de secours aurait dû gagner ({elapsed:.2f}s)"
+    # La requête lente est fermée dès que la réponse de secours l'emporte
+    assert client.streams[MODEL_A][0].closed.wait(1.0)
+
+
+def test_fails_over_on_error_and_marks_model_unhealthy():
+    reset_stats()
+    client = MockFireworks({MODEL_A: {"fail": True}, MODEL_B: {"ttft": 0.01}})
+    router = ModelRouter(client, models=[MODEL_A, MODEL_B], hedge_after=5)
+    # B mesuré lent : A reste préféré tant qu'il n'est pas écarté
+    for _ in range(model_router.MIN_SAMPLES):
+        router.record_success(MODEL_B, 3.0)
+
+    for _ in range(model_router.CONSECUTIVE_ERRORS_LIMIT):
+        client.calls.clear()
+        assert answer(router) == "réponse de model-b"
+        assert client.calls == [MODEL_A, MODEL_B]
+
+    # A est en quarantaine : plus aucune requête ne lui est envoyée
+    client.calls.clear()
+    assert router.ranked_models() == [MODEL_B]
+    assert answer(router) == "réponse de model-b"
+    assert client.calls == [MODEL_B]
+    assert router.status()["model-a"]["healthy"] is False
+
+
+def test_raises_when_every_model_fails():
+    reset_stats()
+    client = MockFireworks({MODEL_A: {"fail": True}, MODEL_B: {"fail": True}})
+    router = ModelRouter(client, models=[MODEL_A, MODEL_B], hedge_after=5)
+
+    try:
+        answer(router)
+    except RuntimeError as e:
+        assert "503" in str(e)
+    else:
+        raise AssertionError("une erreur était attendue")
+
+
+def test_cancel_closes_upstream_stream():
+    reset_stats()
+    client = MockFireworks({MODEL_A: {"ttft": 0.01, "delay": 0.2}})
+    router = ModelRouter(client, models=[MODEL_A], hedge_after=5)
+    handle = StreamHandle()
+
+    chunks = router.stream_chat([{"role": "user", "content": "Programme ?"}], handle=handle)
+    assert next(chunks).strip() == "réponse"
+    threading.Timer(0.05, handle.cancel).start()
+    try:
+        for _ in chunks:
+            pass
+    except ConnectionError:
+        pass
+    assert client.streams[MODEL_A][0].closed.is_set()
+
+
+def main():
+    print(f"\n{BLUE}{'='*60}{RESET}")
+    print(f"{BLUE}{'TEST DU ROUTEUR DE MODÈLES'.center(60)}{RESET}")
+    print(f"{BLUE}{'='*60}{RESET}\n")
+
+    tests = [
+        test_routes_to_fastest_healthy_model,
+        test_hedges_slow_first_token,
+        test_fails_over_on_error_and_marks_model_unhealthy,
+        test_raises_when_every_model_fails,
+        test_cancel_closes_upstream_stream,
+    ]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{GREEN}✓ {test.__name__}{RESET}")
+        except AssertionError as e:
+            failures += 1
+            print(f"{RED}✗ {test.__name__}: {e}{RESET}")
+
+    print(f"\n{len(tests) - failures}/{len(tests)} tests réussis")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,246 @@
+"""
+Filtre local des questions hors sujet ou portant sur une autre école de l'UM6P
+
+Un refus ("Je suis spécialisé uniquement pour EMINES...") coûtait le pipeline
+complet : détection de langue, clarification et génération Fireworks. Les cas
+nets sont repérés avant tout appel LLM :
+- règles de mots-clés : autres écoles de l'UM6P (CC, GTI, SAP+D, ABS) et
+  sujets hors périmètre (météo, recettes, célébrités...) ;
+- similarité de l'embedding de la question avec les centroïdes des thèmes de
+  l'index FAISS (un par école), en début de conversation seulement : une
+  relance courte comme "et les frais ?" ne se comprend qu'avec l'historique.
+Les mots qui ont aussi un sens dans la vie étudiante (série de bac, président
+de l'université, club de musique, football, cuisine des résidences) ne sont
+pas des mots-clés, et un mot-clé hors sujet ne suffit pas quand l'embedding
+rapproche la question des documents : le cas douteux est laissé au LLM.
+Le refus prévu dans les limitations est renvoyé aussitôt, dans la langue de
+l'utilisateur (devinée localement si elle n'est pas connue).
+
+Précision et rappel : bench_topic_guard.py sur des exemples annotés ; en
+production, les refus du LLM qui ont échappé au filtre sont comptés
+(topic_guard.missed) pour estimer le rappel dans /api/metrics.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from intent_budget import INTENT_KEYWORDS
+from metrics import metrics
+from question_clusters import normalize_question
+
+# Similarité cosinus minimale avec le thème le plus proche ; en dessous, la question est hors sujet
+MIN_SIMILARITY = float(os.getenv("TOPIC_GUARD_MIN_SIMILARITY", "0.18"))
+USE_EMBEDDINGS = os.getenv("TOPIC_GUARD_EMBEDDINGS", "1") == "1"
+VECTOR_CACHE_SIZE = 64
+
+# Mots-clés normalisés (minuscules, sans accents ni ponctuation : "SAP+D" -> "sap d")
+OTHER_SCHOOL_KEYWORDS = [
+    "college of computing", "um6p cc", "le cc", "au cc", "the cc",
+    "green tech institute", "green tech", "gti",
+    "sap d", "sapd", "school of architecture", "ecole d architecture", "architecture planning",
+    # "abs" seul est aussi une abréviation courante (absences) : uniquement précédé de "à", "at", "f"
+    "africa business school", "a abs", "a l abs", "at abs", "at the abs", "f abs",
+]
+OFF_TOPIC_KEYWORDS = INTENT_KEYWORDS["off_topic"] + [
+    "chanteur", "chanteuse", "acteur", "actrice", "elections",
+    "bitcoin", "horoscope", "singer", "actor",
+    "kora", "ghniya", "taqs",
+]
+# Mots du domaine : leur présence laisse passer la question (hors autres écoles)
+DOMAIN_KEYWORDS = [
+    "emines", "um6p", "ecole", "school", "formation", "ingenieur", "engineering", "admission",
+    "concours", "inscription", "candidature", "bourse", "bourses", "frais", "campus", "etudiant",
+    "etudiants", "student", "students", "programme", "cursus", "diplome", "stage", "ben guerir",
+    "benguerir", "management industriel", "prepa", "preparatoire",
+]
+
+# Marqueurs de langue pour deviner la langue sans appel LLM
+DARIJA_MARKERS = {
+    "wach", "chno", "chnou", "achno", "kifach", "kifash", "fin", "bghit", "chhal", "bch7al",
+    "kayn", "kayna", "dyal", "dial", "3lach", "ana", "nta", "nti", "hna", "lli", "mzyan", "wakha",
+    "imta",
+}
+ENGLISH_MARKERS = {
+    "what", "where", "how", "who", "which", "when", "why", "is", "are", "the", "do", "does",
+    "can", "about", "you", "your", "tell", "me",
+}
+
+# Refus par défaut ; le texte français est repris des limitations quand il y figure
+REFUSALS = {
+    "other_school": {
+        "french": "Je suis spécialisé uniquement pour EMINES - School of Industrial Management. "
+                  "Pour des informations sur d'autres écoles, veuillez consulter : 🌐 https://um6p.ma/fr",
+        "english": "I am specialized only in EMINES - School of Industrial Management. "
+                   "For information about other schools, please visit: 🌐 https://um6p.ma/en",
+        "darija": "Ana mtkhasses ghir f EMINES - School of Industrial Management. "
+                  "Ila bghiti ma3lomat 3la chi madrasa okhra, chof : 🌐 https://um6p.ma/fr",
+    },
+    "off_topic": {
+        "french": "Je suis un assistant spécialisé uniquement pour EMINES - School of Industrial Management. "
+                  "Je ne peux pas répondre à cette question.",
+        "english": "I am an assistant specialized only in EMINES - School of Industrial Management. "
+                   "I cannot answer this question.",
+        "darija": "Ana assistant mtkhasses ghir f EMINES - School of Industrial Management. "
+                  "Ma n9derch njawb 3la had so2al.",
+    },
+}
+# Ligne des limitations contenant chaque refus (texte entre guillemets)
+_LIMITATION_LINES = {
+    "other_school": "autre école",
+    "off_topic": "non liée",
+}
+# Formules des refus (normalisées) pour repérer ceux produits par le LLM
+REFUSAL_MARKERS = [
+    "specialise uniquement pour emines", "specialisee uniquement pour emines",
+    "specialized only in emines", "specialized only for emines", "only specialized in emines",
+    "ne peux pas repondre a cette question", "cannot answer this question", "mtkhasses ghir",
+]
+
+
+@dataclass(frozen=True)
+class Verdict:
+    kind: str          # "other_school" ou "off_topic"
+    reason: str        # "keyword" ou "embedding"
+    similarity: float = None
+
+
+def _contains(text: str, keywords: list) -> bool:
+    return any(f" {keyword} " in text for keyword in keywords)
+
+
+def guess_language(text: str) -> str:
+    """Langue probable (french / english / darija) d'après quelques mots-outils"""
+    if re.search(r"[؀-ۿ]", text):
+        return "darija"
+    words = normalize_question(text).split()
+    if any(word in DARIJA_MARKERS for word in words):
+        return "darija"
+    if sum(word in ENGLISH_MARKERS for word in words) >= 2:
+        return "english"
+    return "french"
+
+
+def refusal_text(kind: str, language: str, limitations: str = None) -> str:
+    """Refus prévu dans les limitations, dans la langue de l'utilisateur"""
+    if language not in ("english", "darija") and limitations:
+        for line in limitations.splitlines():
+            if _LIMITATION_LINES[kind] in line:
+                quoted = re.search(r'"([^"]+)"', line)
+                if quoted:
+                    return quoted.group(1)
+    return REFUSALS[kind].get(language, REFUSALS[kind]["french"])
+
+
+def is_refusal(answer: str) -> bool:
+    """La réponse du LLM est-elle un refus hors périmètre ?"""
+    text = f" {normalize_question(answer)} "
+    return _contains(text, REFUSAL_MARKERS)
+
+
+class TopicGuard:
+    """Repère les questions hors sujet ou sur une autre école avant le pipeline LLM"""
+
+    def __init__(self, vector_store=None, min_similarity: float = MIN_SIMILARITY,
+                 use_embeddings: bool = USE_EMBEDDINGS):
+        self.vector_store = vector_store
+        self.min_similarity = min_similarity
+        self.use_embeddings = use_embeddings and vector_store is not None
+        self._centroids = None
+        self._vectors = OrderedDict()  # question -> embedding, réutilisé pour la recherche
+        self._lock = threading.Lock()
+
+    def _topic_centroids(self):
+        """Centroïdes normalisés des vecteurs de l'index, un par école (partition)"""
+        with self._lock:
+            if self._centroids is None:
+                import numpy as np
+
+                groups = {
+                    school: partition.index.reconstruct_n(0, partition.index.ntotal)
+                    for school, partition in self.vector_store.partitions.items()
+                }
+                centroids = np.array([np.mean(group, axis=0) for group in groups.values()])
+                self._centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+                print(f"Filtre hors sujet : {len(groups)} thèmes ({', '.join(groups)})")
+            return self._centroids
+
+    def embed(self, question: str) -> list:
+        """Embedding de la question, gardé pour la recherche documentaire qui suit"""
+        with self._lock:
+            if question in self._vectors:
+                return self._vectors[question]
+        vector = self.vector_store._embed_query(question)
+        with self._lock:
+            self._vectors[question] = vector
+            while len(self._vectors) > VECTOR_CACHE_SIZE:
+                self._vectors.popitem(last=False)
+        return vector
+
+    def cached_vector(self, question: str):
+        with self._lock:
+            return self._vectors.get(question)
+
+    def topic_similarity(self, question: str) -> float:
+        """Similarité cosinus maximale entre la question et les thèmes de l'index"""
+        import numpy as np
+
+        vector = np.array(self.embed(question))
+        vector /= np.linalg.norm(vector)
+        return float((self._topic_centroids() @ vector).max())
+
+    def check(self, question: str, first_turn: bool = True):
+        """Verdict si la question est nettement hors périmètre, sinon None"""
+        start = time.perf_counter()
+        verdict = self._check(question, first_turn)
+        metrics.incr("topic_guard.checked")
+        metrics.observe("topic_guard.check_ms", (time.perf_counter() - start) * 1000)
+        if verdict:
+            metrics.incr(f"topic_guard.blocked.{verdict.kind}")
+            print(f"Question hors périmètre ({verdict.kind}, {verdict.reason}): {question}")
+        return verdict
+
+    def _check(self, question: str, first_turn: bool):
+        text = f" {normalize_question(question)} "
+        # Comparaison avec EMINES ("EMINES ou ABS ?") : la question reste pour le LLM
+        if " emines " in text:
+            return None
+        if _contains(text, OTHER_SCHOOL_KEYWORDS):
+            return Verdict("other_school", "keyword")
+        if _contains(text, DOMAIN_KEYWORDS):
+            return None
+        off_topic_keyword = _contains(text, OFF_TOPIC_KEYWORDS)
+        if not (first_turn and self.use_embeddings):
+            return Verdict("off_topic", "keyword") if off_topic_keyword else None
+        try:
+            similarity = self.topic_similarity(question)
+        except Exception as e:
+            # Filtre facultatif : en cas d'erreur, la question suit le pipeline normal
+            print(f"Erreur filtre hors sujet: {e}")
+            return None
+        metrics.observe("topic_guard.similarity", similarity)
+        if similarity >= self.min_similarity:
+            # Proche des documents malgré un mot-clé hors sujet : décision laissée au LLM
+            return None
+        return Verdict("off_topic", "keyword" if off_topic_keyword else "embedding", similarity)
+
+    def record_answer(self, answer: str):
+        """Refus du LLM sur une question que le filtre a laissé passer (faux négatif)"""
+        if is_refusal(answer):
+            metrics.incr("topic_guard.missed")
+
+    @staticmethod
+    def status() -> dict:
+        """Refus interceptés, refus manqués et rappel estimé (pour /api/metrics)"""
+        counters = metrics.snapshot()["counters"]
+        blocked = sum(value for name, value in counters.items() if name.startswith("topic_guard.blocked."))
+        missed = counters.get("topic_guard.missed", 0)
+        return {
+            "checked": counters.get("topic_guard.checked", 0),
+            "blocked": blocked,
+            "missed": missed,
+            "recall_estimate": round(blocked / (blocked + missed), 3) if blocked + missed else None,
+        }